@@ -0,0 +1,290 @@
+"""
+Benchmark of the stages of the pull pipeline and of the end-to-end `bost.main` on synthetic BO4E-like corpora
+(see `corpus.py`). The raw files and the GitHub API are served by a local stand-in (see `github_stub.py`), i.e. the
+download stages measure the client side on loopback and not the network. The discovery includes the delay which
+PyGithub keeps between two requests.
+Each stage is run `--repeat` times on fresh input and the best time is reported. The results are saved as
+`results/<commit>.json` (with the suffix "-dirty" if the working tree has uncommitted changes) and can be compared
+against the results of another commit.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--sizes N ...] [--repeat N] [--jobs N] [--compare COMMIT_OR_FILE]
+Corpora of up to 20000 schemas are supported, the default sizes keep a run within a few minutes.
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, TypeVar
+
+from corpus import VERSION, generate_config, generate_corpus
+from github_stub import GithubStub
+from pydantic import BaseModel
+
+from bost import main as bost_main
+from bost.config import Config, load_config
+from bost.index import FieldIndex
+from bost.logger import logger
+from bost.operations import ReferenceResolver, update_references
+from bost.output import save_schemas
+from bost.processing import (
+    fresh_copy,
+    process_schemas,
+    transform_all_additional_enum_items,
+    transform_all_additional_fields,
+    transform_all_non_nullable_fields,
+)
+from bost.pull import (
+    DEFAULT_JOBS,
+    SCHEMAS_DIR,
+    SchemaMetadata,
+    _github_tree_query,
+    download_schemas,
+    get_schema_list,
+    schema_iterator,
+)
+from bost.serialization import json_backend
+
+T = TypeVar("T")
+
+STAGES = (
+    "discovery",
+    "download",
+    "parse",
+    "transform_additional_fields",
+    "transform_non_nullable_fields",
+    "transform_additional_enum_items",
+    "update_references",
+    "save",
+    "main",
+)
+DEFAULT_SIZES = (100, 1000, 5000)
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+class BenchmarkRun(BaseModel):
+    """
+    The results of one run of the benchmark
+    """
+
+    commit: str
+    date: str
+    python: str
+    json_backend: str
+    jobs: int
+    repeat: int
+    results: dict[int, dict[str, float]]
+    """ The best time in seconds by stage by corpus size """
+
+    def save(self, path: Path) -> None:
+        """
+        Write the results as JSON.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(self.model_dump_json(indent=2))
+
+
+def measure(run: Callable[[T], object], setup: Callable[[], T], repeat: int) -> float:
+    """
+    Returns the best time of `repeat` runs in seconds. Every run gets a fresh input from `setup`, which isn't timed.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def current_commit() -> str:
+    """
+    The abbreviated hash of the checked out commit with the suffix "-dirty" if there are uncommitted changes.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, check=True, text=True
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, check=True, text=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if status.strip() != "" else commit
+
+
+def _metadata(output: Path) -> dict[str, SchemaMetadata]:
+    return dict(schema_iterator(VERSION, output, None, None))
+
+
+def _loaded(files: dict[str, bytes], output: Path) -> dict[str, SchemaMetadata]:
+    schemas = _metadata(output)
+    for schema in schemas.values():
+        schema.schema_text = files[f"{SCHEMAS_DIR}/{'/'.join(schema.module_path)}.json"].decode("utf-8")
+    return schemas
+
+
+def _copies(schemas: dict[str, SchemaMetadata]) -> dict[str, SchemaMetadata]:
+    return {name: fresh_copy(schema) for name, schema in schemas.items()}
+
+
+def _clear(directory: Path) -> Path:
+    shutil.rmtree(directory, ignore_errors=True)
+    return directory
+
+
+def _update_all_references(schemas: dict[str, SchemaMetadata]) -> None:
+    resolver = ReferenceResolver(schemas, VERSION)
+    for schema in schemas.values():
+        update_references(schema, schemas, VERSION, resolver)
+
+
+# pylint: disable=too-many-locals
+def bench_size(size: int, repeat: int, jobs: int, work_dir: Path) -> dict[str, float]:
+    """
+    Benchmark all stages on a corpus of `size` schemas. Returns the best time by stage.
+    """
+    files = generate_corpus(size)
+    config_file = work_dir / "config.json"
+    config_file.write_text(json.dumps(generate_config(size)))
+    config: Config = load_config(config_file)
+    output = work_dir / "output"
+    results: dict[str, float] = {}
+
+    with GithubStub(files, VERSION) as stub, stub.patched():
+        results["discovery"] = measure(
+            lambda _: get_schema_list(VERSION, None, None), _github_tree_query.cache_clear, repeat
+        )
+        results["download"] = measure(
+            lambda schemas: download_schemas(schemas.values(), jobs), lambda: _metadata(output), repeat
+        )
+        results["parse"] = measure(
+            lambda schemas: [schema.schema_parsed for schema in schemas.values()],
+            lambda: _loaded(files, output),
+            repeat,
+        )
+        parsed = _loaded(files, output)
+        for schema in parsed.values():
+            _ = schema.schema_parsed
+        results["transform_additional_fields"] = measure(
+            lambda schemas: transform_all_additional_fields(
+                config.additional_fields, schemas, FieldIndex(schemas.values())  # type: ignore[arg-type]
+            ),
+            lambda: _copies(parsed),
+            repeat,
+        )
+
+        def setup_non_nullable_fields() -> tuple[dict[str, SchemaMetadata], FieldIndex]:
+            # The field index is built in the previous stage of the pipeline
+            copies = _copies(parsed)
+            return copies, FieldIndex(copies.values())
+
+        results["transform_non_nullable_fields"] = measure(
+            lambda state: transform_all_non_nullable_fields(config.non_nullable_fields, *state),
+            setup_non_nullable_fields,
+            repeat,
+        )
+        results["transform_additional_enum_items"] = measure(
+            lambda schemas: transform_all_additional_enum_items(config.additional_enum_items, schemas),
+            lambda: _copies(parsed),
+            repeat,
+        )
+        results["update_references"] = measure(_update_all_references, lambda: _copies(parsed), repeat)
+        processed = _copies(parsed)
+        process_schemas(processed, config, VERSION, update_refs=True, set_default_version=True)
+        results["save"] = measure(
+            lambda directory: save_schemas(processed.values(), directory, False, jobs),
+            lambda: _clear(output),
+            repeat,
+        )
+
+        def setup_main() -> Path:
+            _github_tree_query.cache_clear()
+            return _clear(output)
+
+        results["main"] = measure(
+            lambda directory: bost_main(
+                output=directory,
+                target_version=VERSION,
+                update_refs=True,
+                set_default_version=True,
+                clear_output=False,
+                config_file=config_file,
+                jobs=jobs,
+            ),
+            setup_main,
+            repeat,
+        )
+    return results
+
+
+def load_results(commit_or_file: str) -> BenchmarkRun:
+    """
+    Load the results of a previous run by the path of the file or by (the beginning of) the commit hash.
+    """
+    path = Path(commit_or_file)
+    if not path.is_file():
+        candidates = sorted(RESULTS_DIR.glob(f"{commit_or_file}*.json"))
+        if len(candidates) != 1:
+            raise ValueError(f"Found {len(candidates)} results for {commit_or_file!r} in {RESULTS_DIR}")
+        path = candidates[0]
+    return BenchmarkRun.model_validate_json(path.read_text())
+
+
+def print_results(run: BenchmarkRun, baseline: BenchmarkRun | None) -> None:
+    """
+    Print the results. If a baseline is given, the times are compared with it (a ratio above 1 means slower).
+    """
+    for size, results in run.results.items():
+        previous = baseline.results.get(size, {}) if baseline is not None else {}
+        print(f"{size} schemas")
+        for stage in STAGES:
+            if stage not in results:
+                continue
+            seconds = results[stage]
+            line = f"  {stage:<35} {seconds * 1000:>10.1f} ms {size / seconds:>12.0f} schemas/s"
+            if stage in previous and baseline is not None:
+                line += f"   {baseline.commit}: {previous[stage] * 1000:>10.1f} ms ({seconds / previous[stage]:.2f}x)"
+            print(line)
+
+
+def main() -> None:
+    """
+    Run the benchmark, save and print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS)
+    parser.add_argument("--compare", help="Commit or result file to compare with")
+    parser.add_argument("--no-save", action="store_true", help="Don't save the results")
+    args = parser.parse_args()
+
+    # The info messages of bost are logged per schema and would distort the measurements
+    logger.setLevel(logging.WARNING)
+    baseline = load_results(args.compare) if args.compare is not None else None
+    with tempfile.TemporaryDirectory() as work_dir:
+        run = BenchmarkRun(
+            commit=current_commit(),
+            date=datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            python=platform.python_version(),
+            json_backend=json_backend(),
+            jobs=args.jobs,
+            repeat=args.repeat,
+            results={size: bench_size(size, args.repeat, args.jobs, Path(work_dir)) for size in args.sizes},
+        )
+    if not args.no_save:
+        run.save(RESULTS_DIR / f"{run.commit}.json")
+        print(f"Saved results to {RESULTS_DIR / f'{run.commit}.json'}")
+    print_results(run, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark of the parse and serialization layer in `bost.serialization`.
+Compares the throughput in schemas per second against the previous implementation, which created a new type adapter
+for every file and used pydantic for the JSON handling.
+
+Usage:
+    python benchmarks/bench_serialization.py [SCHEMA_DIR] [--repeat N]
+SCHEMA_DIR defaults to the BO4E-Schemas in the unittests test data.
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import Callable
+
+from pydantic import TypeAdapter
+
+from bost.schema import SchemaRootType
+from bost.serialization import dump_schema, json_backend, parse_schema
+
+DEFAULT_SCHEMA_DIR = Path(__file__).parent.parent / "unittests" / "test_data" / "bo4e_schemas"
+
+
+def measure(func: Callable[[], object], count: int, repeat: int) -> float:
+    """
+    Returns the best throughput of `repeat` runs in items per second.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return count / best
+
+
+def main() -> None:
+    """
+    Run the benchmark and print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("schema_dir", nargs="?", type=Path, default=DEFAULT_SCHEMA_DIR)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    files = [path.read_bytes() for path in sorted(args.schema_dir.glob("*/*.json"))]
+    schemas = [parse_schema(file) for file in files]
+    results = {
+        "parse (previous: new TypeAdapter per file)": measure(
+            lambda: [TypeAdapter(SchemaRootType).validate_json(file) for file in files], len(files), args.repeat
+        ),
+        f"parse (bost.serialization, {json_backend()})": measure(
+            lambda: [parse_schema(file) for file in files], len(files), args.repeat
+        ),
+        "dump (previous: model_dump_json)": measure(
+            lambda: [schema.model_dump_json(indent=2, exclude_unset=True, by_alias=True) for schema in schemas],
+            len(schemas),
+            args.repeat,
+        ),
+        f"dump (bost.serialization, {json_backend()})": measure(
+            lambda: [dump_schema(schema) for schema in schemas], len(schemas), args.repeat
+        ),
+    }
+    print(f"{len(files)} schemas from {args.schema_dir}")
+    for name, throughput in results.items():
+        print(f"{name:<50} {throughput:>10.0f} schemas/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Generator of synthetic schema corpora shaped like the BO4E-Schemas.
+A corpus consists of `enum` schemas (string enums), `com` schemas (components) and `bo` schemas (business objects)
+in roughly the proportions of BO4E. Like in BO4E, almost every field is nullable (`anyOf: [..., null]` with
+`default: null`) and the objects reference each other with absolute `$ref`s to the raw files of the release.
+The generator is deterministic for a given size and seed.
+
+Usage:
+    python benchmarks/corpus.py SIZE OUTPUT_DIR [--seed N]
+writes a corpus of SIZE schemas and a matching config file `config.json` into OUTPUT_DIR.
+"""
+
+import argparse
+import json
+import random
+from pathlib import Path
+
+from bost.pull import SCHEMAS_DIR
+
+VERSION = "v0.6.1-rc13"
+""" The version of the synthetic release. The references of the corpus point to this version. """
+REF_URL = f"https://raw.githubusercontent.com/Hochfrequenz/BO4E-Schemas/{VERSION}/{SCHEMAS_DIR}"
+MODULE_SHARES = {"enum": 0.45, "com": 0.35, "bo": 0.2}
+""" The share of each module in the corpus, similar to BO4E (83 enums, 63 components and 32 business objects) """
+FIELD_NAMES = (
+    "bezeichnung",
+    "beschreibung",
+    "nummer",
+    "wert",
+    "menge",
+    "preis",
+    "datum",
+    "zeitraum",
+    "status",
+    "art",
+    "kategorie",
+    "referenz",
+    "anzahl",
+    "einheit",
+    "kennung",
+    "version",
+)
+ENUM_ITEMS = ("GAS", "STROM", "WASSER", "WAERME", "FERNWAERME", "NAHWAERME", "HAUS", "FIRMA", "SONSTIGES", "KEINE")
+
+
+def schema_names(size: int) -> dict[str, list[str]]:
+    """
+    Get the class names of a corpus with `size` schemas by module. Every module contains at least one schema.
+    """
+    counts = {module: max(1, round(size * share)) for module, share in MODULE_SHARES.items()}
+    counts["enum"] += size - sum(counts.values())
+    return {module: [f"{module.title()}{index:05d}" for index in range(count)] for module, count in counts.items()}
+
+
+def _nullable(schema: dict, title: str | None = None, default: object = None) -> dict:
+    field: dict[str, object] = {"title": title} if title is not None else {}
+    field.update({"default": default, "anyOf": [schema, {"type": "null"}]})
+    return field
+
+
+def _ref(module: str, name: str) -> dict:
+    return {"$ref": f"{REF_URL}/{module}/{name}.json"}
+
+
+def _enum_schema(name: str, rng: random.Random) -> dict:
+    items = [f"{item}_{index}" for index, item in enumerate(rng.sample(ENUM_ITEMS, rng.randint(2, len(ENUM_ITEMS))))]
+    return {"description": f"Synthetic enum {name}.", "title": name, "type": "string", "enum": items}
+
+
+def _field(names: dict[str, list[str]], rng: random.Random, targets: tuple[str, ...]) -> dict:
+    kind = rng.random()
+    if kind < 0.35:
+        return {"type": "string"}
+    if kind < 0.45:
+        return {"type": "string", "format": "date-time"}
+    if kind < 0.55:
+        return {"type": "number"}
+    if kind < 0.6:
+        return {"type": "boolean"}
+    module = rng.choice(targets)
+    reference = _ref(module, rng.choice(names[module]))
+    if kind < 0.85:
+        return reference
+    return {"type": "array", "items": reference}
+
+
+def _object_schema(module: str, name: str, names: dict[str, list[str]], rng: random.Random) -> dict:
+    properties = {"_id": _nullable({"type": "string"}, " Id")}
+    if module == "bo":
+        properties["_typ"] = _nullable(_ref("enum", names["enum"][0]), default=names["enum"][0].upper())
+    properties["_version"] = _nullable({"type": "string"}, " Version", "0.6.1rc13")
+    # Business objects reference components and other business objects, components only reference components
+    targets = ("enum", "com", "bo") if module == "bo" else ("enum", "com")
+    number_of_fields = rng.randint(8, 25) if module == "bo" else rng.randint(3, 12)
+    for field_name in sorted(rng.sample(FIELD_NAMES, min(number_of_fields, len(FIELD_NAMES)))):
+        properties[field_name] = _nullable(_field(names, rng, targets), field_name.title())
+    return {
+        "description": f"Synthetic {module} {name}.",
+        "title": name,
+        "type": "object",
+        "additionalProperties": True,
+        "properties": properties,
+    }
+
+
+def generate_corpus(size: int, seed: int = 0) -> dict[str, bytes]:
+    """
+    Generate a corpus of `size` schemas. Returns the file contents by their path in the repository,
+    e.g. "src/bo4e_schemas/bo/Bo00000.json".
+    """
+    rng = random.Random(seed)
+    names = schema_names(size)
+    files = {}
+    for module, module_names in names.items():
+        for name in module_names:
+            if module == "enum":
+                schema = _enum_schema(name, rng)
+            else:
+                schema = _object_schema(module, name, names, rng)
+            files[f"{SCHEMAS_DIR}/{module}/{name}.json"] = json.dumps(schema, indent=2, ensure_ascii=False).encode()
+    return files
+
+
+def generate_config(size: int) -> dict:
+    """
+    Generate a config for a corpus of `size` schemas. The number of patterns grows with the corpus. It contains
+    literal patterns, patterns with a literal prefix and patterns without a literal prefix (see `bost.matching`).
+    """
+    names = schema_names(size)
+    non_nullable_fields = [f"bo\\.{name}\\._id" for name in names["bo"][::5]]
+    non_nullable_fields += [f"com\\.{name}\\..*" for name in names["com"][::20]]
+    non_nullable_fields.append(".*\\.bezeichnung")
+    return {
+        "nonNullableFields": non_nullable_fields,
+        "additionalFields": [
+            {
+                "pattern": "bo\\..*",
+                "fieldName": "zusatzAttribute",
+                "fieldDef": {
+                    "default": None,
+                    "anyOf": [{"type": "array", "items": {"type": "string"}}, {"type": "null"}],
+                },
+            },
+            {
+                "pattern": f"com\\.{names['com'][0]}",
+                "fieldName": "pflichtfeld",
+                "fieldDef": {"type": "string"},
+            },
+        ],
+        "additionalEnumItems": [
+            {"pattern": f"enum\\.{name}", "items": ["SONDERFALL", "UNBEKANNT"]} for name in names["enum"][::10]
+        ],
+    }
+
+
+def write_corpus(files: dict[str, bytes], directory: Path) -> None:
+    """
+    Write the files of a corpus into the directory, keeping their paths in the repository.
+    """
+    for path, content in files.items():
+        (directory / path).parent.mkdir(parents=True, exist_ok=True)
+        (directory / path).write_bytes(content)
+
+
+def main() -> None:
+    """
+    Write a corpus and its config.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("size", type=int)
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    write_corpus(generate_corpus(args.size, args.seed), args.output_dir)
+    (args.output_dir / "config.json").write_text(json.dumps(generate_config(args.size), indent=2))
+    print(f"Wrote {args.size} schemas to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+A local HTTP stand-in for GitHub to benchmark the pull pipeline without network access and rate limits.
+It serves a corpus (see `corpus.py`) as the raw files of a release and answers the two REST API requests of the tree
+discovery: the release lookup and the recursive git tree. `patched` points bost to the stand-in.
+"""
+
+import json
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+from unittest.mock import patch
+
+from github import Github
+
+from bost.cache import git_blob_sha
+from bost.pull import OWNER, REPO, _github_tree_query
+
+COMMIT = "0123456789abcdef0123456789abcdef01234567"
+""" The commit of the synthetic release """
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    server: "GithubStub"
+    # Keep the connections of the pooled sessions alive and don't delay the small responses
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Serve a raw file or an API response.
+        """
+        path = self.path.partition("?")[0]
+        body = self.server.responses.get(path)
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class GithubStub(ThreadingHTTPServer):
+    """
+    Serves the files of a corpus under `raw_url` and the release `version` under `api_url`.
+    Use it as a context manager to run it in a background thread.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, files: dict[str, bytes], version: str, host: str = "127.0.0.1"):
+        super().__init__((host, 0), _StubHandler)
+        self.raw_url = f"http://{host}:{self.server_address[1]}/raw"
+        self.api_url = f"http://{host}:{self.server_address[1]}/api"
+        repo_path = f"/api/repos/{OWNER}/{REPO}"
+        tree = [
+            {"path": path, "mode": "100644", "type": "blob", "sha": git_blob_sha(content), "size": len(content)}
+            for path, content in files.items()
+        ]
+        self.responses = {f"/raw/{COMMIT}/{path}": content for path, content in files.items()}
+        self.responses[f"{repo_path}/releases/tags/{version}"] = json.dumps(
+            {"tag_name": version, "title": version, "target_commitish": COMMIT}
+        ).encode()
+        self.responses[f"{repo_path}/git/trees/{COMMIT}"] = json.dumps(
+            {"sha": COMMIT, "tree": tree, "truncated": False}
+        ).encode()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def __enter__(self) -> "GithubStub":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+    @contextmanager
+    def patched(self) -> Iterator[None]:
+        """
+        Let bost query the stand-in instead of GitHub. The cached discovery results are cleared on entry and exit.
+        """
+        repo = Github(base_url=self.api_url).get_repo(f"{OWNER}/{REPO}", lazy=True)
+        _github_tree_query.cache_clear()
+        try:
+            with patch("bost.pull.RAW_URL", self.raw_url), patch("bost.pull.get_source_repo", lambda token: repo):
+                yield
+        finally:
+            _github_tree_query.cache_clear()
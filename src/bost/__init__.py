@@ -3,6 +3,7 @@ BO4E-Schemas-Tool (`bost` as CLI) is a tool to conveniently download and modify
 For more information, see the README.md file.
 """
 
-__all__ = ["main"]
+__all__ = ["main", "main_batch", "pull_async"]
 
-from .__main__ import main
+from .__main__ import main, main_batch
+from .aio import pull as pull_async
@@ -3,26 +3,118 @@ This module is the entry point for the bost command line interface.
 """
 
 import re
-import shutil
+import threading
+import time
 from pathlib import Path
+from typing import Sequence
 
 import click
 
-from bost.cache import is_cache_dir_valid
-from bost.config import AdditionalEnumItem, AdditionalField, load_config
+from bost.batch import BatchTarget, process_batch
+from bost.cache import (
+    collect_garbage,
+    evict_cache,
+    get_cache_size,
+    get_cached_versions,
+    is_cache_dir_valid,
+    remove_cached_versions,
+)
+from bost.config import load_config
+from bost.incremental import plan_incremental
+from bost.interning import intern_schemas
 from bost.logger import logger
-from bost.operations import add_additional_enum_items, add_additional_property, field_to_non_nullable, update_references
-from bost.pull import SchemaMetadata, additional_schema_iterator, resolve_latest_version, schema_iterator
-from bost.schema import AnyOf, Object, SchemaRootObject, StrEnum
+from bost.output import save_schemas
+from bost.processing import (  # pylint: disable=unused-import  # re-exported for backwards compatibility
+    add_and_select_schemas,
+    fresh_copy,
+    process_schemas,
+    transform_all_additional_enum_items,
+    transform_all_additional_fields,
+    transform_all_non_nullable_fields,
+)
+from bost.profiling import PHASES, phase, profiled
+from bost.pull import (
+    DEFAULT_JOBS,
+    DiscoveryMode,
+    SchemaMetadata,
+    SourceMode,
+    download_schemas,
+    file_url_to_path,
+    resolve_latest_version,
+    source_schema_iterator,
+)
+from bost.serve import DEFAULT_HOST, DEFAULT_MAX_VERSIONS, DEFAULT_PORT, SchemaStore, serve
+from bost.watch import DEFAULT_POLL_INTERVAL, config_files, watch_files
+
+
+class DefaultCommandGroup(click.Group):
+    """
+    A command group which invokes a default command if the first argument is not the name of a sub command.
+    This way `bost -o output` keeps working as a shorthand for `bost pull -o output`.
+    """
+
+    def __init__(self, *args, default_command: str, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.default_command = default_command
+
+    def parse_args(self, ctx: click.Context, args: list[str]) -> list[str]:
+        group_options = [*ctx.help_option_names, "--version"]
+        if len(args) == 0 or (args[0] not in self.commands and args[0] not in group_options):
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
+
+
+class ByteSize(click.ParamType):
+    """
+    A size in bytes. Accepts plain numbers or numbers with one of the suffixes K, M or G (e.g. "500M").
+    """
+
+    name = "size"
+    units = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+    def convert(self, value, param, ctx) -> int:
+        if isinstance(value, int):
+            return value
+        match = re.fullmatch(r"(?P<number>\d+)\s*(?P<unit>[KMG]?)B?", value.strip(), flags=re.IGNORECASE)
+        if match is None:
+            self.fail(f"{value!r} is not a valid size. Use e.g. 1048576, 500M or 2G.", param, ctx)
+        return int(match.group("number")) * self.units[match.group("unit").upper()]
+
+
+class SourceDir(click.ParamType):
+    """
+    A local mirror of the BO4E-Schemas. Accepts a path or a file:// URL of an existing directory.
+    """
+
+    name = "directory"
+
+    def convert(self, value, param, ctx) -> Path:
+        if isinstance(value, Path):
+            return value
+        path = file_url_to_path(value)
+        if not path.is_dir():
+            self.fail(f"{value!r} is not a directory.", param, ctx)
+        return path
+
+
+@click.group(cls=DefaultCommandGroup, default_command="pull")
+@click.version_option(package_name="BO4E-Schema-Tool")
+def main_command_line() -> None:
+    """
+    Entry point for the bost command line interface.
+    If no command is given, `pull` is invoked. See `bost pull --help` for its options.
+    """
 
 
-@click.command()
+@main_command_line.command("pull")
 @click.option(
     "--output",
     "-o",
-    help="Output directory to pull the JSON schemas into",
+    help="Output directory to pull the JSON schemas into. Can be given multiple times together with --config-file "
+    "to generate several outputs from one pull. The n-th output uses the n-th config file.",
     type=click.Path(file_okay=False, path_type=Path),
     required=True,
+    multiple=True,
 )
 @click.option(
     "--target-version",
@@ -34,10 +126,9 @@ from bost.schema import AnyOf, Object, SchemaRootObject, StrEnum
 @click.option(
     "--config-file",
     "-c",
-    help="Path to the config file",
+    help="Path to the config file. Can be given multiple times, see --output.",
     type=click.Path(exists=True, dir_okay=False, path_type=Path),
-    required=False,
-    default=None,
+    multiple=True,
 )
 @click.option(
     "--update-refs/--no-update-refs",
@@ -76,109 +167,384 @@ from bost.schema import AnyOf, Object, SchemaRootObject, StrEnum
     "--token",
     help="A GitHub Access token to authenticate with the GitHub API. "
     "Use this if you have problems with the rate limit. "
+    "Several tokens can be given separated by commas, the requests are distributed across them. "
     "Alternatively, you can set the environment variable GITHUB_ACCESS_TOKEN.",
     type=str,
     required=False,
     default=None,
     envvar="GITHUB_ACCESS_TOKEN",
 )
+@click.option(
+    "--jobs",
+    "-j",
+    help="Number of schema files which are downloaded and written concurrently.",
+    type=click.IntRange(min=1),
+    default=DEFAULT_JOBS,
+    show_default=True,
+)
+@click.option(
+    "--source",
+    help="Where the schema files are pulled from. 'github' downloads every schema file separately. "
+    "'archive' downloads the release archive once and extracts the schema files from it.",
+    type=click.Choice(["github", "archive"]),
+    default="github",
+    show_default=True,
+)
+@click.option(
+    "--discovery",
+    help="How the schema files of the release are discovered. 'tree' builds the file list from a single "
+    "recursive git tree request. 'contents' queries the contents API once per directory.",
+    type=click.Choice(["tree", "contents"]),
+    default="tree",
+    show_default=True,
+)
+@click.option(
+    "--source-dir",
+    help="Read the schema files from a local mirror instead of GitHub, e.g. for hosts without network access. "
+    "Accepts a path or a file:// URL. The mirror contains the schemas of each version in "
+    "<version>/src/bo4e_schemas or is a checkout of the BO4E-Schemas repository. "
+    "Overrides --source, --discovery and --cache-dir.",
+    type=SourceDir(),
+    default=None,
+)
+@click.option(
+    "--cache-max-size",
+    help="Maximum total size of the cached files, e.g. 500M or 2G. If exceeded, the least recently used versions "
+    "are removed from the cache.",
+    type=ByteSize(),
+    required=False,
+    default=None,
+)
+@click.option(
+    "--cache-max-versions",
+    help="Maximum number of versions in the cache. If exceeded, the least recently used versions are removed "
+    "from the cache.",
+    type=click.IntRange(min=1),
+    required=False,
+    default=None,
+)
+@click.option(
+    "--include",
+    help="Regex pattern which is (full-)matched to the module path of the schemas, e.g. 'bo\\.Angebot'. "
+    "Only the matching schemas and the schemas they reference are pulled. Can be given multiple times.",
+    type=str,
+    multiple=True,
+)
+@click.option(
+    "--exclude",
+    help="Regex pattern of schemas which are not pulled unless they are referenced by another pulled schema. "
+    "Can be given multiple times.",
+    type=str,
+    multiple=True,
+)
+@click.option(
+    "--watch",
+    help="Keep running and regenerate the schemas whenever the config file or a file referenced by it changes. "
+    "Only the schemas affected by the changed config entries are processed again. Requires --config-file.",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--incremental",
+    help="Only process and save the schemas whose inputs (raw schema, matching config entries, options or "
+    "referenced schemas) changed since the last run. The inputs are stored in the manifest of the output directory.",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--profile",
+    help="Write a JSON report with the wall time, CPU time, peak memory, HTTP requests and cache hits of each phase "
+    "to this file. Tracing the memory slows the run down.",
+    type=click.Path(dir_okay=False, path_type=Path),
+    required=False,
+    default=None,
+)
+@click.option(
+    "--profile-phase",
+    help="Additionally profile this phase with cProfile. The stats are written next to the --profile report, "
+    "e.g. 'report.download.prof'.",
+    type=click.Choice(PHASES),
+    required=False,
+    default=None,
+)
 # If you are modifying any of the help descriptions, please execute the test test_main.py -> test_main_help().
 # Update the README.md by copying the output of this test into the README.md.
-@click.version_option(package_name="BO4E-Schema-Tool")
-def main_command_line(*args, **kwargs) -> None:
+def pull_command_line(output: tuple[Path, ...], config_file: tuple[Path, ...], **kwargs) -> None:
     """
-    Entry point for the bost command line interface.
+    Pull the BO4E-Schemas of a version and apply the operations defined in the config file.
+    This is the default command.
+    """
+    if len(output) == 1 and len(config_file) <= 1:
+        main(output=output[0], config_file=config_file[0] if len(config_file) == 1 else None, **kwargs)
+        return
+    if len(output) != len(config_file):
+        raise click.UsageError("Every --output needs exactly one --config-file to generate several outputs.")
+    incremental, watch = kwargs.pop("incremental"), kwargs.pop("watch")
+    if incremental or watch:
+        raise click.UsageError("--incremental and --watch support only one --output.")
+    profile, profile_phase = kwargs.pop("profile"), kwargs.pop("profile_phase")
+    if profile is not None or profile_phase is not None:
+        raise click.UsageError("--profile supports only one --output.")
+    main_batch(list(zip(config_file, output)), **kwargs)
+
+
+@main_command_line.command("serve")
+@click.option("--host", help="Host to listen on", type=str, default=DEFAULT_HOST, show_default=True)
+@click.option(
+    "--port", "-p", help="Port to listen on", type=click.IntRange(0, 65535), default=DEFAULT_PORT, show_default=True
+)
+@click.option(
+    "--config-file",
+    "-c",
+    "config_files_",
+    help="Path to a config file. The config is selected by its file name without extension, "
+    "e.g. '?config=my_config' for 'my_config.json'. Can be given multiple times.",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    multiple=True,
+)
+@click.option(
+    "--update-refs/--no-update-refs",
+    "-r/-R",
+    help="Automatically update the references in the schema files. See `bost pull --help`.",
+    is_flag=True,
+    default=True,
+)
+@click.option(
+    "--set-default-version/--no-set-default-version",
+    "-d/-D",
+    help="Automatically set or overrides the default version for '_version' fields. See `bost pull --help`.",
+    is_flag=True,
+    default=True,
+)
+@click.option(
+    "--cache-dir",
+    help="Path to the optional cache dir. If not set the cache is disabled.",
+    type=click.Path(file_okay=False, path_type=Path),
+    required=False,
+    default=None,
+)
+@click.option(
+    "--token",
+    help="A GitHub Access token to authenticate with the GitHub API. "
+    "Several tokens can be given separated by commas. "
+    "Alternatively, you can set the environment variable GITHUB_ACCESS_TOKEN.",
+    type=str,
+    required=False,
+    default=None,
+    envvar="GITHUB_ACCESS_TOKEN",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    help="Number of schema files which are downloaded concurrently.",
+    type=click.IntRange(min=1),
+    default=DEFAULT_JOBS,
+    show_default=True,
+)
+@click.option(
+    "--source",
+    help="Where the schema files are pulled from. See `bost pull --help`.",
+    type=click.Choice(["github", "archive"]),
+    default="github",
+    show_default=True,
+)
+@click.option(
+    "--discovery",
+    help="How the schema files of the release are discovered. See `bost pull --help`.",
+    type=click.Choice(["tree", "contents"]),
+    default="tree",
+    show_default=True,
+)
+@click.option(
+    "--source-dir",
+    help="Read the schema files from a local mirror instead of GitHub. See `bost pull --help`.",
+    type=SourceDir(),
+    default=None,
+)
+@click.option(
+    "--max-versions",
+    help="Number of versions which are kept in memory. If another version is requested, the least recently "
+    "requested version is evicted.",
+    type=click.IntRange(min=1),
+    default=DEFAULT_MAX_VERSIONS,
+    show_default=True,
+)
+# pylint: disable=too-many-arguments
+def serve_command_line(
+    host: str,
+    port: int,
+    config_files_: tuple[Path, ...],
+    update_refs: bool,
+    set_default_version: bool,
+    cache_dir: Path | None,
+    token: str | None,
+    jobs: int,
+    source: SourceMode,
+    discovery: DiscoveryMode,
+    source_dir: Path | None,
+    max_versions: int,
+) -> None:
+    """
+    Serve the transformed BO4E-Schemas over HTTP, e.g. GET /v202401.1.0/bo/Angebot.json?config=my_config.
+    The pulled schemas and the transformed files are kept in memory, so every version is pulled only once.
+    """
+    configs: dict[str, Path] = {}
+    for config_file in config_files_:
+        if config_file.stem in configs:
+            raise click.BadParameter(f"Config name {config_file.stem} is not unique", param_hint="--config-file")
+        configs[config_file.stem] = config_file
+    store = SchemaStore(
+        configs, cache_dir, token, jobs, source, discovery, update_refs, set_default_version, source_dir, max_versions
+    )
+    serve(store, host, port)
+
+
+@main_command_line.group("cache")
+def cache_command_line() -> None:
+    """
+    Inspect and prune a cache directory.
     """
-    main(*args, **kwargs)
-
-
-def transform_all_non_nullable_fields(required_field_patters: list[str], schemas: dict[str, SchemaMetadata]):
-    """
-    Apply the required field patterns to all schemas.
-    """
-    field_paths = [
-        (field_path, field_name, schema)
-        for schema in schemas.values()
-        for field_path, field_name in schema.field_paths()
-    ]
-    for pattern in required_field_patters:
-        compiled_pattern = re.compile(pattern)
-        matches = 0
-        for field_path, field_name, schema in field_paths:
-            if (
-                compiled_pattern.fullmatch(field_path)
-                and isinstance(schema.schema_parsed, SchemaRootObject)
-                and isinstance(schema.schema_parsed.properties[field_name], AnyOf)
-                and "default" in schema.schema_parsed.properties[field_name].__pydantic_fields_set__
-            ):
-                matches += 1
-                field_to_non_nullable(schema.schema_parsed, field_name)
-                logger.info("Applied pattern '%s' to field %s", pattern, field_path)
-        if matches == 0:
-            logger.warning("Pattern '%s' did not match any fields", pattern)
-        else:
-            logger.info("Pattern '%s' matched %d fields", pattern, matches)
-
-
-def transform_all_additional_fields(additional_fields: list[AdditionalField], schemas: dict[str, SchemaMetadata]):
-    """
-    Apply the additional field patterns to all schemas and adds the respective field definition.
-    """
-    schema_paths = [(schema.module_name, schema) for schema in schemas.values()]
-    for additional_field in additional_fields:
-        compiled_pattern = re.compile(additional_field.pattern)
-        matches = 0
-        for schema_path, schema in schema_paths:
-            if compiled_pattern.fullmatch(schema_path) and isinstance(schema.schema_parsed, Object):
-                matches += 1
-                add_additional_property(schema.schema_parsed, additional_field.field_def, additional_field.field_name)
-
-                if (
-                    "default" not in additional_field.field_def.__pydantic_fields_set__
-                    and additional_field.field_name not in schema.schema_parsed.required
-                ):
-                    if "required" not in schema.schema_parsed.__pydantic_fields_set__:
-                        schema.schema_parsed.required = []
-                    schema.schema_parsed.required.append(additional_field.field_name)
-                logger.info(
-                    "Applied pattern '%s' to schema %s. Added field %s",
-                    additional_field.pattern,
-                    schema_path,
-                    additional_field.field_name,
-                )
-        if matches == 0:
-            logger.warning("Pattern '%s' did not match any fields", additional_field.pattern)
-        else:
-            logger.info("Pattern '%s' matched %d fields", additional_field.pattern, matches)
-
-
-def transform_all_additional_enum_items(
-    additional_enum_items: list[AdditionalEnumItem], schemas: dict[str, SchemaMetadata]
-):
-    """
-    Apply the additional enum item patterns to all schemas and adds the respective enum items.
-    """
-    schema_paths = [(schema.module_name, schema) for schema in schemas.values()]
-    for additional_item in additional_enum_items:
-        compiled_pattern = re.compile(additional_item.pattern)
-        matches = 0
-        for schema_path, schema in schema_paths:
-            if compiled_pattern.fullmatch(schema_path) and isinstance(schema.schema_parsed, StrEnum):
-                matches += 1
-                add_additional_enum_items(schema.schema_parsed, additional_item.items)
-                logger.info(
-                    "Applied pattern '%s' to schema %s. Added enum items %s",
-                    additional_item.pattern,
-                    schema_path,
-                    str(additional_item.items),
-                )
-        if matches == 0:
-            logger.warning("Pattern '%s' did not match any fields", additional_item.pattern)
-        else:
-            logger.info("Pattern '%s' matched %d fields", additional_item.pattern, matches)
 
 
-# pylint: disable=too-many-branches, too-many-arguments
+@cache_command_line.command("list")
+@click.option(
+    "--cache-dir",
+    help="Path to the cache dir.",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    required=True,
+)
+def cache_list_command_line(cache_dir: Path) -> None:
+    """
+    List all cached versions, starting with the most recently used one.
+    """
+    cached_versions = get_cached_versions(cache_dir)
+    for version, (cached_version, size) in sorted(
+        cached_versions.items(), key=lambda item: item[1][0].last_used, reverse=True
+    ):
+        click.echo(
+            f"{version}\tlast used {cached_version.last_used:%Y-%m-%d %H:%M:%S}\t"
+            f"{len(list(cached_version.file_tree.all_files()))} files\t{size} bytes"
+        )
+    click.echo(f"{len(cached_versions)} versions, {get_cache_size(cache_dir)} bytes in total")
+
+
+@cache_command_line.command("prune")
+@click.option(
+    "--cache-dir",
+    help="Path to the cache dir.",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    required=True,
+)
+@click.option(
+    "--max-size",
+    help="Remove the least recently used versions until the cached files take at most this size, e.g. 500M.",
+    type=ByteSize(),
+    required=False,
+    default=None,
+)
+@click.option(
+    "--max-versions",
+    help="Remove the least recently used versions until at most this number of versions is cached.",
+    type=click.IntRange(min=0),
+    required=False,
+    default=None,
+)
+@click.option(
+    "--version",
+    "versions",
+    help="Remove this version from the cache. Can be specified multiple times.",
+    type=str,
+    multiple=True,
+)
+def cache_prune_command_line(
+    cache_dir: Path, max_size: int | None, max_versions: int | None, versions: tuple[str, ...]
+) -> None:
+    """
+    Remove versions from the cache and delete files which are not used by any cached version anymore.
+    """
+    removed = remove_cached_versions(cache_dir, versions)
+    removed.extend(evict_cache(cache_dir, max_size=max_size, max_versions=max_versions))
+    freed = collect_garbage(cache_dir)
+    for version in removed:
+        click.echo(f"Removed {version}")
+    if freed > 0:
+        click.echo(f"Removed {freed} bytes of unreferenced files")
+
+
+# pylint: disable=too-many-arguments
+def watch_config(
+    schemas: dict[str, SchemaMetadata],
+    output: Path,
+    config_file: Path,
+    target_version: str,
+    update_refs: bool,
+    set_default_version: bool,
+    clear_output: bool,
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    jobs: int = DEFAULT_JOBS,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    stop_event: threading.Event | None = None,
+) -> None:
+    """
+    Regenerate the schemas on every change of the config file or the files referenced by it.
+    The schemas are parsed only once and kept unmodified in memory. On every change, only the schemas whose inputs
+    changed (see `bost.incremental`) are copied, processed and saved again. The config patterns are still checked for
+    matches against all schemas, so a pattern without any match is warned about even if no schema is processed again.
+    Runs until the `stop_event` is set or the process is interrupted.
+    """
+    for schema in schemas.values():
+        assert schema.schema_parsed is not None
+    is_first_run = True
+
+    def regenerate():
+        nonlocal is_first_run
+        start = time.perf_counter()
+        config = load_config(config_file)
+        namespace = add_and_select_schemas(schemas, config, config_file, output, target_version, include, exclude, jobs)
+        clear = clear_output and is_first_run
+        plan = plan_incremental(
+            namespace, config, output, target_version, update_refs, set_default_version, clear, jobs
+        )
+        # The original schemas must stay unmodified for the next run
+        stale = {
+            name: fresh_copy(schema) if schemas.get(name) is schema else schema for name, schema in plan.stale.items()
+        }
+        process_schemas(stale, config, target_version, update_refs, set_default_version, namespace=namespace)
+        save_schemas(stale.values(), output, clear, jobs, unchanged=plan.unchanged, records=plan.records)
+        is_first_run = False
+        logger.info("Regenerated %d schemas in %.0f ms", len(stale), (time.perf_counter() - start) * 1000)
+
+    watch_files(lambda: config_files(config_file), regenerate, poll_interval, stop_event)
+
+
+# pylint: disable=too-many-arguments
+def _source_schemas(
+    target_version: str,
+    output: Path,
+    cache_dir: Path | None,
+    token: str | None,
+    source: SourceMode,
+    discovery: DiscoveryMode,
+    source_dir: Path | None = None,
+) -> tuple[str, Path | None, dict[str, SchemaMetadata]]:
+    """
+    Resolve the target version and get the schemas of the version from the configured source.
+    Returns the resolved version, the cache dir (None if it is not valid for the version or if the schemas are read
+    from a local mirror) and the schemas.
+    """
+    # The cache dir is validated first since the responses of the GitHub API are cached in it as well
+    if source_dir is not None or not is_cache_dir_valid(cache_dir, target_version):
+        cache_dir = None
+    if target_version == "latest":
+        with phase("resolve_version"):
+            target_version = resolve_latest_version(token, source_dir, cache_dir)
+    with phase("discovery"):
+        schemas = dict(source_schema_iterator(target_version, output, cache_dir, token, source, discovery, source_dir))
+    return target_version, cache_dir, schemas
+
+
+# pylint: disable=too-many-arguments, too-many-locals
 def main(
     output: Path,
     target_version: str,
@@ -188,64 +554,122 @@ def main(
     config_file: Path | None = None,
     cache_dir: Path | None = None,
     token: str | None = None,
+    jobs: int = DEFAULT_JOBS,
+    discovery: DiscoveryMode = "tree",
+    source: SourceMode = "github",
+    cache_max_size: int | None = None,
+    cache_max_versions: int | None = None,
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    incremental: bool = False,
+    watch: bool = False,
+    profile: Path | None = None,
+    profile_phase: str | None = None,
+    source_dir: Path | None = None,
 ) -> None:
     """
     Pull the schemas from the BO4E repository and apply the operations defined in the config file.
+    If `include` or `exclude` patterns are given, only the matching schemas and the schemas they reference are pulled.
+    In incremental mode, only the schemas whose inputs changed since the last run are processed and saved.
+    In watch mode, the schemas are regenerated on every change of the config file until the process is interrupted.
+    If `profile` is set, a JSON report with the wall time, CPU time, peak memory and HTTP traffic of each phase is
+    written to this file. `profile_phase` additionally profiles one phase with cProfile (see `bost.profiling`).
+    If `source_dir` is set, the schemas are read from this local mirror without any network access.
     """
-    if config_file is not None:
-        config = load_config(config_file)
-    else:
-        config = None
+    if watch and config_file is None:
+        raise ValueError("The watch mode requires a config file")
+    if profile_phase is not None and profile is None:
+        raise ValueError("Profiling a phase requires a profile report file")
+    with profiled(profile, profile_phase):
+        if config_file is not None:
+            config = load_config(config_file)
+        else:
+            config = None
 
-    if target_version == "latest":
-        target_version = resolve_latest_version(token=token)
+        target_version, cache_dir, schemas = _source_schemas(
+            target_version, output, cache_dir, token, source, discovery, source_dir
+        )
+        if watch:
+            assert config_file is not None
+            with phase("download"):
+                download_schemas(schemas.values(), jobs=jobs)
+            with phase("parse"):
+                intern_schemas(schemas.values())
+            watch_config(
+                schemas,
+                output,
+                config_file,
+                target_version,
+                update_refs,
+                set_default_version,
+                clear_output,
+                include,
+                exclude,
+                jobs,
+            )
+            return
+        with phase("select"):
+            schemas = add_and_select_schemas(
+                schemas, config, config_file, output, target_version, include, exclude, jobs
+            )
+        plan = None
+        if incremental:
+            with phase("plan"):
+                plan = plan_incremental(
+                    schemas, config, output, target_version, update_refs, set_default_version, clear_output, jobs
+                )
+        processed = plan.stale if plan is not None else schemas
+        with phase("download"):
+            download_schemas(processed.values(), jobs=jobs)
+        with phase("parse"):
+            for schema in processed.values():
+                assert schema.schema_parsed is not None
+        if cache_dir is not None and (cache_max_size is not None or cache_max_versions is not None):
+            evict_cache(cache_dir, max_size=cache_max_size, max_versions=cache_max_versions, keep=target_version)
 
-    if not is_cache_dir_valid(cache_dir, target_version):
-        cache_dir = None
-    schemas = dict(schema_iterator(target_version, output, cache_dir, token=token))
-
-    if config is not None:
-        schemas.update(additional_schema_iterator(config, config_file, output))
-        logger.info("Added all additional models")
-        transform_all_additional_fields(config.additional_fields, schemas)  # type: ignore[arg-type]
-        # the load_config function ensures that the references are resolved.
-        logger.info("Added all additional fields")
-        transform_all_non_nullable_fields(config.non_nullable_fields, schemas)
-        logger.info("Transformed all non nullable fields")
-        transform_all_additional_enum_items(config.additional_enum_items, schemas)
-        logger.info("Added all additional enum items")
-
-    if update_refs:
-        for schema in schemas.values():
-            update_references(schema, schemas, target_version)
-            schema.schema_parsed.defs = {}
-            schema.schema_parsed.__pydantic_fields_set__.discard("defs")
-            # When updating the references, the definitions are not needed anymore since they are replaced
-            # by relative references.
-        logger.info("Updated github references")
-
-    if set_default_version:
-        for schema in schemas.values():
-            if isinstance(schema.schema_parsed, Object) and "_version" in schema.schema_parsed.properties:
-                schema.schema_parsed.properties["_version"].default = target_version
-        logger.info("Set default versions to %s", target_version)
-
-    if clear_output and output.exists():
-        shutil.rmtree(output)
-        logger.info("Cleared output directory")
-    for schema in schemas.values():
-        schema.save()
-        logger.info("Saved %s", schema.file_path)
+        process_schemas(processed, config, target_version, update_refs, set_default_version, namespace=schemas)
+        with phase("save"):
+            if plan is not None:
+                save_schemas(
+                    processed.values(), output, clear_output, jobs, unchanged=plan.unchanged, records=plan.records
+                )
+            else:
+                save_schemas(processed.values(), output, clear_output, jobs=jobs)
 
-    if set_default_version:
-        for schema in schemas.values():
-            if isinstance(schema.schema_parsed, Object) and "_version" in schema.schema_parsed.properties:
-                schema.schema_parsed.properties["_version"].default = target_version
-        logger.info("Set default versions to %s", target_version)
 
-    for schema in schemas.values():
-        schema.save()
-        logger.info("Saved %s", schema.file_path)
+# pylint: disable=too-many-arguments
+def main_batch(
+    targets: Sequence[BatchTarget],
+    target_version: str,
+    update_refs: bool,
+    set_default_version: bool,
+    clear_output: bool,
+    cache_dir: Path | None = None,
+    token: str | None = None,
+    jobs: int = DEFAULT_JOBS,
+    discovery: DiscoveryMode = "tree",
+    source: SourceMode = "github",
+    cache_max_size: int | None = None,
+    cache_max_versions: int | None = None,
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    source_dir: Path | None = None,
+) -> None:
+    """
+    Pull the schemas from the BO4E repository once and generate one flavour of them per target, i.e. per pair of
+    config file and output directory. See `bost.batch` for details.
+    The other arguments have the same meaning as for `main`.
+    """
+    if len(targets) == 0:
+        raise ValueError("At least one target is required")
+    target_version, cache_dir, schemas = _source_schemas(
+        target_version, targets[0][1], cache_dir, token, source, discovery, source_dir
+    )
+    if cache_dir is not None and (cache_max_size is not None or cache_max_versions is not None):
+        evict_cache(cache_dir, max_size=cache_max_size, max_versions=cache_max_versions, keep=target_version)
+    process_batch(
+        schemas, targets, target_version, update_refs, set_default_version, clear_output, include, exclude, jobs
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+"""
+Contains an asynchronous variant of the pull pipeline to use bost from an asyncio based application.
+The blocking parts (GitHub API queries, file downloads, transformations and file writes) are executed on worker threads
+so that they don't block the event loop. All downloads share one pooled session.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Sequence
+
+from bost.cache import is_cache_dir_valid
+from bost.config import load_config
+from bost.incremental import plan_incremental
+from bost.logger import logger
+from bost.output import save_schemas
+from bost.processing import add_and_select_schemas, process_schemas
+from bost.pull import (
+    DEFAULT_JOBS,
+    DiscoveryMode,
+    SchemaMetadata,
+    SourceMode,
+    get_session,
+    resolve_latest_version,
+    source_schema_iterator,
+)
+
+
+# pylint: disable=too-many-arguments, too-many-locals
+async def pull(
+    output: Path,
+    target_version: str = "latest",
+    *,
+    update_refs: bool = True,
+    set_default_version: bool = True,
+    clear_output: bool = False,
+    config_file: Path | None = None,
+    cache_dir: Path | None = None,
+    token: str | None = None,
+    concurrency: int = DEFAULT_JOBS,
+    discovery: DiscoveryMode = "tree",
+    source: SourceMode = "github",
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    incremental: bool = False,
+    source_dir: Path | None = None,
+) -> dict[str, SchemaMetadata]:
+    """
+    Pull the schemas from the BO4E repository and apply the operations defined in the config file.
+    This is the asynchronous counterpart of `bost.main`. At most `concurrency` requests are in flight at the same time,
+    and they all use the same keep-alive connection pool.
+    If `include` or `exclude` patterns are given, only the matching schemas and the schemas they reference are pulled.
+    In incremental mode, only the schemas whose inputs changed since the last run are processed and saved.
+    If `source_dir` is set, the schemas are read from this local mirror without any network access.
+    Returns the processed schemas by their class name.
+    """
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bost") as executor:
+
+        async def run(func, *args):
+            return await loop.run_in_executor(executor, func, *args)
+
+        config = await run(load_config, config_file) if config_file is not None else None
+        if source_dir is not None or not await run(is_cache_dir_valid, cache_dir, target_version):
+            cache_dir = None
+        if target_version == "latest":
+            target_version = await run(resolve_latest_version, token, source_dir, cache_dir)
+        schemas: dict[str, SchemaMetadata] = dict(
+            await run(
+                lambda: list(
+                    source_schema_iterator(target_version, output, cache_dir, token, source, discovery, source_dir)
+                )
+            )
+        )
+        schemas = await run(
+            add_and_select_schemas,
+            schemas,
+            config,
+            config_file,
+            output,
+            target_version,
+            include,
+            exclude,
+            concurrency,
+        )
+
+        plan = None
+        if incremental:
+            plan = await run(
+                plan_incremental,
+                schemas,
+                config,
+                output,
+                target_version,
+                update_refs,
+                set_default_version,
+                clear_output,
+                concurrency,
+            )
+        namespace, schemas = schemas, plan.stale if plan is not None else schemas
+
+        session = get_session(concurrency)
+        pending = [schema for schema in schemas.values() if not schema.is_loaded and not schema.has_cached_model]
+        await asyncio.gather(*(run(schema.load_schema_text, session) for schema in pending))
+        logger.info("Loaded %d schemas with a concurrency of %d", len(pending), concurrency)
+
+        await run(process_schemas, schemas, config, target_version, update_refs, set_default_version, namespace)
+        if plan is not None:
+            await run(
+                lambda: save_schemas(
+                    schemas.values(), output, clear_output, concurrency, unchanged=plan.unchanged, records=plan.records
+                )
+            )
+        else:
+            await run(save_schemas, schemas.values(), output, clear_output, concurrency)
+    return schemas
@@ -0,0 +1,125 @@
+"""
+Contains the batch mode which generates several flavours of the schemas from one pull, each with its own config file
+and output directory.
+The release is downloaded and parsed only once. The operations which don't depend on a config (reference and version
+updates) are applied once to a shared copy of the schemas. For each config, only the schemas touched by its operations
+are copied and processed again. All other schemas are shared between the outputs. Since the sub-schemas are interned
+(see `bost.interning`), the copies only duplicate the nodes which are actually modified.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Sequence
+
+from bost.config import AdditionalField, Config, load_config
+from bost.interning import intern_schemas
+from bost.logger import logger
+from bost.matching import PatternIndex
+from bost.output import ChangeSet, save_schemas
+from bost.processing import add_and_select_schemas, fresh_copy, process_schemas
+from bost.pull import DEFAULT_JOBS, SchemaMetadata, download_schemas
+from bost.schema import Object
+
+BatchTarget = tuple[Path, Path]
+""" A config file and the output directory for the schemas generated with it """
+
+
+def touched_by_config(schemas: dict[str, SchemaMetadata], config: Config) -> set[str]:
+    """
+    Get the names of the schemas which may be changed by the operations of the config, i.e. the schemas matching an
+    additional field or additional enum item pattern and the schemas with a field matching a non-nullable pattern.
+    """
+    additional_field_index = PatternIndex(
+        [
+            additional_field.pattern
+            for additional_field in config.additional_fields
+            if isinstance(additional_field, AdditionalField)
+        ]
+    )
+    enum_item_index = PatternIndex([item.pattern for item in config.additional_enum_items])
+    non_nullable_index = PatternIndex(config.non_nullable_fields)
+    touched = set()
+    for name, schema in schemas.items():
+        module_name = schema.module_name
+        schema_parsed = schema.schema_parsed
+        if len(additional_field_index.match(module_name)) > 0 or len(enum_item_index.match(module_name)) > 0:
+            touched.add(name)
+        elif isinstance(schema_parsed, Object) and any(
+            len(non_nullable_index.match(f"{module_name}.{field_name}")) > 0 for field_name in schema_parsed.properties
+        ):
+            touched.add(name)
+    return touched
+
+
+def with_output(schema: SchemaMetadata, output: Path) -> SchemaMetadata:
+    """
+    Get a shallow copy of the metadata with the file path in another output directory.
+    The copy shares the parsed schema with the original.
+    """
+    *module, class_name = schema.module_path
+    return schema.model_copy(update={"file_path": output.joinpath(*module, f"{class_name}.json")})
+
+
+# pylint: disable=too-many-arguments, too-many-locals
+def process_batch(
+    schemas: dict[str, SchemaMetadata],
+    targets: Sequence[BatchTarget],
+    target_version: str,
+    update_refs: bool,
+    set_default_version: bool,
+    clear_output: bool,
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    jobs: int = DEFAULT_JOBS,
+) -> dict[Path, ChangeSet]:
+    """
+    Apply the config of every target to the pulled schemas and save them into the respective output directory.
+    The `schemas` are left unmodified. The targets are processed and saved in parallel.
+    Returns the changes by output directory.
+    """
+    outputs = [output for _, output in targets]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError("The output directories of a batch must be distinct")
+    configs = {output: load_config(config_file) for config_file, output in targets}
+    namespaces = {
+        output: add_and_select_schemas(
+            schemas, configs[output], config_file, output, target_version, include, exclude, jobs
+        )
+        for config_file, output in targets
+    }
+    shared_names = {
+        name for namespace in namespaces.values() for name, schema in namespace.items() if schemas.get(name) is schema
+    }
+    download_schemas((schemas[name] for name in shared_names), jobs=jobs)
+    # The copies of the schemas share the sub-schemas which aren't modified
+    intern_schemas(schemas[name] for name in shared_names)
+    shared = {name: fresh_copy(schema) for name, schema in schemas.items() if name in shared_names}
+    process_schemas(shared, None, target_version, update_refs, set_default_version)
+
+    def apply(config_file: Path, output: Path) -> ChangeSet:
+        namespace = namespaces[output]
+        touched = touched_by_config(namespace, configs[output])
+        processed = {
+            name: fresh_copy(schema) if schemas.get(name) is schema else schema
+            for name, schema in namespace.items()
+            if name in touched or schemas.get(name) is not schema
+        }
+        process_schemas(
+            processed, configs[output], target_version, update_refs, set_default_version, namespace=namespace
+        )
+        logger.info(
+            "Processed %d of %d schemas for config %s, the others are shared",
+            len(processed),
+            len(namespace),
+            config_file,
+        )
+        return save_schemas(
+            (with_output(processed.get(name) or shared[name], output) for name in namespace),
+            output,
+            clear_output,
+            jobs,
+        )
+
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        futures = {output: executor.submit(apply, config_file, output) for config_file, output in targets}
+        return {output: future.result() for output, future in futures.items()}
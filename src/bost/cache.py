@@ -1,20 +1,82 @@
 """
 Implement functionality to cache the queried data from GitHub.
+The cache directory can hold several BO4E versions side by side. The raw schema files are stored by their git blob SHA
+and are shared between the versions. Each version has its own file tree index in the cache file.
+Additionally, the already validated schema models are stored as JSON together with the class of every node, so that
+they can be rebuilt without running the validation again on warm runs.
+The responses of the GitHub API are stored together with their ETag and Last-Modified headers, so that they can be
+revalidated with conditional requests instead of being queried again. The responses of a release and of its git tree
+are removed together with the version.
+The cache directory may be shared by several processes. All updates of the index files are serialised with a lock on
+the file `.lock` (see `cache_lock`).
 """
 
+import hashlib
+import json
+import os
+import re
 import shutil
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import TYPE_CHECKING, Optional, overload
+from typing import TYPE_CHECKING, Any, Iterable, Iterator
 
-from pydantic import BaseModel
+import pydantic
+from pydantic import BaseModel, Field, model_validator
 
+from bost import schema
 from bost.logger import logger
+from bost.schema import SchemaRootType
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
 
 if TYPE_CHECKING:
     from bost.pull import SchemaTree
 
 CACHE_FILE_NAME = ".cache"
 CACHE_DIR_NAME = ".cached_files"
+""" Directory of the legacy cache layout which stored the files by their path. Only used for clean up. """
+BLOB_DIR_NAME = ".blobs"
+MODEL_DIR_NAME = ".models"
+RESPONSES_FILE_NAME = ".responses"
+LOCK_FILE_NAME = ".lock"
+RELEASE_URL_REGEX = re.compile(r"/releases/tags/(?P<version>[^/?]+)$")
+TREE_URL_REGEX = re.compile(r"/git/trees/(?P<commit>[^/?]+)")
+MODEL_FORMAT = "json-1"
+""" The format of the cached models. Part of the model cache key, i.e. changing it invalidates all cached models. """
+MODEL_TAG = "$bost_model"
+""" The key which marks a serialized model node in a cached model """
+_MODEL_CLASSES: dict[str, type[BaseModel]] = {
+    name: value
+    for name, value in vars(schema).items()
+    if isinstance(value, type) and issubclass(value, BaseModel) and value.__module__ == schema.__name__
+}
+""" The only classes which may be instantiated from a cached model """
+
+_CACHE_LOCK = threading.RLock()
+_HELD_CACHE_LOCKS: dict[Path, int] = {}
+""" The number of nested `cache_lock` contexts by cache directory. Only accessed while holding `_CACHE_LOCK`. """
+
+
+class CachedVersion(BaseModel):
+    """
+    A cached BO4E version
+    """
+
+    file_tree: "SchemaTree"
+    last_used: datetime
 
 
 class CacheData(BaseModel):
@@ -22,126 +84,543 @@ class CacheData(BaseModel):
     Data to be cached
     """
 
-    version: str
-    file_tree: "SchemaTree"
+    versions: dict[str, CachedVersion] = Field(default_factory=dict)
+
+    @model_validator(mode="before")
+    @classmethod
+    def migrate_single_version_cache(cls, data: Any) -> Any:
+        """
+        Older versions of bost could only cache a single version. Converts such a cache file into the current format.
+        """
+        if isinstance(data, dict) and "version" in data:
+            return {
+                "versions": {
+                    data["version"]: {"file_tree": data["file_tree"], "last_used": datetime.now(tz=timezone.utc)}
+                }
+            }
+        return data
+
+
+class CachedResponse(BaseModel):
+    """
+    A response of the GitHub API together with its validators for conditional requests
+    """
+
+    etag: str | None = None
+    last_modified: str | None = None
+    body: Any
+    """ The JSON body of the response """
 
 
-CACHED_DATA: CacheData
+class CachedResponses(BaseModel):
+    """
+    The cached responses of the GitHub API by their URL
+    """
+
+    responses: dict[str, CachedResponse] = Field(default_factory=dict)
+
+
+def _get_umask() -> int:
+    # The umask can only be read by setting it. This is done once on import to not race with other threads.
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+_UMASK = _get_umask()
+
+
+def write_file_atomic(path: Path, content: bytes, create_parents: bool = True) -> None:
+    """
+    Write the content to a temporary file in the same directory first and move it into place afterward.
+    Concurrent readers will either see the old or the new content but never a half-written file.
+    If the process crashes, the file is either fully updated or left untouched.
+    The file gets the mode of the replaced file or, for new files, the default mode for the umask (like `open` does)
+    instead of the private mode of the temporary file.
+    Set `create_parents` to False if the caller already ensured that the parent directory exists.
+    """
+    if create_parents:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        mode = stat.S_IMODE(path.stat().st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    file_descriptor, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(file_descriptor, "wb") as temp_file:
+            if hasattr(os, "fchmod"):
+                os.fchmod(temp_file.fileno(), mode)
+            else:  # pragma: no cover
+                os.chmod(temp_path, mode)
+            temp_file.write(content)
+        os.replace(temp_path, path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def cache_lock(cache_dir: Path) -> Iterator[None]:
+    """
+    Lock the cache directory for a read-modify-write update of its index files. The lock is held on the file `.lock`
+    with `flock`, i.e. it serialises the updates of all threads and processes sharing the cache directory. It is
+    re-entrant within a thread. On platforms without `fcntl`, only the threads of this process are serialised.
+    """
+    key = cache_dir.resolve()
+    with _CACHE_LOCK:
+        if key in _HELD_CACHE_LOCKS:
+            _HELD_CACHE_LOCKS[key] += 1
+            try:
+                yield
+            finally:
+                _HELD_CACHE_LOCKS[key] -= 1
+            return
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(cache_dir / LOCK_FILE_NAME, "ab") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            _HELD_CACHE_LOCKS[key] = 1
+            try:
+                yield
+            finally:
+                del _HELD_CACHE_LOCKS[key]
+                # Closing the file releases the flock
 
 
 def load_cache(cache_file: Path) -> CacheData:
     """
     Load the cache file.
-    Returns named tuple of:
-    - the cached version as GitHub tag e.g. "v0.6.1-rc13"
-    - the cached file tree in the same format as the GitHub API
+    Returns the cached versions (GitHub tags e.g. "v0.6.1-rc13") with their file trees in the same format as the
+    GitHub API.
     """
     if not cache_file.exists():
         raise FileNotFoundError(f"Cache file {cache_file} does not exist")
+    return CacheData.model_validate_json(cache_file.read_text(encoding="utf-8"))
 
-    # pylint: disable=global-statement
-    global CACHED_DATA
-    if "CACHED_DATA" in globals():
-        return CACHED_DATA
 
-    CACHED_DATA = CacheData.model_validate_json(cache_file.read_text(encoding="utf-8"))
-    return CACHED_DATA
+def save_cache(cache_file: Path, cache_data: CacheData) -> None:
+    """
+    Save the cache file.
+    """
+    write_file_atomic(cache_file, cache_data.model_dump_json().encode("utf-8"))
 
 
-@overload
-def save_cache(cache_file: Path, *, version: str) -> None: ...
+def _load_cache_or_empty(cache_dir: Path) -> CacheData:
+    cache_file = cache_dir / CACHE_FILE_NAME
+    if not cache_file.exists():
+        return CacheData()
+    return load_cache(cache_file)
 
 
-@overload
-def save_cache(cache_file: Path, *, file_tree: "SchemaTree") -> None: ...
+def add_cached_version(cache_dir: Path, version: str, file_tree: "SchemaTree") -> None:
+    """
+    Add the file tree of a version to the cache or replace it if the version is already cached.
+    """
+    with cache_lock(cache_dir):
+        cache_data = _load_cache_or_empty(cache_dir)
+        cache_data.versions[version] = CachedVersion(file_tree=file_tree, last_used=datetime.now(tz=timezone.utc))
+        save_cache(cache_dir / CACHE_FILE_NAME, cache_data)
 
 
-@overload
-def save_cache(cache_file: Path, *, version: str, file_tree: "SchemaTree") -> None: ...
+def _load_responses(cache_dir: Path) -> CachedResponses:
+    responses_file = cache_dir / RESPONSES_FILE_NAME
+    if not responses_file.exists():
+        return CachedResponses()
+    try:
+        return CachedResponses.model_validate_json(responses_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as error:
+        # The responses are only used for conditional requests, i.e. they are queried again
+        logger.warning("Ignoring the invalid cached responses in %s: %s", responses_file, error)
+        return CachedResponses()
+
+
+def _response_versions(responses: CachedResponses) -> dict[str, set[str] | None]:
+    """
+    Get the versions each cached response belongs to by its URL, i.e. the version of a release and the versions whose
+    tag (or, for older caches, target commit) is the ref of a git tree. Responses which don't belong to any version
+    (e.g. the latest release) are mapped to None.
+    """
+    versions: dict[str, set[str] | None] = {}
+    commits: dict[str, set[str]] = {}
+    for url, response in responses.responses.items():
+        match = RELEASE_URL_REGEX.search(url)
+        if match is None:
+            continue
+        versions[url] = {match.group("version")}
+        commits.setdefault(match.group("version"), set()).add(match.group("version"))
+        if isinstance(response.body, dict) and isinstance(response.body.get("target_commitish"), str):
+            commits.setdefault(response.body["target_commitish"], set()).add(match.group("version"))
+    for url in responses.responses:
+        match = TREE_URL_REGEX.search(url)
+        if match is not None:
+            versions[url] = commits.get(match.group("commit"), set())
+        elif url not in versions:
+            versions[url] = None
+    return versions
+
+
+def _response_entries(cache_dir: Path) -> tuple[int, list[tuple[set[str] | None, int]]]:
+    """
+    Get the size of the responses file together with the versions (see `_response_versions`) and the size of each
+    cached response.
+    """
+    responses_file = cache_dir / RESPONSES_FILE_NAME
+    if not responses_file.exists():
+        return 0, []
+    responses = _load_responses(cache_dir)
+    response_versions = _response_versions(responses)
+    return responses_file.stat().st_size, [
+        (response_versions[url], size) for url, size in _response_sizes(responses).items()
+    ]
 
 
-@overload
-def save_cache(cache_file: Path, *, cache_data: CacheData) -> None: ...
+def _is_response_referenced(response_versions: set[str] | None, versions: Iterable[str]) -> bool:
+    return response_versions is None or not response_versions.isdisjoint(versions)
 
 
-def save_cache(
-    cache_file: Path,
-    version: str | None = None,
-    file_tree: Optional["SchemaTree"] = None,
-    cache_data: CacheData | None = None,
-) -> None:
+def _response_sizes(responses: CachedResponses) -> dict[str, int]:
     """
-    Save the cache file.
+    Get the (approximate) size of each cached response in the responses file by its URL.
+    """
+    # The URL is stored as JSON key, separated by a colon and a comma from the response and the next entry
+    return {
+        url: len(json.dumps(url)) + len(response.model_dump_json()) + 2 for url, response in responses.responses.items()
+    }
+
+
+def get_cached_response(cache_dir: Path, url: str) -> CachedResponse | None:
+    """
+    Get the cached response of the GitHub API for the URL if it is cached.
+    """
+    return _load_responses(cache_dir).responses.get(url)
+
+
+def add_cached_response(cache_dir: Path, url: str, response: CachedResponse) -> None:
+    """
+    Add the response of the GitHub API for the URL to the cache or replace the cached one.
+    Creates the cache file if needed, so that the cache directory stays valid.
     """
-    if not cache_file.parent.exists():
-        cache_file.parent.mkdir(parents=True, exist_ok=True)
-
-    # pylint: disable=global-statement
-    global CACHED_DATA
-    if cache_data is not None:
-        CACHED_DATA = cache_data
-        cache_file.write_text(cache_data.model_dump_json(), encoding="utf-8")
-        return
-    if "CACHED_DATA" not in globals() and (version is None or file_tree is None):
-        raise ValueError("No complete set of cache data provided. This shouldn't happen.")
-
-    update_dict: dict[str, str | SchemaTree] = {}
-    if version is not None:
-        update_dict["version"] = version
-    if file_tree is not None:
-        update_dict["file_tree"] = file_tree
-    if "CACHED_DATA" in globals():
-        CACHED_DATA = CACHED_DATA.model_copy(update=update_dict)
-    else:
-        CACHED_DATA = CacheData(**update_dict)  # type: ignore[arg-type]
-    cache_file.write_text(CACHED_DATA.model_dump_json(), encoding="utf-8")
+    with cache_lock(cache_dir):
+        responses = _load_responses(cache_dir)
+        responses.responses[url] = response
+        write_file_atomic(cache_dir / RESPONSES_FILE_NAME, responses.model_dump_json().encode("utf-8"))
+        if not (cache_dir / CACHE_FILE_NAME).exists():
+            save_cache(cache_dir / CACHE_FILE_NAME, CacheData())
 
 
 def is_cache_dir_valid(cache_dir: Path | None, target_version: str) -> bool:
     """
     Check if the cache directory is valid.
-    It is valid if it is empty or doesn't exist yet.
-    If it is not empty but the version file is missing, raise an FileNotFoundError.
-    If it doesn't contain the correct version the cache will be cleared.
+    It is valid if it is empty, doesn't exist yet or contains a cache file.
+    If it is not empty but the cache file is missing, raise an FileNotFoundError.
+    Other versions in the cache are kept. If the target version is not cached yet, only files which are not already
+    cached for other versions will be downloaded.
     """
     if cache_dir is None:
         return False
     cache_dir.mkdir(parents=True, exist_ok=True)
     cache_file = cache_dir / CACHE_FILE_NAME
-    if not any(cache_dir.iterdir()):
+    if not any(path.name != LOCK_FILE_NAME for path in cache_dir.iterdir()):
         return True
     if not cache_file.exists():
         raise FileNotFoundError("Cache directory is not empty but does not contain a .cache file")
-    cached_version = load_cache(cache_file).version
-    if cached_version != target_version:
-        logger.warning(
-            "Version mismatch: The cache directory contains version %s but the target version is %s. "
-            "The files will be downloaded again and the cache will be overwritten.",
-            cached_version,
+    if target_version != "latest" and target_version not in load_cache(cache_file).versions:
+        logger.info(
+            "The cache directory doesn't contain version %s yet. "
+            "Only files which are not cached for other versions will be downloaded.",
             target_version,
         )
-        shutil.rmtree(cache_dir)
-        cache_dir.mkdir()
-
-        # pylint: disable=global-statement
-        globals().pop("CACHED_DATA")
     return True
 
 
-def get_cached_file_tree(cache_dir: Path) -> Optional["SchemaTree"]:
+def get_cached_file_tree(cache_dir: Path, version: str) -> "SchemaTree | None":
     """
-    Get the cached file tree if the cache is not empty
+    Get the cached file tree of a version if it is cached. Marks the version as recently used.
     """
     cache_file = cache_dir / CACHE_FILE_NAME
     if not cache_file.exists():
         return None
-    return load_cache(cache_file).file_tree
+    with cache_lock(cache_dir):
+        cache_data = load_cache(cache_file)
+        cached_version = cache_data.versions.get(version)
+        if cached_version is None:
+            return None
+        file_tree = cached_version.file_tree
+        if any(file.sha is None for file in file_tree.all_files()):
+            logger.info("The cached file tree was created by an older version of bost and will be queried again")
+            return None
+        cached_version.last_used = datetime.now(tz=timezone.utc)
+        save_cache(cache_file, cache_data)
+    return file_tree
+
+
+def git_blob_sha(content: bytes) -> str:
+    """
+    Calculate the git blob SHA of a file content. This is the same hash the GitHub tree API returns for a file.
+    """
+    return hashlib.sha1(b"blob %d\0" % len(content) + content, usedforsecurity=False).hexdigest()
+
+
+def get_cached_blob(sha: str | None, cache_dir: Path | None) -> Path | None:
+    """
+    Get the path to the cached file with the given git blob SHA if the cache directory is set.
+    The files are stored by their content hash. Identical files of different versions share the same cache entry.
+    """
+    if cache_dir is None or sha is None:
+        return None
+    return cache_dir / BLOB_DIR_NAME / sha[:2] / sha
 
 
-def get_cached_file(relative_path: Path, cache_dir: Path | None) -> Path | None:
+def is_blob_valid(blob_path: Path, sha: str) -> bool:
     """
-    Get the path to the cached file specific to a schema if the cache directory is set.
+    Check if the cached file exists and if its content matches the git blob SHA.
     """
-    if cache_dir is None:
+    return blob_path.exists() and git_blob_sha(blob_path.read_bytes()) == sha
+
+
+@lru_cache(maxsize=1)
+def get_model_cache_key() -> str:
+    """
+    Get the key of the model cache. Cached models are only valid for the same pydantic version, the same schema
+    models and the same format. If one of them changes, the cached models are ignored and will be created again.
+    """
+    return hashlib.sha256(
+        pydantic.VERSION.encode() + MODEL_FORMAT.encode() + Path(schema.__file__).read_bytes()
+    ).hexdigest()[:16]
+
+
+def get_cached_model(sha: str | None, cache_dir: Path | None) -> Path | None:
+    """
+    Get the path to the cached schema model of the raw file with the given git blob SHA if the cache directory is set.
+    """
+    if cache_dir is None or sha is None:
         return None
-    return cache_dir / CACHE_DIR_NAME / relative_path
+    return cache_dir / MODEL_DIR_NAME / get_model_cache_key() / sha[:2] / f"{sha}.json"
+
+
+def _encode_model(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return {
+            MODEL_TAG: type(value).__name__,
+            "fields": {name: _encode_model(field_value) for name, field_value in value.__dict__.items()},
+            "fields_set": sorted(value.model_fields_set),
+        }
+    if isinstance(value, dict):
+        return {key: _encode_model(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_encode_model(item) for item in value]
+    return value
+
+
+def _decode_model(value: Any) -> Any:
+    if isinstance(value, dict):
+        if MODEL_TAG not in value:
+            return {key: _decode_model(item) for key, item in value.items()}
+        model_class = _MODEL_CLASSES[value[MODEL_TAG]]
+        fields = {name: _decode_model(field_value) for name, field_value in value["fields"].items()}
+        if fields.keys() != model_class.model_fields.keys():
+            raise ValueError(f"The fields of the cached {model_class.__name__} don't match the model")
+        # Like `model_construct` but without looking up aliases and defaults since all fields are stored
+        model = model_class.__new__(model_class)
+        object.__setattr__(model, "__dict__", fields)
+        object.__setattr__(model, "__pydantic_fields_set__", set(value["fields_set"]))
+        object.__setattr__(model, "__pydantic_extra__", None)
+        object.__setattr__(model, "__pydantic_private__", None)
+        return model
+    if isinstance(value, list):
+        return [_decode_model(item) for item in value]
+    return value
+
+
+def load_cached_model(model_path: Path) -> SchemaRootType | None:
+    """
+    Load a cached schema model. The model is rebuilt without running the pydantic validation again. The cached file
+    is plain JSON and only classes of `bost.schema` are instantiated, so a tampered cache can't execute code.
+    Returns None if the file is unusable for any reason, i.e. it is treated as a cache miss.
+    """
+    try:
+        content = model_path.read_bytes()
+        data = orjson.loads(content) if orjson is not None else json.loads(content)
+        schema_parsed = _decode_model(data)
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        logger.warning("Could not load cached model %s: %s", model_path, error)
+        return None
+    if not isinstance(schema_parsed, (schema.SchemaRootObject, schema.SchemaRootStrEnum)):
+        logger.warning("Cached model %s has an unexpected type %s", model_path, type(schema_parsed))
+        return None
+    return schema_parsed
+
+
+def save_cached_model(model_path: Path, schema_parsed: SchemaRootType) -> None:
+    """
+    Store a validated schema model in the cache.
+    """
+    data = _encode_model(schema_parsed)
+    if orjson is not None:
+        try:
+            write_file_atomic(model_path, orjson.dumps(data))
+            return
+        except orjson.JSONEncodeError:
+            # e.g. integers which exceed 64 bit
+            pass
+    write_file_atomic(model_path, json.dumps(data).encode("utf-8"))
+
+
+def _version_blobs(cached_version: CachedVersion) -> set[str]:
+    return {file.sha for file in cached_version.file_tree.all_files() if file.sha is not None}
+
+
+def _cached_blob_sizes(cache_dir: Path) -> dict[str, int]:
+    """
+    Get the size of the cached files by their blob SHA. The size includes the cached model.
+    """
+    sizes: dict[str, int] = {}
+    for path in (cache_dir / BLOB_DIR_NAME).glob("*/*"):
+        if not path.name.startswith(".tmp-"):
+            sizes[path.name] = sizes.get(path.name, 0) + path.stat().st_size
+    for path in (cache_dir / MODEL_DIR_NAME).glob(f"{get_model_cache_key()}/*/*.json"):
+        sizes[path.stem] = sizes.get(path.stem, 0) + path.stat().st_size
+    return sizes
+
+
+def get_cache_size(cache_dir: Path) -> int:
+    """
+    Get the total size of all cached files (including the cached responses) in bytes.
+    """
+    responses_file = cache_dir / RESPONSES_FILE_NAME
+    responses_size = responses_file.stat().st_size if responses_file.exists() else 0
+    return sum(_cached_blob_sizes(cache_dir).values()) + responses_size
+
+
+def get_cached_versions(cache_dir: Path) -> dict[str, tuple[CachedVersion, int]]:
+    """
+    Get all cached versions together with the size of their cached files and responses in bytes.
+    Note that files which are identical in several versions are counted for each of these versions.
+    """
+    blob_sizes = _cached_blob_sizes(cache_dir)
+    responses = _load_responses(cache_dir)
+    response_versions = _response_versions(responses)
+    response_sizes = _response_sizes(responses)
+    return {
+        version: (
+            cached_version,
+            sum(blob_sizes.get(sha, 0) for sha in _version_blobs(cached_version))
+            + sum(size for url, size in response_sizes.items() if version in (response_versions[url] or ())),
+        )
+        for version, cached_version in _load_cache_or_empty(cache_dir).versions.items()
+    }
+
+
+def collect_garbage(cache_dir: Path) -> int:
+    """
+    Delete all cached files, models and responses which aren't referenced by any cached version anymore.
+    Also removes models which were created for other pydantic or bost versions and leftovers of the legacy cache
+    layout. Returns the number of freed bytes.
+    """
+    with cache_lock(cache_dir):
+        cache_data = _load_cache_or_empty(cache_dir)
+        referenced = set().union(*(_version_blobs(cached_version) for cached_version in cache_data.versions.values()))
+        freed = 0
+        for blob_path in (cache_dir / BLOB_DIR_NAME).glob("*/*"):
+            if blob_path.name not in referenced and not blob_path.name.startswith(".tmp-"):
+                freed += blob_path.stat().st_size
+                blob_path.unlink()
+        for model_dir in (cache_dir / MODEL_DIR_NAME).glob("*"):
+            if model_dir.name != get_model_cache_key():
+                freed += sum(path.stat().st_size for path in model_dir.glob("*/*"))
+                shutil.rmtree(model_dir, ignore_errors=True)
+                continue
+            for model_path in model_dir.glob("*/*.json"):
+                if model_path.stem not in referenced:
+                    freed += model_path.stat().st_size
+                    model_path.unlink()
+        freed += _collect_responses(cache_dir, set(cache_data.versions))
+        shutil.rmtree(cache_dir / CACHE_DIR_NAME, ignore_errors=True)
+        return freed
+
+
+def _collect_responses(cache_dir: Path, versions: set[str]) -> int:
+    """
+    Delete the cached responses which belong to other versions only. Returns the number of freed bytes.
+    """
+    responses_file = cache_dir / RESPONSES_FILE_NAME
+    if not responses_file.exists():
+        return 0
+    responses = _load_responses(cache_dir)
+    response_versions = _response_versions(responses)
+    kept = CachedResponses(
+        responses={
+            url: response
+            for url, response in responses.responses.items()
+            if _is_response_referenced(response_versions[url], versions)
+        }
+    )
+    if len(kept.responses) == len(responses.responses):
+        return 0
+    size = responses_file.stat().st_size
+    write_file_atomic(responses_file, kept.model_dump_json().encode("utf-8"))
+    return max(0, size - responses_file.stat().st_size)
+
+
+def remove_cached_versions(cache_dir: Path, versions: Iterable[str]) -> list[str]:
+    """
+    Remove the given versions from the cache and delete the files which are only used by these versions.
+    Returns the removed versions.
+    """
+    with cache_lock(cache_dir):
+        cache_data = _load_cache_or_empty(cache_dir)
+        removed = [version for version in versions if cache_data.versions.pop(version, None) is not None]
+        if len(removed) > 0:
+            save_cache(cache_dir / CACHE_FILE_NAME, cache_data)
+        collect_garbage(cache_dir)
+        for version in removed:
+            logger.info("Removed version %s from the cache", version)
+        return removed
+
+
+def evict_cache(
+    cache_dir: Path, max_size: int | None = None, max_versions: int | None = None, keep: str | None = None
+) -> list[str]:
+    """
+    Remove the least recently used versions from the cache until the total size of the cached files is at most
+    `max_size` bytes and at most `max_versions` versions are cached. The version `keep` is never removed.
+    Returns the removed versions.
+    """
+    with cache_lock(cache_dir):
+        cache_data = _load_cache_or_empty(cache_dir)
+        blob_sizes = _cached_blob_sizes(cache_dir)
+        responses_size, response_entries = _response_entries(cache_dir)
+        remaining = dict(cache_data.versions)
+        candidates = sorted(
+            (version for version in cache_data.versions if version != keep),
+            key=lambda version: cache_data.versions[version].last_used,
+        )
+
+        def is_within_limits() -> bool:
+            if max_versions is not None and len(remaining) > max_versions:
+                return False
+            if max_size is not None:
+                referenced = set().union(*(_version_blobs(cached_version) for cached_version in remaining.values()))
+                # The responses which only belong to the removed versions are removed as well
+                total_size = (
+                    sum(blob_sizes.get(sha, 0) for sha in referenced)
+                    + responses_size
+                    - sum(
+                        size
+                        for response_versions, size in response_entries
+                        if not _is_response_referenced(response_versions, remaining)
+                    )
+                )
+                if total_size > max_size:
+                    return False
+            return True
+
+        evicted = []
+        for version in candidates:
+            if is_within_limits():
+                break
+            del remaining[version]
+            evicted.append(version)
+        if len(evicted) == 0:
+            return []
+        return remove_cached_versions(cache_dir, evicted)
@@ -0,0 +1,188 @@
+"""
+Contains the functionality for incremental runs.
+For every generated file, the manifest in the output directory records the inputs it was generated from: The hash of
+the raw schema, its references (the edges of the dependency graph) and its field names. Together with the config
+entries touching the schema, the options and the resolved targets of its references, they form the key of the file.
+On the next run, only schemas whose key changed are downloaded, parsed, transformed and saved again. All other files
+are kept as they are.
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+
+import pydantic
+
+from bost.config import AdditionalField, Config
+from bost.logger import logger
+from bost.matching import PatternIndex
+from bost.operations import ReferenceResolver
+from bost.output import Manifest, SchemaRecord, content_hash, load_manifest
+from bost.pull import DEFAULT_JOBS, SchemaMetadata, download_schemas
+from bost.schema import Object
+from bost.selection import collect_references
+from bost.serialization import dump_schema
+
+PROCESSING_MODULES = (
+    "__main__.py",
+    "index.py",
+    "matching.py",
+    "operations.py",
+    "processing.py",
+    "schema.py",
+    "serialization.py",
+    "visitor.py",
+)
+""" The modules of bost which affect the generated files """
+
+
+@lru_cache(maxsize=1)
+def get_processing_key() -> str:
+    """
+    Get a hash of the code which generates the files. If bost or pydantic is updated, all files are generated again.
+    """
+    source_dir = Path(__file__).parent
+    hash_object = hashlib.sha256(pydantic.VERSION.encode())
+    for module in PROCESSING_MODULES:
+        hash_object.update((source_dir / module).read_bytes())
+    return hash_object.hexdigest()[:16]
+
+
+@dataclass
+class IncrementalPlan:
+    """
+    The result of comparing the schemas with the manifest of the last run
+    """
+
+    stale: dict[str, SchemaMetadata] = field(default_factory=dict)
+    """ The schemas which have to be processed and saved again by their class name """
+    unchanged: list[str] = field(default_factory=list)
+    """ The relative paths of the files which are kept from the last run """
+    records: dict[str, SchemaRecord] = field(default_factory=dict)
+    """ The inputs of the stale schemas by their relative path """
+
+
+def input_hash(schema: SchemaMetadata) -> str:
+    """
+    Get the hash of the raw schema. This is the git blob SHA for schemas from the BO4E repository and the content hash
+    of the serialized schema for additional models.
+    """
+    if schema.sha is not None:
+        return schema.sha
+    return content_hash(dump_schema(schema.schema_parsed).encode("utf-8"))
+
+
+class _KeyBuilder:  # pylint: disable=too-few-public-methods
+    """
+    Calculates the keys of the schemas for a specific config and options.
+    """
+
+    def __init__(self, schemas: dict[str, SchemaMetadata], config: Config | None, version: str, options: list):
+        self.config = config if config is not None else Config.model_validate({})
+        self.additional_fields = [
+            additional_field
+            for additional_field in self.config.additional_fields
+            if isinstance(additional_field, AdditionalField)
+        ]
+        self.additional_field_index = PatternIndex(
+            [additional_field.pattern for additional_field in self.additional_fields]
+        )
+        self.non_nullable_index = PatternIndex(self.config.non_nullable_fields)
+        self.enum_item_index = PatternIndex([item.pattern for item in self.config.additional_enum_items])
+        self.resolver = ReferenceResolver(schemas, version)
+        self.options = [version, *options]
+
+    def _resolve(self, ref: str) -> list[str] | None:
+        try:
+            target = self.resolver.resolve_target(ref)
+        except ValueError:
+            return None
+        return list(target) if target is not None else None
+
+    def key(self, schema: SchemaMetadata, input_hash_: str, references: list[str], fields: list[str]) -> str:
+        """
+        Calculate the key of a schema from its inputs.
+        """
+        module_name = schema.module_name
+        additional_fields = [self.additional_fields[index] for index in self.additional_field_index.match(module_name)]
+        field_names = [*fields, *(additional_field.field_name for additional_field in additional_fields)]
+        non_nullable_fields = sorted(
+            {index for name in field_names for index in self.non_nullable_index.match(f"{module_name}.{name}")}
+        )
+        payload = [
+            get_processing_key(),
+            self.options,
+            list(schema.module_path),
+            input_hash_,
+            [
+                additional_field.model_dump(mode="json", by_alias=True, exclude_unset=True)
+                for additional_field in additional_fields
+            ],
+            [self.config.non_nullable_fields[index] for index in non_nullable_fields],
+            [
+                self.config.additional_enum_items[index].model_dump(mode="json")
+                for index in self.enum_item_index.match(module_name)
+            ],
+            [self._resolve(ref) for ref in references],
+        ]
+        return hashlib.sha256(json.dumps(payload).encode("utf-8")).hexdigest()
+
+
+# pylint: disable=too-many-arguments, too-many-locals
+def plan_incremental(
+    schemas: dict[str, SchemaMetadata],
+    config: Config | None,
+    output: Path,
+    target_version: str,
+    update_refs: bool,
+    set_default_version: bool,
+    clear_output: bool = False,
+    jobs: int = DEFAULT_JOBS,
+) -> IncrementalPlan:
+    """
+    Compare the schemas with the manifest of the last run and determine which of them have to be processed again.
+    Only schemas whose raw input changed are downloaded and parsed to determine their references and fields.
+    Must be called before the schemas are processed.
+    """
+    previous = Manifest() if clear_output else load_manifest(output)
+    key_builder = _KeyBuilder(schemas, config, target_version, [update_refs, set_default_version])
+    input_hashes = {name: input_hash(schema) for name, schema in schemas.items()}
+    relative_paths = {name: schema.file_path.relative_to(output).as_posix() for name, schema in schemas.items()}
+
+    changed_inputs = {
+        name: schema
+        for name, schema in schemas.items()
+        if relative_paths[name] not in previous.schemas
+        or previous.schemas[relative_paths[name]].input_hash != input_hashes[name]
+    }
+    download_schemas(changed_inputs.values(), jobs=jobs)
+
+    stale: dict[str, SchemaMetadata] = {}
+    unchanged: list[str] = []
+    records: dict[str, SchemaRecord] = {}
+    for name, schema in schemas.items():
+        relative_path = relative_paths[name]
+        if name in changed_inputs:
+            schema_parsed = schema.schema_parsed
+            references = collect_references(schema_parsed)
+            fields = list(schema_parsed.properties) if isinstance(schema_parsed, Object) else []
+        else:
+            references = previous.schemas[relative_path].references
+            fields = previous.schemas[relative_path].fields
+        key = key_builder.key(schema, input_hashes[name], references, fields)
+        if (
+            relative_path in previous.schemas
+            and previous.schemas[relative_path].key == key
+            and relative_path in previous.files
+            and schema.file_path.exists()
+        ):
+            unchanged.append(relative_path)
+            continue
+        stale[name] = schema
+        records[relative_path] = SchemaRecord(
+            input_hash=input_hashes[name], key=key, references=references, fields=fields
+        )
+    logger.info("Incremental run: %d of %d schemas are out of date", len(stale), len(schemas))
+    return IncrementalPlan(stale=stale, unchanged=unchanged, records=records)
@@ -0,0 +1,164 @@
+"""
+Contains an index over the fields of all loaded schemas.
+The index is built once per run and updated whenever a transformation adds or changes a field. This way, the config
+operations can look up the fields by their path, name, type or nullability instead of scanning all schemas again.
+"""
+
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+from bost.pull import SchemaMetadata
+from bost.schema import AnyOf, Null, Object, SchemaType
+
+
+@dataclass(frozen=True, slots=True)
+class FieldEntry:
+    """
+    A field of a schema in the index
+    """
+
+    path: str
+    """ The dotted field path, e.g. "bo.Angebot.angebotsnummer" """
+    field_name: str
+    schema: SchemaMetadata
+    """ The schema owning the field """
+    field_type: type[SchemaType]
+    """ The type of the field definition, e.g. `AnyOf` or `String` """
+    nullable: bool
+    """ True if the field is an `AnyOf` containing the `Null` type """
+    has_default: bool
+    """ True if the field has an explicitly set default value """
+
+    @property
+    def field_def(self) -> SchemaType:
+        """
+        The current definition of the field in the schema.
+        """
+        assert isinstance(self.schema.schema_parsed, Object)
+        return self.schema.schema_parsed.properties[self.field_name]
+
+
+def _create_entry(schema: SchemaMetadata, field_name: str, field_def: SchemaType) -> FieldEntry:
+    return FieldEntry(
+        path=".".join((schema.module_name, field_name)),
+        field_name=field_name,
+        schema=schema,
+        field_type=type(field_def),
+        nullable=isinstance(field_def, AnyOf) and any(isinstance(item, Null) for item in field_def.any_of),
+        has_default="default" in field_def.__pydantic_fields_set__,
+    )
+
+
+class FieldIndex:
+    """
+    Maps the fields of all indexed schemas by their path, name, type and nullability.
+    The entries keep the order in which the fields were added. Updating a field keeps its position, also in the
+    lookups by name, type and nullability, i.e. the fields of a schema are always returned in the order of its
+    properties.
+    """
+
+    def __init__(self, schemas: Iterable[SchemaMetadata] = ()):
+        self._positions: dict[str, int] = {}
+        """ The position of every field by its path. An updated field keeps its position. """
+        self._by_path: dict[str, FieldEntry] = {}
+        self._by_schema: dict[str, dict[str, FieldEntry]] = {}
+        self._by_name: dict[str, dict[str, FieldEntry]] = {}
+        self._by_type: dict[type[SchemaType], dict[str, FieldEntry]] = {}
+        self._nullable: dict[str, FieldEntry] = {}
+        for schema in schemas:
+            self.add_schema(schema)
+
+    def _insert(self, entry: FieldEntry) -> None:
+        self._positions.setdefault(entry.path, len(self._positions))
+        self._by_path[entry.path] = entry
+        self._by_schema.setdefault(entry.schema.module_name, {})[entry.field_name] = entry
+        self._by_name.setdefault(entry.field_name, {})[entry.path] = entry
+        self._by_type.setdefault(entry.field_type, {})[entry.path] = entry
+        if entry.nullable:
+            self._nullable[entry.path] = entry
+
+    def _discard(self, entry: FieldEntry) -> None:
+        # The entry is replaced in `_by_path` and `_by_schema` to keep its position if it is updated
+        del self._by_name[entry.field_name][entry.path]
+        del self._by_type[entry.field_type][entry.path]
+        self._nullable.pop(entry.path, None)
+
+    def add_schema(self, schema: SchemaMetadata) -> None:
+        """
+        Add all fields of the schema to the index. Schemas which are not objects (e.g. enums) have no fields.
+        """
+        if not isinstance(schema.schema_parsed, Object):
+            return
+        for field_name, field_def in schema.schema_parsed.properties.items():
+            self._insert(_create_entry(schema, field_name, field_def))
+
+    def remove_schema(self, schema: SchemaMetadata) -> None:
+        """
+        Remove all fields of the schema from the index.
+        """
+        for entry in self._by_schema.pop(schema.module_name, {}).values():
+            self._discard(entry)
+            del self._by_path[entry.path]
+            del self._positions[entry.path]
+
+    def update_field(self, schema: SchemaMetadata, field_name: str) -> FieldEntry | None:
+        """
+        Update the index entry of a field after its definition was added, changed or removed.
+        Returns the new entry or None if the field doesn't exist anymore.
+        """
+        path = ".".join((schema.module_name, field_name))
+        old_entry = self._by_path.get(path)
+        if old_entry is not None:
+            self._discard(old_entry)
+        if not isinstance(schema.schema_parsed, Object) or field_name not in schema.schema_parsed.properties:
+            if old_entry is not None:
+                del self._by_path[path]
+                del self._positions[path]
+                del self._by_schema[schema.module_name][field_name]
+            return None
+        entry = _create_entry(schema, field_name, schema.schema_parsed.properties[field_name])
+        self._insert(entry)
+        return entry
+
+    def _ordered(self, entries: dict[str, FieldEntry]) -> list[FieldEntry]:
+        # Updated entries are re-appended to the lookups. The lists are nearly sorted, so sorting them is cheap.
+        return sorted(entries.values(), key=lambda entry: self._positions[entry.path])
+
+    def get(self, path: str) -> FieldEntry | None:
+        """
+        Get the field by its dotted path, e.g. "bo.Angebot.angebotsnummer".
+        """
+        return self._by_path.get(path)
+
+    def fields_of(self, schema: SchemaMetadata) -> list[FieldEntry]:
+        """
+        Get all fields of the schema.
+        """
+        return list(self._by_schema.get(schema.module_name, {}).values())
+
+    def by_name(self, field_name: str) -> list[FieldEntry]:
+        """
+        Get all fields with the given name.
+        """
+        return self._ordered(self._by_name.get(field_name, {}))
+
+    def by_type(self, field_type: type[SchemaType]) -> list[FieldEntry]:
+        """
+        Get all fields whose definition is of the given type, e.g. `AnyOf`.
+        """
+        return self._ordered(self._by_type.get(field_type, {}))
+
+    def nullable_fields(self) -> list[FieldEntry]:
+        """
+        Get all fields which can be null.
+        """
+        return self._ordered(self._nullable)
+
+    def __contains__(self, path: object) -> bool:
+        return path in self._by_path
+
+    def __iter__(self) -> Iterator[FieldEntry]:
+        return iter(list(self._by_path.values()))
+
+    def __len__(self) -> int:
+        return len(self._by_path)
@@ -0,0 +1,159 @@
+"""
+Contains an optional interning layer for the parsed schemas.
+The BO4E schemas repeat the same sub-schemas over and over, e.g. `anyOf: [string, null]` with `default: null` or
+identical references. The `SchemaInterner` deduplicates structurally identical sub-schemas (hash-consing): Every
+sub-schema is replaced by one canonical instance which is shared by all schemas interned with the same interner.
+The root of a schema is never shared.
+
+Interned sub-schemas must not be modified in place. The operations in `bost.operations` and `bost.processing` check
+with `is_interned` whether a node is shared and replace it by a `mutable_copy` before modifying it (copy-on-mutate).
+Only the modified nodes and their ancestors are copied, all other sub-schemas stay shared.
+"""
+
+import weakref
+from typing import TYPE_CHECKING, Iterable, TypeVar
+
+from pydantic import BaseModel
+
+from bost.logger import logger
+from bost.schema import SchemaRootTypeBase
+from bost.visitor import Node, iter_children, iter_nodes
+
+if TYPE_CHECKING:
+    from bost.pull import SchemaMetadata
+
+NodeT = TypeVar("NodeT", bound=BaseModel)
+
+_INTERNED: "weakref.WeakValueDictionary[int, BaseModel]" = weakref.WeakValueDictionary()
+""" All canonical (i.e. shared) nodes by their id """
+
+
+def is_interned(node: BaseModel) -> bool:
+    """
+    True if the node is a canonical instance of an interner and may therefore be shared by several schemas.
+    """
+    return _INTERNED.get(id(node)) is node
+
+
+def mutable_copy(node: NodeT) -> NodeT:
+    """
+    Get a copy of the node which may be modified. The lists and dictionaries of the node are copied as well, the
+    children are still shared.
+    """
+    node_copy = node.model_copy()
+    for name, value in node_copy.__dict__.items():
+        if isinstance(value, (list, dict)):
+            node_copy.__dict__[name] = value.copy()
+    return node_copy
+
+
+def unshared(node: NodeT) -> NodeT:
+    """
+    Get the node itself if it may be modified or a `mutable_copy` of it if it is shared.
+    """
+    return mutable_copy(node) if is_interned(node) else node
+
+
+class InternStats(BaseModel):
+    """
+    Statistics of a `SchemaInterner`
+    """
+
+    nodes: int = 0
+    """ Number of interned sub-schemas """
+    unique: int = 0
+    """ Number of distinct sub-schemas, i.e. canonical instances """
+
+
+class SchemaInterner:  # pylint: disable=too-few-public-methods
+    """
+    Deduplicates structurally identical sub-schemas.
+    The schemas are interned bottom-up. Since the children of a node are canonical when the node itself is interned,
+    two nodes are structurally identical if their types, their set fields, their values and the identities of their
+    children are equal. The key of a node is therefore computed without descending into its children.
+    """
+
+    def __init__(self):
+        self._table: dict[tuple, Node] = {}
+        self.stats = InternStats()
+
+    def _freeze(self, value) -> object:
+        if isinstance(value, BaseModel):
+            return "node", id(value)
+        if isinstance(value, list):
+            return "list", tuple(self._freeze(item) for item in value)
+        if isinstance(value, dict):
+            return "dict", tuple((key, self._freeze(item)) for key, item in value.items())
+        try:
+            hash(value)
+        except TypeError:
+            return "repr", type(value), repr(value)
+        # The type distinguishes e.g. True from 1 and 1.0
+        return type(value), value
+
+    def _key(self, node: Node) -> tuple:
+        return (
+            type(node),
+            tuple(
+                (name, name in node.__pydantic_fields_set__, self._freeze(value))
+                for name, value in node.__dict__.items()
+            ),
+        )
+
+    def _replace_children(self, node: Node, canonical: dict[int, Node]) -> None:
+        for name, value in node.__dict__.items():
+            if isinstance(value, BaseModel):
+                node.__dict__[name] = canonical.get(id(value), value)
+            elif isinstance(value, list):
+                value[:] = [canonical.get(id(item), item) for item in value]
+            elif isinstance(value, dict):
+                for key, item in value.items():
+                    value[key] = canonical.get(id(item), item)
+
+    def intern(self, root: Node) -> Node:
+        """
+        Replace all sub-schemas of the root (including its definitions) by their canonical instances.
+        Returns the canonical instance of the root or the root itself if it is the root of a schema file.
+        """
+        nodes = list(iter_nodes(root, include_defs=True))
+        canonical: dict[int, Node] = {}
+        number_of_nodes = number_of_unique_nodes = 0
+        for node in reversed(nodes):
+            # The children of a node are visited before the node itself
+            if id(node) in canonical:
+                continue
+            if is_interned(node):
+                canonical[id(node)] = node
+                continue
+            self._replace_children(node, canonical)
+            if isinstance(node, SchemaRootTypeBase):
+                continue
+            number_of_nodes += 1
+            canonical_node = self._table.setdefault(self._key(node), node)
+            if canonical_node is node:
+                number_of_unique_nodes += 1
+                _INTERNED[id(node)] = node
+            canonical[id(node)] = canonical_node
+        self.stats.nodes += number_of_nodes
+        self.stats.unique += number_of_unique_nodes
+        return canonical.get(id(root), root)
+
+
+def is_interned_tree(root: Node) -> bool:
+    """
+    True if all sub-schemas of the root are interned.
+    """
+    return all(is_interned(child) for child in iter_children(root, include_defs=True))
+
+
+def intern_schemas(schemas: Iterable["SchemaMetadata"], interner: SchemaInterner | None = None) -> SchemaInterner:
+    """
+    Intern the sub-schemas of all schemas. The schemas are parsed if needed.
+    Returns the interner which may be used to intern further schemas.
+    """
+    if interner is None:
+        interner = SchemaInterner()
+    for schema in schemas:
+        interner.intern(schema.schema_parsed)
+    logger.info("Interned %d sub-schemas into %d distinct instances", interner.stats.nodes, interner.stats.unique)
+    return interner
@@ -0,0 +1,119 @@
+"""
+Contains an index to match many regex patterns against many subjects (e.g. schema or field paths) at once.
+Instead of testing every pattern against every subject, the patterns are routed by their literal part:
+Pure literal patterns (e.g. "bo\\.Angebot") are looked up in a dictionary. Patterns starting with a literal prefix
+(e.g. "bo\\.Angebot\\..*") are stored in a trie of their prefixes. Only the patterns whose prefix matches the subject
+are tested with the regex engine. Patterns without a literal prefix are tested against every subject.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, Sequence, TypeVar
+
+T = TypeVar("T")
+
+_META_CHARACTERS = frozenset(".^$*+?{}[]()|")
+_QUANTIFIERS = frozenset("*?{")
+
+
+def split_literal_prefix(pattern: str) -> tuple[str, bool]:
+    """
+    Split a regex pattern into its literal prefix. Returns the prefix and whether the whole pattern is a literal.
+    The extraction is conservative: Every string fully matched by the pattern starts with the returned prefix.
+    E.g. "bo\\.Angebot" returns ("bo.Angebot", True), "bo\\.Angebot\\..*" returns ("bo.Angebot.", False) and
+    "bo|bi" returns ("", False).
+    """
+    if "|" in pattern.replace("\\\\", "").replace("\\|", ""):
+        # An alternation could be anywhere in the pattern, e.g. "bo\\.Angebot|bo\\.Vertrag"
+        return "", False
+    prefix: list[str] = []
+    index = 0
+    while index < len(pattern):
+        character = pattern[index]
+        if character == "\\":
+            if index + 1 >= len(pattern) or pattern[index + 1].isalnum():
+                # Character classes like \d or anchors like \b
+                return "".join(prefix), False
+            character = pattern[index + 1]
+            next_index = index + 2
+        elif character in _META_CHARACTERS:
+            return "".join(prefix), False
+        else:
+            next_index = index + 1
+        if next_index < len(pattern) and pattern[next_index] in _QUANTIFIERS:
+            # The character is optional or repeated
+            return "".join(prefix), False
+        prefix.append(character)
+        index = next_index
+    return "".join(prefix), True
+
+
+@dataclass(slots=True)
+class _TrieNode:
+    """
+    A node in the trie of the literal pattern prefixes
+    """
+
+    children: dict[str, "_TrieNode"] = field(default_factory=dict)
+    patterns: list[int] = field(default_factory=list)
+    """ The indices of the patterns whose prefix ends at this node """
+
+
+class PatternIndex:
+    """
+    An index over a list of regex patterns which are (full-)matched against subjects.
+    The patterns are identified by their position in the list. Duplicates are allowed.
+    """
+
+    def __init__(self, patterns: Sequence[str]):
+        self.patterns = list(patterns)
+        self._compiled = [re.compile(pattern) for pattern in self.patterns]
+        self._literals: dict[str, list[int]] = {}
+        self._trie = _TrieNode()
+        self._unprefixed: list[int] = []
+        for pattern_index, pattern in enumerate(self.patterns):
+            prefix, is_literal = split_literal_prefix(pattern)
+            if is_literal:
+                self._literals.setdefault(prefix, []).append(pattern_index)
+            elif prefix == "":
+                self._unprefixed.append(pattern_index)
+            else:
+                node = self._trie
+                for character in prefix:
+                    node = node.children.setdefault(character, _TrieNode())
+                node.patterns.append(pattern_index)
+
+    def _candidates(self, subject: str) -> Iterable[int]:
+        yield from self._unprefixed
+        node: _TrieNode | None = self._trie
+        for character in subject:
+            if node is None:
+                return
+            yield from node.patterns
+            node = node.children.get(character)
+        if node is not None:
+            yield from node.patterns
+
+    def match(self, subject: str) -> list[int]:
+        """
+        Get the indices of all patterns which fully match the subject in ascending order.
+        """
+        matches = list(self._literals.get(subject, ()))
+        matches.extend(
+            pattern_index
+            for pattern_index in self._candidates(subject)
+            if self._compiled[pattern_index].fullmatch(subject)
+        )
+        matches.sort()
+        return matches
+
+    def group_matches(self, subjects: Iterable[tuple[str, T]]) -> list[list[T]]:
+        """
+        Match all subjects in one pass. The subjects are tuples of the string to match and an arbitrary target.
+        Returns the matched targets for each pattern. The targets keep the order of the subjects.
+        """
+        matches: list[list[T]] = [[] for _ in self.patterns]
+        for subject, target in subjects:
+            for pattern_index in self.match(subject):
+                matches[pattern_index].append(target)
+        return matches
@@ -5,10 +5,13 @@ This module contains functions that operate on the schema objects.
 import re
 
 from more_itertools import first_true
+from pydantic import BaseModel
 
+from bost.interning import is_interned, mutable_copy, unshared
 from bost.logger import logger
 from bost.pull import OWNER, REPO, SchemaMetadata
 from bost.schema import AllOf, AnyOf, Array, Null, Object, Reference, SchemaRootObject, SchemaType, StrEnum
+from bost.visitor import Node, SchemaVisitor, iter_nodes, walk
 
 
 def field_to_non_nullable(schema_parsed: SchemaRootObject, field_name: str):
@@ -17,8 +20,9 @@ def field_to_non_nullable(schema_parsed: SchemaRootObject, field_name: str):
     If the field is an "AnyOf" field with only one type left (after removing the Null type), the type is reduced to
     the remaining type - i.e. the structure is flattened.
     If the field has a default value of "null", the default value is removed.
+    Shared (interned) nodes are copied before they are modified.
     """
-    field_with_null_type = schema_parsed.properties[field_name]
+    field_with_null_type = schema_parsed.properties[field_name] = unshared(schema_parsed.properties[field_name])
     assert isinstance(
         field_with_null_type, AnyOf
     ), f"Internal error: Expected field to be of type AnyOf but got {type(field_with_null_type)}"
@@ -36,7 +40,7 @@ def field_to_non_nullable(schema_parsed: SchemaRootObject, field_name: str):
     if len(field_with_null_type.any_of) == 1:
         # If AnyOf has only one item left, we are reducing the type to that item and copying all relevant data from the
         # AnyOf object
-        new_field = field_with_null_type.any_of[0]
+        new_field = unshared(field_with_null_type.any_of[0])
         for key in field_with_null_type.__pydantic_fields_set__:
             if hasattr(new_field, key):
                 setattr(new_field, key, getattr(field_with_null_type, key))
@@ -69,84 +73,180 @@ REF_ONLINE_REGEX = re.compile(
 REF_DEFS_REGEX = re.compile(r"^#/\$(?:defs|definitions)/(?P<model>\w+)$")
 
 
-def update_reference(field: Reference, schema: SchemaMetadata, schemas: dict[str, SchemaMetadata], version: str):
+class ReferenceStats(BaseModel):
     """
-    Update a reference to a schema file by replacing a URL reference or reference to definitions with a relative path
-    to the schema file. If using references to definitions, the schema file must be in the namespace.
-    Example of online reference:
-    https://raw.githubusercontent.com/BO4E/BO4E-Schemas/v202401.1.0-rc1/src/bo4e_schemas/bo/Angebot.json
-    Example of reference to definitions:
-    #/$defs/Angebot
+    Statistics of a `ReferenceResolver`
     """
-    match = REF_ONLINE_REGEX.search(field.ref)
-    if match is not None:
-        logger.debug("Matched online reference: %s", field.ref)
-        if match.group("version") != version:
-            raise ValueError(
-                "Version mismatch: References across different versions of BO4E are not allowed. "
-                f"{match.group('version')} does not match {version} for reference {field.ref}"
-            )
-        if match.group("sub_path") is not None:
-            reference_module_path = [*match.group("sub_path").split("/")[:-1], match.group("model")]
-        else:
-            reference_module_path = [match.group("model")]
-    else:
-        match = REF_DEFS_REGEX.search(field.ref)
+
+    resolved: int = 0
+    """ Number of references which were parsed and rewritten """
+    cached: int = 0
+    """ Number of references which were rewritten using the target of a previously parsed identical reference """
+    unchanged: int = 0
+    """ Number of references which could not be parsed and were left unchanged """
+
+
+class ReferenceResolver:
+    """
+    Rewrites references to schema files into relative paths.
+    The same reference strings occur many times across the schemas. Therefore, the resolver caches the target module
+    path of each reference string and the relative path between each pair of module paths. Rewriting a reference which
+    was already resolved costs two dictionary lookups instead of matching the regular expressions again.
+    """
+
+    def __init__(self, schemas: dict[str, SchemaMetadata], version: str):
+        self.schemas = schemas
+        self.version = version
+        self.stats = ReferenceStats()
+        self._targets: dict[str, tuple[str, ...] | None] = {}
+        self._relative_paths: dict[tuple[tuple[str, ...], tuple[str, ...]], str] = {}
+
+    def resolve_target(self, ref: str) -> tuple[str, ...] | None:
+        """
+        Get the module path of the schema the reference points to. Returns None if the reference can't be parsed.
+        Raises a ValueError if the reference points to another version of BO4E or to an unknown definition.
+        """
+        if ref in self._targets:
+            return self._targets[ref]
+        match = REF_ONLINE_REGEX.search(ref)
         if match is not None:
-            logger.debug("Matched reference to definitions: %s", field.ref)
-            if match.group("model") not in schemas:
+            logger.debug("Matched online reference: %s", ref)
+            if match.group("version") != self.version:
                 raise ValueError(
-                    f"Could not find schema for reference {field.ref} in namespace "
-                    f"{set(schema_el.module_path for schema_el in schemas.values())}"
+                    "Version mismatch: References across different versions of BO4E are not allowed. "
+                    f"{match.group('version')} does not match {self.version} for reference {ref}"
                 )
-            reference_module_path = list(schemas[match.group("model")].module_path)
+            if match.group("sub_path") is not None:
+                target: tuple[str, ...] | None = (*match.group("sub_path").split("/")[:-1], match.group("model"))
+            else:
+                target = (match.group("model"),)
         else:
-            logger.info("Reference unchanged. Could not parse reference: %s", field.ref)
+            match = REF_DEFS_REGEX.search(ref)
+            if match is not None:
+                logger.debug("Matched reference to definitions: %s", ref)
+                if match.group("model") not in self.schemas:
+                    raise ValueError(
+                        f"Could not find schema for reference {ref} in namespace "
+                        f"{set(schema_el.module_path for schema_el in self.schemas.values())}"
+                    )
+                target = tuple(self.schemas[match.group("model")].module_path)
+            else:
+                logger.info("Reference unchanged. Could not parse reference: %s", ref)
+                target = None
+        self._targets[ref] = target
+        return target
+
+    def relative_path(self, own_module_path: tuple[str, ...], reference_module_path: tuple[str, ...]) -> str:
+        """
+        Get the relative reference from the schema file at `own_module_path` to the schema file at
+        `reference_module_path`, e.g. "../enum/Typ.json#".
+        """
+        key = (own_module_path, reference_module_path)
+        if key not in self._relative_paths:
+            relative_ref = "#"
+            for ind, (part, own_part) in enumerate(zip(reference_module_path, own_module_path)):
+                if part != own_part:
+                    relative_ref = (
+                        "../" * (len(own_module_path) - ind - 1) + "/".join(reference_module_path[ind:]) + ".json#"
+                    )
+                    break
+            self._relative_paths[key] = relative_ref
+        return self._relative_paths[key]
+
+    def update_reference(self, field: Reference, schema: SchemaMetadata):
+        """
+        Replace a URL reference or reference to definitions with a relative path to the schema file.
+        """
+        is_cached = field.ref in self._targets
+        target = self.resolve_target(field.ref)
+        if target is None:
+            self.stats.unchanged += 1
             return
-
-    relative_ref = "#"
-    for ind, (part, own_part) in enumerate(zip(reference_module_path, schema.module_path)):
-        if part != own_part:
-            relative_ref = (
-                "../" * (len(schema.module_path) - ind - 1) + "/".join(reference_module_path[ind:]) + ".json#"
-            )
-            break
-
-    logger.debug("Updated reference %s to: %s", field.ref, relative_ref)
-    field.ref = relative_ref
+        if is_cached:
+            self.stats.cached += 1
+        else:
+            self.stats.resolved += 1
+        relative_ref = self.relative_path(tuple(schema.module_path), target)
+        logger.debug("Updated reference %s to: %s", field.ref, relative_ref)
+        field.ref = relative_ref
 
 
-def update_references(schema: SchemaMetadata, schemas: dict[str, SchemaMetadata], version: str):
+def update_reference(field: Reference, schema: SchemaMetadata, schemas: dict[str, SchemaMetadata], version: str):
     """
-    Update all references in a schema object. Iterates through the whole structure and calls `update_reference`
-    on every Reference object.
+    Update a reference to a schema file by replacing a URL reference or reference to definitions with a relative path
+    to the schema file. If using references to definitions, the schema file must be in the namespace.
+    Example of online reference:
+    https://raw.githubusercontent.com/BO4E/BO4E-Schemas/v202401.1.0-rc1/src/bo4e_schemas/bo/Angebot.json
+    Example of reference to definitions:
+    #/$defs/Angebot
+    To update many references, use a `ReferenceResolver` to reuse the already resolved references.
     """
+    ReferenceResolver(schemas, version).update_reference(field, schema)
 
-    def update_or_iter(_object: SchemaType):
-        if isinstance(_object, Object):
-            iter_object(_object)
-        elif isinstance(_object, AnyOf):
-            iter_any_of(_object)
-        elif isinstance(_object, AllOf):
-            iter_all_of(_object)
-        elif isinstance(_object, Array):
-            iter_array(_object)
-        elif isinstance(_object, Reference):
-            update_reference(_object, schema, schemas, version)
 
-    def iter_object(_object: Object):
-        for prop in _object.properties.values():
-            update_or_iter(prop)
+def _contains_reference(node: Node) -> bool:
+    return any(isinstance(child, Reference) for child in iter_nodes(node))
 
-    def iter_any_of(_object: AnyOf):
-        for item in _object.any_of:
-            update_or_iter(item)
 
-    def iter_all_of(_object: AllOf):
-        for item in _object.all_of:
-            update_or_iter(item)
-
-    def iter_array(_object: Array):
-        update_or_iter(_object.items)
+class ReferenceUpdater(SchemaVisitor):
+    """
+    Visitor which rewrites every reference of a schema into a relative path using a `ReferenceResolver`.
+    Shared (interned) children which contain references are replaced by copies before the traversal descends into
+    them. This way, only the paths to the references are copied and the shared nodes stay unmodified.
+    """
 
-    update_or_iter(schema.schema_parsed)
+    def __init__(self, schema: SchemaMetadata, resolver: ReferenceResolver):
+        self.schema = schema
+        self.resolver = resolver
+
+    def visit_reference(self, node: Reference):
+        """
+        Rewrite the reference.
+        """
+        self.resolver.update_reference(node, self.schema)
+
+    def visit_object(self, node: Object):
+        """
+        Copy the shared properties which contain references.
+        """
+        for name, child in node.properties.items():
+            if is_interned(child) and _contains_reference(child):
+                node.properties[name] = mutable_copy(child)
+
+    def visit_any_of(self, node: AnyOf):
+        """
+        Copy the shared types which contain references.
+        """
+        node.any_of[:] = [
+            mutable_copy(child) if is_interned(child) and _contains_reference(child) else child for child in node.any_of
+        ]
+
+    def visit_all_of(self, node: AllOf):
+        """
+        Copy the shared types which contain references.
+        """
+        node.all_of[:] = [
+            mutable_copy(child) if is_interned(child) and _contains_reference(child) else child for child in node.all_of
+        ]
+
+    def visit_array(self, node: Array):
+        """
+        Copy the shared item type if it contains references.
+        """
+        if is_interned(node.items) and _contains_reference(node.items):
+            node.items = mutable_copy(node.items)
+
+
+def update_references(
+    schema: SchemaMetadata,
+    schemas: dict[str, SchemaMetadata],
+    version: str,
+    resolver: ReferenceResolver | None = None,
+):
+    """
+    Update all references in a schema object. Walks through the whole structure and rewrites every Reference object.
+    Pass the same resolver for all schemas to reuse the already resolved references.
+    """
+    if resolver is None:
+        resolver = ReferenceResolver(schemas, version)
+    walk(schema.schema_parsed, ReferenceUpdater(schema, resolver))
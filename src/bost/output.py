@@ -0,0 +1,198 @@
+"""
+Contains the functionality to write the schemas into the output directory.
+The output directory contains a manifest with the content hashes of all written files. Files whose content didn't change
+since the last run are not written again. This way, their modification times stay untouched.
+Additionally, a list of the added, changed and removed files of the last run is written for incremental downstream
+builds.
+The schemas are rendered and written on a worker pool. Every file is written to a temporary file first and renamed
+into place afterward.
+"""
+
+import hashlib
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable
+
+from pydantic import BaseModel, Field
+
+from bost.cache import write_file_atomic
+from bost.logger import logger
+from bost.pull import DEFAULT_JOBS, SchemaMetadata
+from bost.serialization import dump_schema
+
+MANIFEST_FILE_NAME = ".bost-manifest"
+CHANGES_FILE_NAME = ".bost-changes"
+
+
+class SchemaRecord(BaseModel):
+    """
+    The inputs a schema file in the output directory was generated from. Used for incremental runs.
+    """
+
+    input_hash: str
+    """ The git blob SHA of the raw schema file or the content hash of an additional model """
+    key: str
+    """ Hash over all inputs which affect the generated file (see `bost.incremental`) """
+    references: list[str] = Field(default_factory=list)
+    """ The references of the raw schema, i.e. the edges of the dependency graph """
+    fields: list[str] = Field(default_factory=list)
+    """ The field names of the raw schema """
+
+
+class Manifest(BaseModel):
+    """
+    The content hashes of all files written by bost into the output directory
+    """
+
+    files: dict[str, str] = Field(default_factory=dict)
+    """ SHA256 hashes by the file path relative to the output directory, e.g. "bo/Angebot.json" """
+    schemas: dict[str, SchemaRecord] = Field(default_factory=dict)
+    """ The inputs of the files by their relative path. Only written by incremental runs. """
+
+
+class ChangeSet(BaseModel):
+    """
+    The files which changed in the output directory during the last run
+    """
+
+    added: list[str] = Field(default_factory=list)
+    changed: list[str] = Field(default_factory=list)
+    removed: list[str] = Field(default_factory=list)
+    unchanged: int = 0
+
+    @property
+    def has_changes(self) -> bool:
+        """
+        True if any file was added, changed or removed.
+        """
+        return len(self.added) > 0 or len(self.changed) > 0 or len(self.removed) > 0
+
+
+def load_manifest(output: Path) -> Manifest:
+    """
+    Load the manifest of the output directory. Returns an empty manifest if there is none.
+    """
+    manifest_file = output / MANIFEST_FILE_NAME
+    if not manifest_file.exists():
+        return Manifest(files={})
+    return Manifest.model_validate_json(manifest_file.read_text(encoding="utf-8"))
+
+
+def content_hash(content: bytes) -> str:
+    """
+    Calculate the hash of a rendered schema which is stored in the manifest.
+    """
+    return hashlib.sha256(content).hexdigest()
+
+
+def _render(schema: SchemaMetadata) -> bytes:
+    return dump_schema(schema.schema_parsed).encode("utf-8")
+
+
+def _render_all(schemas: list[SchemaMetadata], jobs: int) -> list[bytes]:
+    """
+    Render the schemas on a worker pool. The order of the result matches the order of the schemas.
+    """
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="bost-render") as executor:
+        return list(executor.map(_render, schemas))
+
+
+def _write_files(files: list[tuple[Path, bytes]], jobs: int) -> None:
+    """
+    Write the files on a worker pool. Each distinct parent directory is created only once beforehand.
+    """
+    for directory in {file_path.parent for file_path, _ in files}:
+        directory.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="bost-write") as executor:
+        futures = [
+            executor.submit(write_file_atomic, file_path, content, create_parents=False) for file_path, content in files
+        ]
+    for future in futures:
+        # Propagate possible exceptions of the workers
+        future.result()
+    for file_path, _ in files:
+        logger.info("Saved %s", file_path)
+
+
+def _compare_with_manifest(
+    schemas: list[SchemaMetadata],
+    contents: list[bytes],
+    output: Path,
+    previous_files: dict[str, str],
+    files: dict[str, str],
+) -> tuple[list[str], list[str], list[tuple[Path, bytes]]]:
+    """
+    Add the content hashes of the rendered schemas to `files` and compare them with the files of the last run.
+    Returns the added and changed relative paths and the files which have to be written.
+    """
+    added: list[str] = []
+    changed: list[str] = []
+    to_write: list[tuple[Path, bytes]] = []
+    for schema, content in zip(schemas, contents):
+        relative_path = schema.file_path.relative_to(output).as_posix()
+        files[relative_path] = content_hash(content)
+        if previous_files.get(relative_path) == files[relative_path] and schema.file_path.exists():
+            continue
+        to_write.append((schema.file_path, content))
+        if relative_path in previous_files:
+            changed.append(relative_path)
+        else:
+            added.append(relative_path)
+    return added, changed, to_write
+
+
+def _write_manifest(output: Path, manifest: Manifest, changes: ChangeSet) -> None:
+    write_file_atomic(output / MANIFEST_FILE_NAME, manifest.model_dump_json(indent=2).encode("utf-8"))
+    write_file_atomic(output / CHANGES_FILE_NAME, changes.model_dump_json(indent=2).encode("utf-8"))
+    logger.info(
+        "Output: %d added, %d changed, %d removed, %d unchanged",
+        len(changes.added),
+        len(changes.changed),
+        len(changes.removed),
+        changes.unchanged,
+    )
+
+
+# pylint: disable=too-many-arguments
+def save_schemas(
+    schemas: Iterable[SchemaMetadata],
+    output: Path,
+    clear_output: bool,
+    jobs: int = DEFAULT_JOBS,
+    unchanged: Iterable[str] = (),
+    records: dict[str, SchemaRecord] | None = None,
+) -> ChangeSet:
+    """
+    Save all schemas to the output directory. Clears the output directory beforehand if requested.
+    Only files whose content differs from the manifest of the last run are written. Files which were written by the
+    last run but don't belong to the schemas anymore are removed.
+    The schemas are rendered and written on a worker pool with `jobs` workers. Each distinct directory is created only
+    once and each file is replaced atomically.
+    Incremental runs pass the relative paths of the files which are kept from the last run without rendering them as
+    `unchanged` and the inputs of the saved schemas as `records`.
+    Writes the new manifest and the list of changes into the output directory and returns the changes.
+    """
+    if clear_output and output.exists():
+        shutil.rmtree(output)
+        logger.info("Cleared output directory")
+    schemas = list(schemas)
+    previous = load_manifest(output)
+    files: dict[str, str] = {path: previous.files[path] for path in unchanged if path in previous.files}
+    schema_records = {path: previous.schemas[path] for path in files if path in previous.schemas}
+    schema_records.update(records or {})
+
+    added, changed, to_write = _compare_with_manifest(
+        schemas, _render_all(schemas, jobs), output, previous.files, files
+    )
+    output.mkdir(parents=True, exist_ok=True)
+    _write_files(to_write, jobs)
+
+    removed = sorted(previous.files.keys() - files.keys())
+    for relative_path in removed:
+        (output / relative_path).unlink(missing_ok=True)
+        logger.info("Removed %s", output / relative_path)
+
+    changes = ChangeSet(added=added, changed=changed, removed=removed, unchanged=len(files) - len(to_write))
+    _write_manifest(output, Manifest(files=files, schemas=schema_records), changes)
+    return changes
@@ -0,0 +1,288 @@
+"""
+Contains the transformations of the pulled schemas, i.e. the operations defined in the config file and the reference
+and version updates. Shared by the command line interface, the asynchronous API and the server.
+"""
+
+from pathlib import Path
+from typing import Sequence
+
+from bost.config import AdditionalEnumItem, AdditionalField, Config
+from bost.index import FieldIndex
+from bost.interning import is_interned_tree, mutable_copy, unshared
+from bost.logger import logger
+from bost.matching import PatternIndex
+from bost.operations import (
+    ReferenceResolver,
+    add_additional_enum_items,
+    add_additional_property,
+    field_to_non_nullable,
+    update_references,
+)
+from bost.profiling import phase
+from bost.pull import SchemaMetadata, additional_schema_iterator
+from bost.schema import AnyOf, Object, SchemaRootObject, StrEnum
+from bost.selection import config_references, select_schemas
+
+
+def _log_unmatched(pattern: str, partial: bool) -> None:
+    if partial:
+        # The pattern may match the schemas which aren't part of this (e.g. incremental) run
+        logger.debug("Pattern '%s' did not match any fields of the processed schemas", pattern)
+    else:
+        logger.warning("Pattern '%s' did not match any fields", pattern)
+
+
+def warn_unmatched_patterns(config: Config, namespace: dict[str, SchemaMetadata]) -> None:
+    """
+    Warn about the patterns of the config which don't match any schema or field of the whole namespace. In partial
+    runs, the transformations only see the processed schemas and can't tell whether a pattern has no matches at all.
+    Fields are only matched against the loaded schemas. If some schemas aren't loaded, non-nullable patterns without
+    matches aren't warned about.
+    """
+    module_names = [schema.module_name for schema in namespace.values()]
+    for pattern_index in (
+        PatternIndex(
+            [
+                additional_field.pattern
+                for additional_field in config.additional_fields
+                if isinstance(additional_field, AdditionalField)
+            ]
+        ),
+        PatternIndex([additional_item.pattern for additional_item in config.additional_enum_items]),
+    ):
+        matched = {index for module_name in module_names for index in pattern_index.match(module_name)}
+        for index, pattern in enumerate(pattern_index.patterns):
+            if index not in matched:
+                _log_unmatched(pattern, partial=False)
+
+    non_nullable_index = PatternIndex(config.non_nullable_fields)
+    loaded = [schema for schema in namespace.values() if schema.is_loaded]
+    matched = {
+        index
+        for schema in loaded
+        if isinstance(schema.schema_parsed, Object)
+        for field_name in schema.schema_parsed.properties
+        for index in non_nullable_index.match(f"{schema.module_name}.{field_name}")
+    }
+    for index, pattern in enumerate(non_nullable_index.patterns):
+        if index not in matched:
+            _log_unmatched(pattern, partial=len(loaded) < len(namespace))
+
+
+def transform_all_non_nullable_fields(
+    required_field_patters: list[str],
+    schemas: dict[str, SchemaMetadata],
+    field_index: FieldIndex | None = None,
+    partial: bool = False,
+):
+    """
+    Apply the required field patterns to all schemas.
+    Only the `AnyOf` fields with a default value of the field index are matched. Fields without a `Null` type can't be
+    made non-nullable and are skipped with a warning. If no index is given, it is built from the schemas.
+    Set `partial` if only a part of the schemas is processed. Then, patterns without matches aren't warned about.
+    """
+    if field_index is None:
+        field_index = FieldIndex(schemas.values())
+    candidates = (
+        (entry.path, entry)
+        for entry in field_index.by_type(AnyOf)
+        if entry.has_default and isinstance(entry.schema.schema_parsed, SchemaRootObject)
+    )
+    pattern_index = PatternIndex(required_field_patters)
+    transformed: set[str] = set()
+    for pattern, matched_fields in zip(pattern_index.patterns, pattern_index.group_matches(candidates)):
+        matches = 0
+        for entry in matched_fields:
+            if entry.path in transformed:
+                # A previous pattern already transformed the field
+                continue
+            if not entry.nullable:
+                logger.warning(
+                    "Pattern '%s' matched field %s, but it has no Null type and can't be made non-nullable",
+                    pattern,
+                    entry.path,
+                )
+                continue
+            matches += 1
+            transformed.add(entry.path)
+            field_to_non_nullable(entry.schema.schema_parsed, entry.field_name)  # type: ignore[arg-type]
+            field_index.update_field(entry.schema, entry.field_name)
+            logger.info("Applied pattern '%s' to field %s", pattern, entry.path)
+        if matches == 0:
+            _log_unmatched(pattern, partial)
+        else:
+            logger.info("Pattern '%s' matched %d fields", pattern, matches)
+
+
+def transform_all_additional_fields(
+    additional_fields: list[AdditionalField],
+    schemas: dict[str, SchemaMetadata],
+    field_index: FieldIndex | None = None,
+    partial: bool = False,
+):
+    """
+    Apply the additional field patterns to all schemas and adds the respective field definition.
+    The added fields are updated in the field index if given. See `transform_all_non_nullable_fields` for `partial`.
+    """
+    pattern_index = PatternIndex([additional_field.pattern for additional_field in additional_fields])
+    matched_schemas = pattern_index.group_matches((schema.module_name, schema) for schema in schemas.values())
+    for additional_field, matched in zip(additional_fields, matched_schemas):
+        matches = 0
+        for schema in matched:
+            if isinstance(schema.schema_parsed, Object):
+                matches += 1
+                add_additional_property(schema.schema_parsed, additional_field.field_def, additional_field.field_name)
+                if field_index is not None:
+                    field_index.update_field(schema, additional_field.field_name)
+
+                if (
+                    "default" not in additional_field.field_def.__pydantic_fields_set__
+                    and additional_field.field_name not in schema.schema_parsed.required
+                ):
+                    if "required" not in schema.schema_parsed.__pydantic_fields_set__:
+                        schema.schema_parsed.required = []
+                    schema.schema_parsed.required.append(additional_field.field_name)
+                logger.info(
+                    "Applied pattern '%s' to schema %s. Added field %s",
+                    additional_field.pattern,
+                    schema.module_name,
+                    additional_field.field_name,
+                )
+        if matches == 0:
+            _log_unmatched(additional_field.pattern, partial)
+        else:
+            logger.info("Pattern '%s' matched %d fields", additional_field.pattern, matches)
+
+
+def transform_all_additional_enum_items(
+    additional_enum_items: list[AdditionalEnumItem], schemas: dict[str, SchemaMetadata], partial: bool = False
+):
+    """
+    Apply the additional enum item patterns to all schemas and adds the respective enum items.
+    See `transform_all_non_nullable_fields` for `partial`.
+    """
+    pattern_index = PatternIndex([additional_item.pattern for additional_item in additional_enum_items])
+    matched_schemas = pattern_index.group_matches((schema.module_name, schema) for schema in schemas.values())
+    for additional_item, matched in zip(additional_enum_items, matched_schemas):
+        matches = 0
+        for schema in matched:
+            if isinstance(schema.schema_parsed, StrEnum):
+                matches += 1
+                add_additional_enum_items(schema.schema_parsed, additional_item.items)
+                logger.info(
+                    "Applied pattern '%s' to schema %s. Added enum items %s",
+                    additional_item.pattern,
+                    schema.module_name,
+                    str(additional_item.items),
+                )
+        if matches == 0:
+            _log_unmatched(additional_item.pattern, partial)
+        else:
+            logger.info("Pattern '%s' matched %d fields", additional_item.pattern, matches)
+
+
+# pylint: disable=too-many-arguments
+def process_schemas(
+    schemas: dict[str, SchemaMetadata],
+    config: Config | None,
+    target_version: str,
+    update_refs: bool,
+    set_default_version: bool,
+    namespace: dict[str, SchemaMetadata] | None = None,
+) -> None:
+    """
+    Apply the operations defined in the config file and the reference and version updates to the schemas.
+    The additional models of the config must already be part of `schemas`.
+    References are resolved against the `namespace`, which defaults to `schemas`. Pass all schemas as namespace if only
+    a part of them is processed. In this case, the config patterns are checked for matches against the whole namespace
+    (see `warn_unmatched_patterns`), since they may match the schemas which aren't processed.
+    """
+    if namespace is None:
+        namespace = schemas
+    partial = any(name not in schemas for name in namespace)
+    if config is not None and partial:
+        warn_unmatched_patterns(config, namespace)
+    if config is not None:
+        with phase("transform_additional_fields"):
+            field_index = FieldIndex(schemas.values())
+            transform_all_additional_fields(
+                config.additional_fields, schemas, field_index, partial  # type: ignore[arg-type]
+            )
+            # the load_config function ensures that the references are resolved.
+            logger.info("Added all additional fields")
+        with phase("transform_non_nullable_fields"):
+            transform_all_non_nullable_fields(config.non_nullable_fields, schemas, field_index, partial)
+            logger.info("Transformed all non nullable fields")
+        with phase("transform_additional_enum_items"):
+            transform_all_additional_enum_items(config.additional_enum_items, schemas, partial)
+            logger.info("Added all additional enum items")
+
+    if update_refs:
+        with phase("update_references"):
+            resolver = ReferenceResolver(namespace, target_version)
+            for schema in schemas.values():
+                update_references(schema, namespace, target_version, resolver)
+                schema.schema_parsed.defs = {}
+                schema.schema_parsed.__pydantic_fields_set__.discard("defs")
+                # When updating the references, the definitions are not needed anymore since they are replaced
+                # by relative references.
+        logger.info(
+            "Updated github references: %d resolved, %d cached, %d unchanged",
+            resolver.stats.resolved,
+            resolver.stats.cached,
+            resolver.stats.unchanged,
+        )
+
+    if set_default_version:
+        with phase("set_default_version"):
+            for schema in schemas.values():
+                if isinstance(schema.schema_parsed, Object) and "_version" in schema.schema_parsed.properties:
+                    properties = schema.schema_parsed.properties
+                    properties["_version"] = unshared(properties["_version"])
+                    properties["_version"].default = target_version
+        logger.info("Set default versions to %s", target_version)
+
+
+# pylint: disable=too-many-arguments
+def add_and_select_schemas(
+    schemas: dict[str, SchemaMetadata],
+    config: Config | None,
+    config_file: Path | None,
+    output: Path,
+    target_version: str,
+    include: Sequence[str],
+    exclude: Sequence[str],
+    jobs: int,
+) -> dict[str, SchemaMetadata]:
+    """
+    Add the additional models of the config to the schemas. If `include` or `exclude` patterns are given, only the
+    matching schemas, the additional models and all schemas referenced by them are kept. The kept schemas are loaded.
+    """
+    additional_schemas = dict(additional_schema_iterator(config, config_file, output))
+    schemas = {**schemas, **additional_schemas}
+    if config is not None:
+        logger.info("Added all additional models")
+    if len(include) == 0 and len(exclude) == 0:
+        return schemas
+    return select_schemas(
+        schemas,
+        target_version,
+        include,
+        exclude,
+        always_include=additional_schemas.keys(),
+        extra_references=config_references(config),
+        jobs=jobs,
+    )
+
+
+def fresh_copy(schema: SchemaMetadata) -> SchemaMetadata:
+    """
+    Copy the metadata and the parsed schema so that the copy can be processed without changing the original.
+    If the sub-schemas are interned, only the root is copied and the sub-schemas are copied on mutation.
+    """
+    schema_copy = schema.model_copy()
+    if is_interned_tree(schema.schema_parsed):
+        schema_copy.schema_parsed = mutable_copy(schema.schema_parsed)
+    else:
+        schema_copy.schema_parsed = schema.schema_parsed.model_copy(deep=True)
+    return schema_copy
@@ -0,0 +1,260 @@
+"""
+Contains the profiling mode of the pull pipeline.
+While a `Profiler` is active, every phase of the pipeline (marked with `phase`) records its wall time, CPU time and
+peak memory as well as the number of HTTP requests and transferred bytes. The cache hits and misses are counted per
+cache (raw files, validated models, file trees and revalidated API responses). Optionally, one phase is profiled
+with cProfile.
+If no profiler is active, `phase` and `count_cache` do nothing, so the pipeline can be instrumented unconditionally.
+"""
+
+import cProfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator
+
+import requests
+from pydantic import BaseModel, Field
+
+from bost.logger import logger
+
+PHASES = (
+    "resolve_version",
+    "discovery",
+    "select",
+    "plan",
+    "download",
+    "parse",
+    "transform_additional_fields",
+    "transform_non_nullable_fields",
+    "transform_additional_enum_items",
+    "update_references",
+    "set_default_version",
+    "save",
+)
+""" The phases of the pull pipeline in the order they are executed """
+
+
+class PhaseReport(BaseModel):
+    """
+    The measurements of one phase
+    """
+
+    name: str
+    wall_time: float
+    """ Elapsed time in seconds """
+    cpu_time: float
+    """ CPU time of the whole process (i.e. of all threads) in seconds """
+    peak_memory: int
+    """ Peak of the memory allocated by Python during the phase in bytes (measured with tracemalloc) """
+    http_requests: int
+    bytes_transferred: int
+    """ Size of the received response bodies in bytes """
+
+
+class ProfileReport(BaseModel):  # pylint: disable=too-many-instance-attributes
+    """
+    The measurements of a whole run
+    """
+
+    phases: list[PhaseReport] = Field(default_factory=list)
+    wall_time: float = 0
+    cpu_time: float = 0
+    peak_memory: int = 0
+    http_requests: int = 0
+    bytes_transferred: int = 0
+    cache_hits: dict[str, int] = Field(default_factory=dict)
+    """ Number of cache hits by cache, i.e. "blobs", "models", "file_trees" or "responses" """
+    cache_misses: dict[str, int] = Field(default_factory=dict)
+    cprofile_file: Path | None = None
+    """ The cProfile dump of the profiled phase if requested """
+
+    def save(self, path: Path) -> None:
+        """
+        Write the report as JSON.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(self.model_dump_json(indent=2))
+
+
+_ACTIVE_PROFILER: "Profiler | None" = None
+
+
+@dataclass
+class _Counters:
+    http_requests: int = 0
+    bytes_transferred: int = 0
+    cache_hits: dict[str, int] = field(default_factory=dict)
+    cache_misses: dict[str, int] = field(default_factory=dict)
+    phases: list[PhaseReport] = field(default_factory=list)
+
+
+class Profiler:  # pylint: disable=too-many-instance-attributes
+    """
+    Records the phases of the pipeline while it is active. Use it as a context manager:
+    `with Profiler() as profiler: ...` and get the results from `profiler.report`.
+    While active, all requests of `requests` sessions (including the ones of PyGithub) are counted and the memory
+    allocations are traced. Tracing the allocations slows the run down.
+    """
+
+    def __init__(self, cprofile_phase: str | None = None, cprofile_file: Path | None = None):
+        if cprofile_phase is not None and cprofile_file is None:
+            raise ValueError("A file for the cProfile dump is required to profile a phase")
+        self.cprofile_phase = cprofile_phase
+        self.cprofile_file = cprofile_file
+        self.report = ProfileReport()
+        self._counters = _Counters()
+        self._lock = threading.Lock()
+        self._peaks: list[int] = []
+        """ The peak memory of every open phase before its last reset """
+        self._run_peak = 0
+        self._cprofile: cProfile.Profile | None = None
+        self._original_send = requests.Session.send
+        self._start: tuple[float, float] = (0, 0)
+
+    def __enter__(self) -> "Profiler":
+        global _ACTIVE_PROFILER  # pylint: disable=global-statement
+        if _ACTIVE_PROFILER is not None:
+            raise RuntimeError("Another profiler is already active")
+        _ACTIVE_PROFILER = self
+        original_send = self._original_send
+        count_response = self.count_response
+
+        def send(session: requests.Session, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+            response = original_send(session, request, **kwargs)
+            count_response(response, kwargs.get("stream", False))
+            return response
+
+        setattr(requests.Session, "send", send)
+        tracemalloc.start()
+        self._start = (time.perf_counter(), time.process_time())
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        global _ACTIVE_PROFILER  # pylint: disable=global-statement
+        self.report.wall_time = time.perf_counter() - self._start[0]
+        self.report.cpu_time = time.process_time() - self._start[1]
+        self._add_peak(tracemalloc.get_traced_memory()[1])
+        self.report.peak_memory = self._run_peak
+        tracemalloc.stop()
+        setattr(requests.Session, "send", self._original_send)
+        _ACTIVE_PROFILER = None
+        self.report.http_requests = self._counters.http_requests
+        self.report.bytes_transferred = self._counters.bytes_transferred
+        self.report.cache_hits = dict(self._counters.cache_hits)
+        self.report.cache_misses = dict(self._counters.cache_misses)
+        self.report.phases = list(self._counters.phases)
+
+    def count_response(self, response: requests.Response, stream: bool = False) -> None:
+        """
+        Count a request and the size of its response body. The body of streamed responses isn't read for this.
+        """
+        size = int(response.headers.get("Content-Length", 0)) if stream else len(response.content)
+        with self._lock:
+            self._counters.http_requests += 1
+            self._counters.bytes_transferred += size
+
+    def count_cache(self, cache: str, hit: bool) -> None:
+        """
+        Count a hit or a miss of the cache.
+        """
+        with self._lock:
+            counts = self._counters.cache_hits if hit else self._counters.cache_misses
+            counts[cache] = counts.get(cache, 0) + 1
+
+    def _add_peak(self, peak: int) -> None:
+        if len(self._peaks) > 0:
+            self._peaks[-1] = max(self._peaks[-1], peak)
+        else:
+            self._run_peak = max(self._run_peak, peak)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Measure the enclosed code as phase `name`. Phases may be nested.
+        """
+        # Resetting the peak for this phase would lose the peak of the enclosing phase so far. It is kept separately.
+        self._add_peak(tracemalloc.get_traced_memory()[1])
+        self._peaks.append(0)
+        tracemalloc.reset_peak()
+        requests_before, bytes_before = self._counters.http_requests, self._counters.bytes_transferred
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        if name == self.cprofile_phase:
+            # If the phase is executed several times (e.g. in watch mode), the stats are accumulated
+            if self._cprofile is None:
+                self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        try:
+            yield
+        finally:
+            if name == self.cprofile_phase and self._cprofile is not None:
+                self._cprofile.disable()
+                assert self.cprofile_file is not None
+                self._cprofile.dump_stats(self.cprofile_file)
+                self.report.cprofile_file = self.cprofile_file
+            peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+            self._add_peak(peak)
+            self._counters.phases.append(
+                PhaseReport(
+                    name=name,
+                    wall_time=time.perf_counter() - start_wall,
+                    cpu_time=time.process_time() - start_cpu,
+                    peak_memory=peak,
+                    http_requests=self._counters.http_requests - requests_before,
+                    bytes_transferred=self._counters.bytes_transferred - bytes_before,
+                )
+            )
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Measure the enclosed code as phase `name` if a profiler is active.
+    """
+    if _ACTIVE_PROFILER is None:
+        yield
+        return
+    with _ACTIVE_PROFILER.phase(name):
+        yield
+
+
+def count_cache(cache: str, hit: bool) -> None:
+    """
+    Count a hit or a miss of the cache if a profiler is active.
+    """
+    if _ACTIVE_PROFILER is not None:
+        _ACTIVE_PROFILER.count_cache(cache, hit)
+
+
+@contextmanager
+def profiled(report_file: Path | None, cprofile_phase: str | None = None) -> Iterator[None]:
+    """
+    Profile the enclosed code and write the report to `report_file`. Does nothing if `report_file` is None.
+    If `cprofile_phase` is set, this phase is profiled with cProfile and the stats are dumped next to the report
+    (e.g. "report.download.prof" for "report.json" and the phase "download"). cProfile only records the thread which
+    executes the phase, i.e. not the work of the worker threads.
+    The report is written even if the enclosed code fails.
+    """
+    if report_file is None:
+        yield
+        return
+    cprofile_file = None
+    if cprofile_phase is not None:
+        cprofile_file = report_file.with_name(f"{report_file.stem}.{cprofile_phase}.prof")
+    profiler = Profiler(cprofile_phase, cprofile_file)
+    try:
+        with profiler:
+            yield
+    finally:
+        profiler.report.save(report_file)
+        logger.info(
+            "Profile: %.2f s wall time, %.2f s CPU time, %d bytes peak memory, %d HTTP requests. Saved report to %s",
+            profiler.report.wall_time,
+            profiler.report.cpu_time,
+            profiler.report.peak_memory,
+            profiler.report.http_requests,
+            report_file,
+        )
@@ -1,26 +1,94 @@
 """
-Contains functions to pull the BO4E-Schemas from GitHub.
+Contains functions to pull the BO4E-Schemas from GitHub or from a local mirror.
 """
 
+import io
+import re
+import subprocess
+import threading
+import tomllib
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from pathlib import Path
-from typing import Annotated, ItemsView, Iterable, KeysView, Union, ValuesView
+from typing import Annotated, Any, Callable, ItemsView, Iterable, KeysView, Literal, Union, ValuesView
+from urllib.parse import urlparse
+from urllib.request import url2pathname
 
 import requests
 from github import Github
 from github.Auth import Token
+from github.GithubException import GithubException, RateLimitExceededException
+from github.GithubObject import GithubObject
 from github.Repository import Repository
-from pydantic import BaseModel, Field, RootModel, TypeAdapter, ValidationError
+from pydantic import BaseModel, Field, RootModel, ValidationError
 from requests import Response
-
-from bost.cache import CACHE_FILE_NAME, CacheData, get_cached_file, get_cached_file_tree, save_cache
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from bost.cache import (
+    CacheData,
+    CachedResponse,
+    CachedVersion,
+    add_cached_response,
+    add_cached_version,
+    get_cached_blob,
+    get_cached_file_tree,
+    get_cached_model,
+    get_cached_response,
+    git_blob_sha,
+    load_cached_model,
+    save_cached_model,
+    write_file_atomic,
+)
 from bost.config import Config
 from bost.logger import logger
+from bost.profiling import count_cache
+from bost.ratelimit import get_scheduler
 from bost.schema import Object, Reference, SchemaRootType
+from bost.serialization import dump_schema, parse_schema
 
 OWNER = "bo4e"
 REPO = "BO4E-Schemas"
 TIMEOUT = 10  # in seconds
+ARCHIVE_TIMEOUT = 60  # in seconds
+DEFAULT_JOBS = 8
+RAW_URL = f"https://raw.githubusercontent.com/{OWNER}/{REPO}"
+API_URL = f"https://api.github.com/repos/{OWNER}/{REPO}"
+API_HOST = urlparse(API_URL).netloc
+SCHEMAS_DIR = "src/bo4e_schemas"
+ARCHIVE_URL = f"https://github.com/{OWNER}/{REPO}/archive/refs/tags/{{version}}.zip"
+
+DiscoveryMode = Literal["tree", "contents"]
+""" How the schema files of a release are discovered. See `_github_tree_query`. """
+SourceMode = Literal["github", "archive"]
+""" Where the schema files are pulled from. See `schema_iterator` and `archive_schema_iterator`. """
+VERSION_REGEX = re.compile(r"^v?(?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+)(?:-rc(?P<rc>\d+))?$")
+PACKAGE_VERSION_REGEX = re.compile(r"^(?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+)(?:rc(?P<rc>\d+))?$")
+""" A version in the package metadata of BO4E-Schemas (PEP 440), e.g. "202401.1.0" or "0.6.1rc13" """
+NON_SCHEMA_DIRS = ("__pycache__", "node_modules")
+""" Directories of a checkout which may contain JSON files that aren't schemas, besides the hidden directories """
+
+
+_SESSION = requests.Session()
+_SESSION_POOL_SIZE = 0
+_SESSION_LOCK = threading.Lock()
+
+
+def get_session(pool_size: int = DEFAULT_JOBS) -> requests.Session:
+    """
+    Get the shared session whose connection pool keeps at least `pool_size` connections alive.
+    The session is reused for all requests, so consecutive requests don't need a new TCP/TLS handshake. There is only
+    one session: if a larger pool is requested than before, the pool of the session is enlarged.
+    """
+    global _SESSION_POOL_SIZE  # pylint: disable=global-statement
+    with _SESSION_LOCK:
+        if pool_size > _SESSION_POOL_SIZE:
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            _SESSION.mount("https://", adapter)
+            _SESSION.mount("http://", adapter)
+            _SESSION_POOL_SIZE = pool_size
+    return _SESSION
 
 
 class SchemaMetadata(BaseModel):
@@ -29,6 +97,9 @@ class SchemaMetadata(BaseModel):
     """
 
     _schema: SchemaRootType | None = None
+    _schema_text: str | None = None
+    _content_verified: bool = False
+    """ True if the loaded raw content matches the git blob SHA. Only models of verified content are cached. """
     class_name: str
     download_url: str
     module_path: tuple[str, ...]
@@ -36,6 +107,10 @@ class SchemaMetadata(BaseModel):
     file_path: Path
     cached_path: Path | None
     token: str | None
+    sha: str | None = None
+    """ The git blob SHA of the raw schema file if known. Used to verify cached files. """
+    cached_model_path: Path | None = None
+    """ Path to the cached, already validated schema model """
 
     @property
     def module_name(self) -> str:
@@ -48,18 +123,24 @@ class SchemaMetadata(BaseModel):
     def schema_parsed(self) -> SchemaRootType:
         """
         The parsed schema. Downloads the schema from GitHub if needed.
+        If the validated model is cached, it is loaded from the cache without validating the raw file again.
         """
+        if self._schema is None and self.has_cached_model:
+            assert self.cached_model_path is not None
+            self._schema = load_cached_model(self.cached_model_path)
+            if self._schema is not None:
+                logger.debug("Loaded model %s from cache", self.cached_model_path)
+                count_cache("models", hit=True)
         if self._schema is None:
-            if self.cached_path is not None and self.cached_path.exists():
-                self._schema = TypeAdapter(SchemaRootType).validate_json(  # type: ignore[assignment]
-                    self.cached_path.read_text()
-                )
-                logger.info("Loaded %s from cache", self.cached_path)
-            else:
-                schema_response = self._download_schema()
-                self._schema = TypeAdapter(SchemaRootType).validate_json(  # type: ignore[assignment]
-                    schema_response.text
-                )
+            if self.cached_model_path is not None:
+                count_cache("models", hit=False)
+            schema_text = self.load_schema_text()
+            self._schema = parse_schema(schema_text)
+            if self.cached_model_path is not None and self._content_verified:
+                # Only models of verified files are cached since the model cache is keyed by the blob SHA
+                save_cached_model(self.cached_model_path, self._schema)
+            # The raw text is not needed anymore once the schema is parsed.
+            self._schema_text = None
         assert self._schema is not None
         return self._schema
 
@@ -67,32 +148,119 @@ class SchemaMetadata(BaseModel):
     def schema_parsed(self, value: SchemaRootType):
         self._schema = value
 
-    def _download_schema(self) -> Response:
+    @property
+    def schema_text(self) -> str:
+        """
+        The raw content of the schema file. Loads the content if needed.
+        """
+        return self.load_schema_text()
+
+    @schema_text.setter
+    def schema_text(self, value: str):
+        self._schema_text = value
+        self._content_verified = self.sha is not None and git_blob_sha(value.encode("utf-8")) == self.sha
+
+    @property
+    def has_cached_model(self) -> bool:
+        """
+        True if the validated schema model is available in the cache.
+        """
+        return self.cached_model_path is not None and self.cached_model_path.exists()
+
+    @property
+    def is_loaded(self) -> bool:
+        """
+        True if the schema is already parsed or its raw content is already loaded.
+        """
+        return self._schema is not None or self._schema_text is not None
+
+    def load_schema_text(self, session: requests.Session | None = None) -> str:
+        """
+        Load the raw content of the schema file. Reads it from the cache if possible, otherwise downloads it
+        from GitHub. Schemas of a local mirror (i.e. with a file:// download URL) are read from the mirror.
+        The content is kept until the schema gets parsed.
+        """
+        if self._schema_text is None:
+            if self.cached_path is not None and self.cached_path.exists():
+                content = self.cached_path.read_bytes()
+                if self.sha is None or git_blob_sha(content) == self.sha:
+                    self._schema_text = content.decode("utf-8")
+                    self._content_verified = self.sha is not None
+                    logger.info("Loaded %s from cache", self.cached_path)
+                    count_cache("blobs", hit=True)
+                    return self._schema_text
+                logger.warning("Cached file %s is corrupted and will be downloaded again", self.cached_path)
+            if self.cached_path is not None:
+                count_cache("blobs", hit=False)
+            if self.download_url.startswith("file:"):
+                self._schema_text = file_url_to_path(self.download_url).read_text(encoding="utf-8")
+                self._content_verified = False
+            else:
+                response = self._download_schema(session)
+                self._schema_text = response.text
+                self._content_verified = self.cache_content(response.content)
+        return self._schema_text
+
+    def set_content(self, content: bytes, content_sha: str | None = None):
+        """
+        Set the raw content of the schema file, verify it and write it into the cache (see `cache_content`).
+        If the git blob SHA of the content was computed already, pass it as `content_sha` to not hash it again.
+        """
+        self._schema_text = content.decode("utf-8")
+        self._content_verified = self.cache_content(content, content_sha)
+
+    def verify_content(self, content: bytes, content_sha: str | None = None) -> bool:
+        """
+        True if the raw content matches the git blob SHA. Logs a warning on a mismatch. If the SHA is unknown, the
+        content can't be verified and False is returned without a warning.
+        The content is only hashed if its git blob SHA isn't passed as `content_sha`.
+        """
+        if self.sha is None:
+            return False
+        if (content_sha or git_blob_sha(content)) != self.sha:
+            logger.warning(
+                "Content of %s doesn't match the expected blob SHA %s. Neither the file nor its model will be cached.",
+                self.download_url,
+                self.sha,
+            )
+            return False
+        return True
+
+    def cache_content(self, content: bytes, content_sha: str | None = None) -> bool:
+        """
+        Write the raw content of the schema file into the cache if the cache is enabled.
+        If the git blob SHA is known, the content will only be cached if it matches the SHA.
+        The file is written to a temporary file first and then moved into place. Since identical files share the same
+        cache entry, this prevents concurrent writers from reading half-written files.
+        Returns True if the content is verified (see `verify_content`).
+        """
+        verified = self.verify_content(content, content_sha)
+        if self.cached_path is None or (self.sha is not None and not verified):
+            return verified
+        write_file_atomic(self.cached_path, content)
+        logger.debug("Cached %s", self.cached_path)
+        return verified
+
+    def _download_schema(self, session: requests.Session | None = None) -> Response:
         """
         Download the schema from GitHub. Returns the response object.
+        If no session is given, the shared session from `get_session` is used. The request is scheduled within the
+        rate limits of the token(s) (see `bost.ratelimit`).
         """
-        if self.token is not None:
-            headers = {"Authorization": f"Bearer {self.token}"}
-        else:
-            headers = None
-        response = requests.get(self.download_url, timeout=TIMEOUT, headers=headers)
+        if session is None:
+            session = get_session()
+        response = get_scheduler(self.token).request(session, "GET", self.download_url, timeout=TIMEOUT)
         if response.status_code != 200:
             raise ValueError(f"Could not download schema from {self.download_url}: {response.text}")
         logger.info("Downloaded %s", self.download_url)
-        if self.cached_path is not None:
-            self.cached_path.parent.mkdir(parents=True, exist_ok=True)
-            self.cached_path.write_text(response.text)
-            logger.debug("Cached %s", self.cached_path)
         return response
 
     def save(self):
         """
         Save the parsed schema to the file defined by `file_path`. Creates parent directories if needed.
+        The file is replaced atomically, i.e. it is either fully updated or left untouched.
         """
-        self.file_path.parent.mkdir(parents=True, exist_ok=True)
-        self.file_path.write_text(
-            self.schema_parsed.model_dump_json(indent=2, exclude_unset=True, by_alias=True), encoding="utf-8"
-        )
+        write_file_atomic(self.file_path, dump_schema(self.schema_parsed).encode("utf-8"))
 
     def field_paths(self) -> Iterable[tuple[str, str]]:
         """
@@ -116,6 +284,8 @@ class SchemaInFileTree(BaseModel):
     path: str
     module_path: tuple[str, ...]
     download_url: str
+    sha: str | None = None
+    """ The git blob SHA of the file """
 
 
 class SchemaTree(RootModel):
@@ -193,109 +363,492 @@ class SchemaTree(RootModel):
 
 
 SchemaTree.model_rebuild()
+CachedVersion.model_rebuild()
 CacheData.model_rebuild()
 
 
-@lru_cache(maxsize=1)
+@lru_cache(maxsize=None)
 def get_source_repo(token: str | None) -> Repository:
     """
-    Get the source repository.
+    Get the source repository. Expects a single token, see `_query_api` for the selection of one of several tokens.
     """
     if token is not None:
-        return Github(auth=Token(token)).get_repo(f"{OWNER}/{REPO}")
-    return Github().get_repo(f"{OWNER}/{REPO}")
+        return Github(auth=Token(token)).get_repo(f"{OWNER}/{REPO}", lazy=True)
+    return Github().get_repo(f"{OWNER}/{REPO}", lazy=True)
+
+
+def _is_rate_limit_exception(error: GithubException) -> bool:
+    """
+    True if PyGithub raised the exception because GitHub rejected the request with a primary or secondary rate limit.
+    See `bost.ratelimit.is_rate_limited` for plain responses.
+    """
+    if isinstance(error, RateLimitExceededException) or error.status == 429:
+        return True
+    if error.status != 403:
+        return False
+    headers = CaseInsensitiveDict({key: str(value) for key, value in (error.headers or {}).items()})
+    return "Retry-After" in headers or headers.get("X-RateLimit-Remaining") == "0" or "rate limit" in str(error).lower()
+
+
+def _retry_rate_limited(url: str, token: str | None, selected_token: str | None, error: GithubException) -> Response:
+    """
+    Handle an exception of a PyGithub query sent with `selected_token`. If the query was rate limited, the token is
+    blocked and the request is retried as a plain REST request to `url` through the scheduler, which waits for the limit
+    or switches to another token (see `RequestScheduler.request`). Returns the response. Other exceptions are re-raised.
+    """
+    if not _is_rate_limit_exception(error):
+        raise error
+    get_scheduler(token).observe(
+        selected_token,
+        API_HOST,
+        CaseInsensitiveDict({key: str(value) for key, value in (error.headers or {}).items()}),
+        rate_limited=True,
+    )
+    response = get_scheduler(token).request(
+        get_session(), "GET", url, headers={"Accept": "application/vnd.github+json"}, timeout=TIMEOUT
+    )
+    if response.status_code != 200:
+        raise ValueError(f"Could not query {url}: {response.text}") from error
+    return response
+
+
+def _pygithub_query(url: str, token: str | None, query: Callable[[Repository], GithubObject]) -> CachedResponse:
+    """
+    Query an object with PyGithub using the token the scheduler selects and update its budget from the response.
+    Rate limited queries are retried with a plain request to the REST API `url` (see `_retry_rate_limited`).
+    Returns the JSON body of the response together with its validators.
+    """
+    scheduler = get_scheduler(token)
+    selected_token = scheduler.acquire(API_HOST)
+    try:
+        github_object = query(get_source_repo(selected_token))
+    except GithubException as error:
+        response = _retry_rate_limited(url, token, selected_token, error)
+        return CachedResponse(
+            etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"), body=response.json()
+        )
+    scheduler.observe(
+        selected_token,
+        API_HOST,
+        CaseInsensitiveDict({key: str(value) for key, value in github_object.raw_headers.items()}),
+    )
+    return CachedResponse(
+        etag=github_object.etag, last_modified=github_object.last_modified, body=github_object.raw_data
+    )
+
+
+def _query_contents(path: str, ref: str, token: str | None) -> list[dict[str, Any]]:
+    """
+    Get the name, path, download URL and blob SHA of the files and directories in a directory of the repository.
+    Rate limited queries are retried like in `_pygithub_query`.
+    """
+    selected_token = get_scheduler(token).acquire(API_HOST)
+    try:
+        contents = get_source_repo(selected_token).get_contents(path, ref=ref)
+    except GithubException as error:
+        body = _retry_rate_limited(f"{API_URL}/contents/{path}?ref={ref}", token, selected_token, error).json()
+        return body if isinstance(body, list) else [body]
+    # The headers of the entries aren't read, since this would complete every entry with another request
+    if not isinstance(contents, list):
+        contents = [contents]
+    return [
+        {"name": content.name, "path": content.path, "download_url": content.download_url, "sha": content.sha}
+        for content in contents
+    ]
+
+
+def _query_api(
+    url: str, cache_dir: Path | None, token: str | None, query: Callable[[Repository], GithubObject]
+) -> dict[str, Any]:
+    """
+    Get the JSON body of a GitHub API response. If no cache dir is given, the object is queried with `query` from the
+    source repository.
+    Otherwise, a cached response for the URL is revalidated with a conditional request. If the response didn't change,
+    GitHub answers with `304 Not Modified` without a body and the cached body is reused. For authenticated requests,
+    such responses don't count against the primary rate limit. If nothing is cached for the URL yet, the object is
+    queried with `query` and cached together with its ETag and Last-Modified header.
+    """
+    if cache_dir is None:
+        return _pygithub_query(url, token, query).body
+    cached = get_cached_response(cache_dir, url)
+    if cached is None:
+        queried = _pygithub_query(url, token, query)
+        add_cached_response(cache_dir, url, queried)
+        return queried.body
+
+    headers = {"Accept": "application/vnd.github+json"}
+    if cached.etag is not None:
+        headers["If-None-Match"] = cached.etag
+    if cached.last_modified is not None:
+        headers["If-Modified-Since"] = cached.last_modified
+    response = get_scheduler(token).request(get_session(), "GET", url, headers=headers, timeout=TIMEOUT)
+    count_cache("responses", hit=response.status_code == 304)
+    if response.status_code == 304:
+        logger.info("%s is not modified, using the cached response", url)
+        return cached.body
+    if response.status_code != 200:
+        raise ValueError(f"Could not query {url}: {response.text}")
+    body = response.json()
+    add_cached_response(
+        cache_dir,
+        url,
+        CachedResponse(
+            etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"), body=body
+        ),
+    )
+    return body
 
 
 @lru_cache(maxsize=None)
-def _github_tree_query(version: str, token: str | None) -> SchemaTree:
+def _github_tree_query(
+    version: str, token: str | None, discovery: DiscoveryMode = "tree", cache_dir: Path | None = None
+) -> SchemaTree:
     """
     Query the github tree api for a specific package and version.
+    With `discovery="tree"` the schema tree is built from the recursive git tree alone. The download URLs are derived
+    from the tag and the file paths. I.e. the discovery needs exactly one release lookup and one tree request.
+    With `discovery="contents"` the contents API is queried for every directory to retrieve the download URLs.
+    If a cache dir is given, the release lookup and the tree request are conditional requests (see `_query_api`).
     """
-    repo = get_source_repo(token)
-    release = repo.get_release(version)
-    tree = repo.get_git_tree(release.target_commitish, recursive=True)
+    release = _query_api(f"{API_URL}/releases/tags/{version}", cache_dir, token, lambda repo: repo.get_release(version))
+    # The target_commitish of a release is usually a branch (e.g. "main") which has moved on since the release was
+    # created. Only the tag points to the released files.
+    tag = release["tag_name"]
+    tree = _query_api(
+        f"{API_URL}/git/trees/{tag}?recursive=1",
+        cache_dir,
+        token,
+        lambda repo: repo.get_git_tree(tag, recursive=True),
+    )
     schema_tree = SchemaTree({})
 
-    for tree_element in tree.tree:
-        if not tree_element.path.startswith("src/bo4e_schemas"):
+    for tree_element in tree["tree"]:
+        if not tree_element["path"].startswith(SCHEMAS_DIR):
+            continue
+        if discovery == "tree":
+            if tree_element["type"] == "blob" and tree_element["path"].endswith(".json"):
+                relative_path = Path(tree_element["path"]).relative_to(SCHEMAS_DIR).with_suffix("")
+                schema_tree[relative_path.as_posix()] = SchemaInFileTree(
+                    name=relative_path.name + ".json",
+                    path=tree_element["path"],
+                    module_path=relative_path.parts,
+                    download_url=f"{RAW_URL}/{tag}/{tree_element['path']}",
+                    sha=tree_element["sha"],
+                )
             continue
-        if tree_element.path.endswith(".json"):
+        if tree_element["path"].endswith(".json"):
             # We could send a `get_contents` request for each file, but instead we send a request
             # for the respective parent directory. This way we only need one request per directory.
             continue
-        contents = repo.get_contents(tree_element.path, ref=release.target_commitish)
-        if not isinstance(contents, list):
-            contents = [contents]
-        for file_or_dir in contents:
-            if file_or_dir.name.endswith(".json"):
-                relative_path = Path(file_or_dir.path).relative_to("src/bo4e_schemas").with_suffix("")
+        for file_or_dir in _query_contents(tree_element["path"], tag, token):
+            if file_or_dir["name"].endswith(".json"):
+                relative_path = Path(file_or_dir["path"]).relative_to(SCHEMAS_DIR).with_suffix("")
                 schema = SchemaInFileTree(
-                    name=file_or_dir.name,
-                    path=file_or_dir.path,
+                    name=file_or_dir["name"],
+                    path=file_or_dir["path"],
                     module_path=relative_path.parts,
-                    download_url=file_or_dir.download_url,
+                    download_url=file_or_dir["download_url"],
+                    sha=file_or_dir["sha"],
                 )
                 schema_tree[str(relative_path)] = schema
     return schema_tree
 
 
+def file_url_to_path(value: str) -> Path:
+    """
+    Convert a file:// URL into a path. Other values are interpreted as paths.
+    """
+    if value.startswith("file:"):
+        return Path(url2pathname(urlparse(value).path))
+    return Path(value)
+
+
+def _version_key(version: str) -> tuple[int, ...]:
+    match = VERSION_REGEX.match(version)
+    assert match is not None
+    numbers = (int(match.group("major")), int(match.group("minor")), int(match.group("patch")))
+    # A release candidate precedes the release
+    if match.group("rc") is None:
+        return *numbers, 1, 0
+    return *numbers, 0, int(match.group("rc"))
+
+
+def mirror_versions(source_dir: Path) -> list[str]:
+    """
+    Get the versions in a local mirror, starting with the oldest one. A mirror contains the schemas of each version
+    in `<source_dir>/<version>/src/bo4e_schemas`.
+    """
+    versions = [
+        path.name
+        for path in source_dir.iterdir()
+        if VERSION_REGEX.match(path.name) is not None and (path / SCHEMAS_DIR).is_dir()
+    ]
+    return sorted(versions, key=_version_key)
+
+
+def checkout_version(source_dir: Path) -> str | None:
+    """
+    Get the version of a checkout of the BO4E-Schemas repository, e.g. "v202401.1.0". It is read from the git tag of
+    the checked out commit or, if there is none, from the version in the package metadata (`pyproject.toml`).
+    Returns None if the version can't be determined.
+    """
+    if (source_dir / ".git").exists():
+        try:
+            result = subprocess.run(
+                ["git", "-C", str(source_dir), "describe", "--tags", "--exact-match", "HEAD"],
+                capture_output=True,
+                text=True,
+                check=False,
+                timeout=TIMEOUT,
+            )
+        except (OSError, subprocess.SubprocessError):
+            pass
+        else:
+            tag = result.stdout.strip()
+            if result.returncode == 0 and VERSION_REGEX.match(tag) is not None:
+                return tag
+    try:
+        package_version = tomllib.loads((source_dir / "pyproject.toml").read_text())["project"]["version"]
+    except (OSError, tomllib.TOMLDecodeError, KeyError, TypeError):
+        return None
+    match = PACKAGE_VERSION_REGEX.match(str(package_version))
+    if match is None:
+        return None
+    version = f"v{match.group('major')}.{match.group('minor')}.{match.group('patch')}"
+    return version if match.group("rc") is None else f"{version}-rc{match.group('rc')}"
+
+
+def mirror_schemas_dir(source_dir: Path, version: str) -> Path:
+    """
+    Get the directory containing the schemas of the version in a local mirror.
+    The mirror either contains several versions (see `mirror_versions`) or is a checkout of the BO4E-Schemas
+    repository, i.e. contains the schemas of a single version in `<source_dir>/src/bo4e_schemas`.
+    Raises a ValueError if the checkout is of another version (see `checkout_version`).
+    """
+    if (source_dir / version / SCHEMAS_DIR).is_dir():
+        return source_dir / version / SCHEMAS_DIR
+    if (source_dir / SCHEMAS_DIR).is_dir():
+        found_version = checkout_version(source_dir)
+        if found_version is None:
+            logger.warning(
+                "Could not determine the version of the checkout %s, using its schemas for version %s",
+                source_dir,
+                version,
+            )
+        elif found_version.removeprefix("v") != version.removeprefix("v"):
+            raise ValueError(f"{source_dir} is a checkout of version {found_version}, not of version {version}")
+        return source_dir / SCHEMAS_DIR
+    raise FileNotFoundError(f"Could not find the schemas of version {version} in {source_dir}")
+
+
 @lru_cache(maxsize=1)
-def resolve_latest_version(token: str | None) -> str:
+def resolve_latest_version(token: str | None, source_dir: Path | None = None, cache_dir: Path | None = None) -> str:
     """
-    Resolve the latest BO4E version from the github api.
+    Resolve the latest BO4E version from the github api or, if a local mirror is given, from the versions in the mirror.
+    For a checkout of the BO4E-Schemas repository, this is the version of the checkout (see `checkout_version`).
+    If a cache dir is given, the latest release is revalidated with a conditional request (see `_query_api`).
     """
-    repo = get_source_repo(token)
-    latest_release = repo.get_latest_release().title
-    return latest_release
+    if source_dir is not None:
+        versions = mirror_versions(source_dir)
+        if len(versions) == 0 and (source_dir / SCHEMAS_DIR).is_dir():
+            found_version = checkout_version(source_dir)
+            if found_version is None:
+                raise ValueError(
+                    f"Could not resolve the latest version: The version of the checkout {source_dir} is unknown, "
+                    "please specify the target version explicitly"
+                )
+            return found_version
+        if len(versions) == 0:
+            raise ValueError(f"Could not resolve the latest version: {source_dir} contains no versions")
+        return versions[-1]
+    return _query_api(f"{API_URL}/releases/latest", cache_dir, token, lambda repo: repo.get_latest_release())["title"]
 
 
-def get_schema_list(version: str, cache_dir: Path | None, token: str | None) -> SchemaTree:
+def get_schema_list(
+    version: str, cache_dir: Path | None, token: str | None, discovery: DiscoveryMode = "tree"
+) -> SchemaTree:
     """
     Get all files metadata from the BO4E-Schemas repository or from cache.
     """
     if cache_dir is not None:
-        possible_schemas = get_cached_file_tree(cache_dir)
+        possible_schemas = get_cached_file_tree(cache_dir, version)
+        count_cache("file_trees", hit=possible_schemas is not None)
         if possible_schemas is not None:
             return possible_schemas
 
-    schemas = _github_tree_query(version, token=token)
+    schemas = _github_tree_query(version, token=token, discovery=discovery, cache_dir=cache_dir)
     if cache_dir is not None:
-        save_cache(cache_dir / CACHE_FILE_NAME, version=version, file_tree=schemas)
+        add_cached_version(cache_dir, version, schemas)
 
     return schemas
 
 
 def schema_iterator(
-    version: str, output: Path, cache_dir: Path | None, token: str | None
+    version: str, output: Path, cache_dir: Path | None, token: str | None, discovery: DiscoveryMode = "tree"
 ) -> Iterable[tuple[str, SchemaMetadata]]:
     """
     Get all files from the BO4E-Schemas repository.
     This generator function yields tuples of class name and SchemaMetadata objects containing various information about
     the schema.
     """
-    schemas = get_schema_list(version, cache_dir, token)
+    schemas = get_schema_list(version, cache_dir, token, discovery)
+    yield from _schema_tree_iterator(schemas, output, cache_dir, token)
+
+
+def _schema_tree_iterator(
+    schemas: SchemaTree, output: Path, cache_dir: Path | None, token: str | None
+) -> Iterable[tuple[str, SchemaMetadata]]:
+    """
+    Create the SchemaMetadata objects for all files in the schema tree.
+    """
     for file in schemas.all_files():
         if not file.name.endswith(".json"):
             continue
-        relative_path = Path(file.path).relative_to("src/bo4e_schemas")
+        relative_path = Path(file.path).relative_to(SCHEMAS_DIR)
         module_path = file.module_path
         schema_meta = SchemaMetadata(
             class_name=relative_path.stem,
             download_url=file.download_url,
             module_path=module_path,
             file_path=output / relative_path,
-            cached_path=get_cached_file(relative_path, cache_dir),
+            cached_path=get_cached_blob(file.sha, cache_dir),
             token=token,
+            sha=file.sha,
+            cached_model_path=get_cached_model(file.sha, cache_dir),
         )
         yield schema_meta.class_name, schema_meta
 
 
+def _download_archive(version: str, token: str | None, archive_url: str | None = None) -> dict[str, bytes]:
+    """
+    Download the zip archive of a release and extract the content of all schema files in memory.
+    Returns the file contents by their path in the repository, e.g. "src/bo4e_schemas/bo/Angebot.json".
+    """
+    if archive_url is None:
+        archive_url = ARCHIVE_URL.format(version=version)
+    response = get_scheduler(token).request(get_session(), "GET", archive_url, timeout=ARCHIVE_TIMEOUT)
+    if response.status_code != 200:
+        raise ValueError(f"Could not download release archive from {archive_url}: {response.text}")
+    logger.info("Downloaded %s (%d bytes)", archive_url, len(response.content))
+
+    files: dict[str, bytes] = {}
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        for archive_path in archive.namelist():
+            # All files in a GitHub archive are located in a top level directory like "BO4E-Schemas-0.6.1/"
+            _, _, path = archive_path.partition("/")
+            if path.startswith(f"{SCHEMAS_DIR}/") and path.endswith(".json"):
+                files[path] = archive.read(archive_path)
+    return files
+
+
+def archive_schema_iterator(
+    version: str, output: Path, cache_dir: Path | None, token: str | None, archive_url: str | None = None
+) -> Iterable[tuple[str, SchemaMetadata]]:
+    """
+    Get all files from the release archive of the BO4E-Schemas repository.
+    Instead of downloading every schema file separately, the whole archive is downloaded in a single request.
+    If the cache already contains the file tree of the version, the cached files are used instead.
+    This generator function yields tuples of class name and SchemaMetadata objects like `schema_iterator`.
+    """
+    if cache_dir is not None and get_cached_file_tree(cache_dir, version) is not None:
+        yield from schema_iterator(version, output, cache_dir, token)
+        return
+
+    files = _download_archive(version, token, archive_url)
+    # Every file is hashed exactly once. The SHA is reused for the verification and the cache.
+    shas = {path: git_blob_sha(content) for path, content in files.items()}
+    schema_tree = SchemaTree({})
+    for path in files:
+        relative_path = Path(path).relative_to(SCHEMAS_DIR).with_suffix("")
+        schema_tree[relative_path.as_posix()] = SchemaInFileTree(
+            name=relative_path.name + ".json",
+            path=path,
+            module_path=relative_path.parts,
+            download_url=f"{RAW_URL}/{version}/{path}",
+            sha=shas[path],
+        )
+    if cache_dir is not None:
+        add_cached_version(cache_dir, version, schema_tree)
+
+    for class_name, schema_meta in _schema_tree_iterator(schema_tree, output, cache_dir, token):
+        path = f"{SCHEMAS_DIR}/{'/'.join(schema_meta.module_path)}.json"
+        schema_meta.set_content(files[path], shas[path])
+        yield class_name, schema_meta
+
+
+def mirror_schema_iterator(version: str, source_dir: Path, output: Path) -> Iterable[tuple[str, SchemaMetadata]]:
+    """
+    Get all files of a BO4E version from a local mirror (see `mirror_schemas_dir`) without any network access.
+    The schema tree is built from the directory listing and the files are read from the mirror when they are loaded.
+    Since the files are local already, they aren't cached.
+    This generator function yields tuples of class name and SchemaMetadata objects like `schema_iterator`.
+    """
+    schemas_dir = mirror_schemas_dir(source_dir, version)
+    schema_tree = SchemaTree({})
+    # Like in the release, every JSON file of the package is a schema (e.g. the top level ZusatzAttribut.json). Only the
+    # hidden files and the directories of the tooling of a checkout are skipped.
+    paths = sorted(
+        path
+        for path in schemas_dir.rglob("*.json")
+        if not any(part.startswith(".") or part in NON_SCHEMA_DIRS for part in path.relative_to(schemas_dir).parts)
+    )
+    for path in paths:
+        relative_path = path.relative_to(schemas_dir).with_suffix("")
+        schema_tree[relative_path.as_posix()] = SchemaInFileTree(
+            name=path.name,
+            path=f"{SCHEMAS_DIR}/{relative_path.as_posix()}.json",
+            module_path=relative_path.parts,
+            download_url=path.absolute().as_uri(),
+        )
+    logger.info("Found %d schemas of version %s in %s", len(paths), version, schemas_dir)
+    yield from _schema_tree_iterator(schema_tree, output, None, None)
+
+
+# pylint: disable=too-many-arguments
+def source_schema_iterator(
+    version: str,
+    output: Path,
+    cache_dir: Path | None,
+    token: str | None,
+    source: SourceMode = "github",
+    discovery: DiscoveryMode = "tree",
+    source_dir: Path | None = None,
+) -> Iterable[tuple[str, SchemaMetadata]]:
+    """
+    Get all files of a BO4E version from the configured source. See `SourceMode` for the available sources.
+    If a local mirror is given as `source_dir`, the files are read from the mirror instead (see
+    `mirror_schema_iterator`) and the source, the discovery mode and the cache are ignored.
+    """
+    if source_dir is not None:
+        return mirror_schema_iterator(version, source_dir, output)
+    if source == "archive":
+        return archive_schema_iterator(version, output, cache_dir, token)
+    return schema_iterator(version, output, cache_dir, token, discovery)
+
+
+def download_schemas(schemas: Iterable[SchemaMetadata], jobs: int = DEFAULT_JOBS) -> None:
+    """
+    Load the raw content of all schemas concurrently. The downloads are distributed over a thread pool with `jobs`
+    workers which share one pooled session. Downloaded files are written into the cache as usual.
+    Schemas which are already loaded (e.g. additional models) or whose validated model is cached are skipped.
+    """
+    pending = [schema for schema in schemas if not schema.is_loaded and not schema.has_cached_model]
+    if len(pending) == 0:
+        return
+    session = get_session(jobs)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        # Consume the iterator to propagate possible exceptions from the workers
+        for _ in executor.map(lambda schema: schema.load_schema_text(session), pending):
+            pass
+    logger.info("Loaded %d schemas using %d workers", len(pending), jobs)
+
+
 def load_schema(path: Path) -> SchemaRootType:
     """
     Load a schema from a file.
     """
     try:
-        return TypeAdapter(SchemaRootType).validate_json(path.read_text())  # type: ignore[return-value]
+        return parse_schema(path.read_bytes())
     except ValidationError as error:
         logger.error("Could not load schema from %s:", path, exc_info=error)
         raise
@@ -0,0 +1,251 @@
+"""
+Contains the scheduler for the requests to GitHub.
+The REST API announces the primary rate limit of a token with the headers `X-RateLimit-Remaining` and
+`X-RateLimit-Reset`. On top of that, GitHub enforces secondary rate limits (e.g. on too many concurrent requests) and
+answers with `403 Forbidden` or `429 Too Many Requests`, optionally with a `Retry-After` header. The raw files are
+served without rate limit headers but are throttled with `429` as well.
+A `RequestScheduler` paces the requests with a token bucket per access token and host. Once GitHub announced the
+remaining budget, the refill rate of the bucket is adjusted so that the budget lasts until the limit resets, which keeps
+parallel runs sharing a token below the limit. If several access tokens are configured (separated by commas), each
+request uses the token with the most remaining budget. Rate limited requests are retried on another token if one is
+available, otherwise after `Retry-After`, after the reset of the limit or with an exponential backoff.
+"""
+
+import math
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Mapping, Sequence
+from urllib.parse import urlparse
+
+import requests
+from requests import Response
+
+from bost.logger import logger
+
+TOKEN_SEPARATOR = ","
+DEFAULT_BURST = 16
+""" The number of requests which may be sent at once before the pacing kicks in """
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_MAX_WAIT = 3600  # in seconds, the primary rate limit resets at least once an hour
+SECONDARY_BACKOFF = 60  # in seconds, GitHub asks to wait at least a minute if there is no Retry-After header
+MAX_BACKOFF = 900  # in seconds
+
+
+def split_tokens(token: str | None) -> list[str | None]:
+    """
+    Split a comma separated list of access tokens. Returns `[None]` (i.e. unauthenticated requests) if there is none.
+    """
+    if token is None:
+        return [None]
+    tokens: list[str | None] = [part.strip() for part in token.split(TOKEN_SEPARATOR) if part.strip() != ""]
+    return tokens if len(tokens) > 0 else [None]
+
+
+def is_rate_limited(response: Response) -> bool:
+    """
+    True if GitHub rejected the request because of a primary or secondary rate limit.
+    """
+    if response.status_code == 429:
+        return True
+    if response.status_code != 403:
+        return False
+    return (
+        "Retry-After" in response.headers
+        or response.headers.get("X-RateLimit-Remaining") == "0"
+        or "rate limit" in response.text.lower()
+    )
+
+
+@dataclass
+class _Budget:  # pylint: disable=too-many-instance-attributes
+    """
+    The request budget of one access token for one host
+    """
+
+    capacity: float
+    level: float
+    """ The number of requests in the bucket """
+    updated: float
+    rate: float | None = None
+    """ Requests per second. None as long as the budget is unknown, i.e. the requests aren't paced. """
+    remaining: int | None = None
+    reset: float | None = None
+    """ The time when the primary rate limit resets (seconds since the epoch) """
+    blocked_until: float = 0
+    backoff: float = 0
+    last_used: float = 0
+
+    def refill(self, now: float) -> None:
+        """
+        Refill the bucket for the time since the last update.
+        """
+        if self.reset is not None and self.reset <= now:
+            # The window of the primary rate limit is over, the new budget is unknown until the next response
+            self.remaining = self.reset = self.rate = None
+        if self.rate is not None:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_at(self, now: float) -> float:
+        """
+        The time when the next request may be sent.
+        """
+        ready = self.blocked_until
+        if self.remaining == 0 and self.reset is not None:
+            ready = max(ready, self.reset)
+        if self.rate is not None and self.level < 1:
+            ready = max(ready, now + (1 - self.level) / self.rate)
+        return ready
+
+    def take(self, now: float) -> None:
+        """
+        Take a request out of the bucket.
+        """
+        if self.rate is not None:
+            self.level -= 1
+        if self.remaining is not None:
+            # Count the requests in flight until their responses announce the actual budget
+            self.remaining = max(0, self.remaining - 1)
+        self.last_used = now
+
+    def observe(self, headers: Mapping[str, str], now: float, burst: int) -> None:
+        """
+        Adjust the bucket to the primary rate limit announced in the headers.
+        """
+        remaining, reset = headers.get("X-RateLimit-Remaining"), headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None or float(reset) <= now:
+            return
+        self.remaining, self.reset = int(remaining), float(reset)
+        self.capacity = max(1, min(burst, self.remaining))
+        # The requests sent before the budget was known are already accounted for in the announced budget
+        self.level = self.capacity if self.rate is None else min(self.level, self.capacity)
+        self.rate = self.remaining / (self.reset - now) if self.remaining > 0 else None
+
+    def block(self, headers: Mapping[str, str], now: float) -> float:
+        """
+        Block the token after a rate limited request. Returns the time to wait in seconds.
+        """
+        retry_after = headers.get("Retry-After")
+        if retry_after is not None and retry_after.strip().isdigit():
+            wait = float(retry_after)
+        elif self.remaining == 0 and self.reset is not None:
+            wait = self.reset - now
+        else:
+            self.backoff = min(MAX_BACKOFF, 2 * self.backoff if self.backoff > 0 else SECONDARY_BACKOFF)
+            wait = self.backoff
+        self.blocked_until = max(self.blocked_until, now + wait)
+        return wait
+
+
+class RequestScheduler:  # pylint: disable=too-many-instance-attributes
+    """
+    Schedules the requests of a set of access tokens within the rate limits of GitHub. Thread-safe.
+    Use `request` to send a request. For requests which are sent by other means (e.g. by PyGithub), get a token with
+    `acquire` and pass the response headers to `observe`.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        tokens: Sequence[str | None],
+        burst: int = DEFAULT_BURST,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        max_wait: float = DEFAULT_MAX_WAIT,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.tokens = list(tokens) if len(tokens) > 0 else [None]
+        self.burst = burst
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self._clock = clock
+        self._sleep = sleep
+        self._budgets: dict[tuple[str | None, str], _Budget] = {}
+        self._lock = threading.Lock()
+
+    def _budget(self, token: str | None, host: str, now: float) -> _Budget:
+        budget = self._budgets.get((token, host))
+        if budget is None:
+            budget = _Budget(capacity=self.burst, level=self.burst, updated=now)
+            self._budgets[(token, host)] = budget
+        budget.refill(now)
+        return budget
+
+    def acquire(self, host: str) -> str | None:
+        """
+        Wait until one of the tokens may send a request to `host` and return it. Prefers the token with the most
+        remaining budget and otherwise the least recently used one.
+        Raises a ValueError if the wait would exceed `max_wait`.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                budgets = [(token, self._budget(token, host, now)) for token in self.tokens]
+                ready = [(token, budget) for token, budget in budgets if budget.ready_at(now) <= now]
+                if len(ready) > 0:
+                    token, budget = max(
+                        ready,
+                        key=lambda item: (
+                            item[1].remaining if item[1].remaining is not None else math.inf,
+                            -item[1].last_used,
+                        ),
+                    )
+                    budget.take(now)
+                    return token
+                wait = min(budget.ready_at(now) for _, budget in budgets) - now
+            if waited + wait > self.max_wait:
+                raise ValueError(
+                    f"The rate limit of {host} is exhausted for all tokens, "
+                    f"the next request is possible in {wait:.0f} s"
+                )
+            if wait >= 1:
+                logger.warning("Rate limit of %s reached, waiting %.0f s", host, wait)
+            self._sleep(wait)
+            waited += wait
+
+    def observe(self, token: str | None, host: str, headers: Mapping[str, str], rate_limited: bool = False) -> None:
+        """
+        Update the budget of the token from the headers of a response. If the request was rate limited, the token is
+        blocked until it may be used again.
+        """
+        with self._lock:
+            now = self._clock()
+            budget = self._budget(token, host, now)
+            budget.observe(headers, now, self.burst)
+            if not rate_limited:
+                budget.backoff = 0
+                return
+            wait = budget.block(headers, now)
+        logger.warning("Request to %s was rate limited, the token is blocked for %.0f s", host, wait)
+
+    def request(
+        self, session: requests.Session, method: str, url: str, headers: dict[str, str] | None = None, **kwargs
+    ) -> Response:
+        """
+        Send a request with one of the tokens and retry it up to `max_retries` times if it is rate limited.
+        Returns the last response, i.e. a rate limited response if all retries failed.
+        """
+        host = urlparse(url).netloc
+        attempt = 0
+        while True:
+            token = self.acquire(host)
+            request_headers = dict(headers) if headers is not None else {}
+            if token is not None:
+                request_headers["Authorization"] = f"Bearer {token}"
+            response = session.request(method, url, headers=request_headers, **kwargs)
+            rate_limited = is_rate_limited(response)
+            self.observe(token, host, response.headers, rate_limited)
+            if not rate_limited or attempt >= self.max_retries:
+                return response
+            attempt += 1
+
+
+@lru_cache(maxsize=None)
+def get_scheduler(token: str | None) -> RequestScheduler:
+    """
+    Get the shared scheduler for the (comma separated) access tokens.
+    """
+    return RequestScheduler(split_tokens(token))
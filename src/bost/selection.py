@@ -0,0 +1,149 @@
+"""
+Contains the functionality to pull only a subset of the schemas.
+The schemas are selected by include and exclude patterns on their module path, e.g. "bo\\.Angebot". To keep the output
+reference-complete, every schema which is transitively referenced by a selected schema is selected as well.
+The reference closure is computed while the schemas are downloaded: As soon as a schema arrives, its references are
+resolved and the referenced schemas are queued for download.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Iterable, Sequence
+
+from bost.config import AdditionalField, Config
+from bost.logger import logger
+from bost.matching import PatternIndex
+from bost.operations import REF_DEFS_REGEX, ReferenceResolver
+from bost.pull import DEFAULT_JOBS, SchemaMetadata, get_session
+from bost.schema import Reference
+from bost.visitor import Node, iter_nodes
+
+
+def collect_references(node: Node) -> list[str]:
+    """
+    Get all reference strings of the schema (without its definitions).
+    """
+    return [child.ref for child in iter_nodes(node) if isinstance(child, Reference)]
+
+
+def config_references(config: Config | None) -> list[str]:
+    """
+    Get all reference strings of the field definitions which are added by the config.
+    """
+    if config is None:
+        return []
+    return [
+        ref
+        for additional_field in config.additional_fields
+        if isinstance(additional_field, AdditionalField)
+        for ref in collect_references(additional_field.field_def)
+    ]
+
+
+def resolve_relative_reference(ref: str, directory: tuple[str, ...]) -> tuple[str, ...] | None:
+    """
+    Get the module path of the schema file a relative reference (e.g. "../enum/Typ.json#") points to if it is used in
+    a schema in the module `directory` (e.g. ("bo",)). Returns None if the reference isn't a relative file reference.
+    """
+    path = ref.partition("#")[0]
+    if not path.endswith(".json") or path.startswith("/") or "://" in path:
+        return None
+    parts = list(directory)
+    for part in path.removesuffix(".json").split("/"):
+        if part == "..":
+            if len(parts) == 0:
+                return None
+            parts.pop()
+        elif part not in ("", "."):
+            parts.append(part)
+    return tuple(parts)
+
+
+def _load_references(schema: SchemaMetadata, session) -> list[str]:
+    if not schema.is_loaded and not schema.has_cached_model:
+        schema.load_schema_text(session)
+    return collect_references(schema.schema_parsed)
+
+
+# pylint: disable=too-many-arguments, too-many-locals
+def select_schemas(
+    schemas: dict[str, SchemaMetadata],
+    version: str,
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    always_include: Iterable[str] = (),
+    extra_references: Iterable[str] = (),
+    jobs: int = DEFAULT_JOBS,
+) -> dict[str, SchemaMetadata]:
+    """
+    Select the schemas whose module path matches any of the `include` patterns and none of the `exclude` patterns.
+    If no include patterns are given, all schemas match. The schemas named in `always_include` (e.g. the additional
+    models of the config) and the targets of the `extra_references` are selected regardless of the patterns.
+    Afterward, all transitively referenced schemas are added, even if they match an exclude pattern. Relative references
+    (e.g. of additional models) are resolved against the module of the referencing schema. The `extra_references` are
+    not used in a specific schema, so relative ones are resolved against every module.
+    Raises a ValueError if a reference points to another version of BO4E.
+    The selected schemas are downloaded on a thread pool with `jobs` workers.
+    Returns the selected schemas in the same order as `schemas`.
+    """
+    include_index = PatternIndex(include)
+    exclude_index = PatternIndex(exclude)
+    resolver = ReferenceResolver(schemas, version)
+    names_by_module_path = {tuple(schema.module_path): name for name, schema in schemas.items()}
+
+    directories = {tuple(schema.module_path[:-1]) for schema in schemas.values()}
+
+    def resolve(ref: str, referencing_directories: Iterable[tuple[str, ...]]) -> list[str]:
+        try:
+            target = resolver.resolve_target(ref)
+        except ValueError:
+            if REF_DEFS_REGEX.search(ref) is None:
+                raise
+            # Definitions without a separate schema are part of the referencing schema itself
+            logger.debug("Reference %s does not point to a schema in the namespace", ref)
+            return []
+        if target is not None:
+            targets = [target]
+        else:
+            targets = [
+                relative_target
+                for directory in referencing_directories
+                if (relative_target := resolve_relative_reference(ref, directory)) is not None
+            ]
+        return [names_by_module_path[target] for target in targets if target in names_by_module_path]
+
+    seeds = [
+        name
+        for name, schema in schemas.items()
+        if (len(include) == 0 or len(include_index.match(schema.module_name)) > 0)
+        and len(exclude_index.match(schema.module_name)) == 0
+    ]
+    seeds.extend(always_include)
+    seeds.extend(name for ref in extra_references for name in resolve(ref, directories))
+    number_of_matches = len(set(seeds))
+
+    selected: set[str] = set()
+    session = get_session(jobs)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending: dict[Future[list[str]], str] = {}
+
+        def submit(names: Iterable[str]):
+            for name in names:
+                if name not in selected:
+                    selected.add(name)
+                    pending[executor.submit(_load_references, schemas[name], session)] = name
+
+        submit(seeds)
+        while len(pending) > 0:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                directory = tuple(schemas[pending.pop(future)].module_path[:-1])
+                submit(name for ref in future.result() for name in resolve(ref, [directory]))
+
+    logger.info(
+        "Selected %d of %d schemas (%d matched the patterns, %d were added as references)",
+        len(selected),
+        len(schemas),
+        number_of_matches,
+        len(selected) - number_of_matches,
+    )
+    return {name: schema for name, schema in schemas.items() if name in selected}
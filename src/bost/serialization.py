@@ -0,0 +1,63 @@
+"""
+Contains the functions to parse and serialize the schema files.
+The pydantic type adapter for the schema root types is built only once and reused for every file.
+If the optional dependency `orjson` is installed, it is used as a faster JSON backend. Otherwise, the JSON handling
+of pydantic is used.
+"""
+
+from pydantic import TypeAdapter
+
+from bost.interning import SchemaInterner
+from bost.schema import SchemaRootType, SchemaType
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+SCHEMA_ROOT_ADAPTER: TypeAdapter[SchemaRootType] = TypeAdapter(SchemaRootType)
+
+
+def json_backend() -> str:
+    """
+    The name of the used JSON backend. Either "orjson" or "pydantic".
+    """
+    return "orjson" if orjson is not None else "pydantic"
+
+
+def parse_schema(data: str | bytes, interner: SchemaInterner | None = None) -> SchemaRootType:
+    """
+    Parse and validate the content of a schema file.
+    If an interner is given, the sub-schemas are replaced by the canonical instances of the interner.
+    """
+    schema_parsed = _validate(data)
+    if interner is not None:
+        interner.intern(schema_parsed)
+    return schema_parsed
+
+
+def _validate(data: str | bytes) -> SchemaRootType:
+    if orjson is not None:
+        try:
+            json_data = orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # Let pydantic raise a ValidationError to keep the error handling consistent
+            pass
+        else:
+            return SCHEMA_ROOT_ADAPTER.validate_python(json_data)
+    return SCHEMA_ROOT_ADAPTER.validate_json(data)
+
+
+def dump_schema(schema_parsed: SchemaRootType | SchemaType) -> str:
+    """
+    Serialize a schema to JSON with an indentation of 2 spaces. Only explicitly set fields are serialized.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                schema_parsed.model_dump(mode="json", exclude_unset=True, by_alias=True), option=orjson.OPT_INDENT_2
+            ).decode("utf-8")
+        except orjson.JSONEncodeError:
+            # e.g. integers which exceed 64 bit. pydantic can handle them.
+            pass
+    return schema_parsed.model_dump_json(indent=2, exclude_unset=True, by_alias=True)
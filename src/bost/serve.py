@@ -0,0 +1,293 @@
+"""
+Contains a long-lived HTTP server which serves the transformed schema files.
+The pulled and parsed schemas are kept in memory per version and the transformed files per version and config. This
+way, the release lookup, the tree query, the downloads and the parsing are paid only once instead of once per consumer.
+Concurrent requests for the same version or the same version and config are coalesced, i.e. only the first request
+does the work while the others wait for its result. Only the least recently requested versions are kept in memory.
+
+Routes (the config is selected with the query parameter `config`, e.g. `?config=my_config`):
+- `/` lists the available configs.
+- `/<version>/` lists the files of a version, e.g. `/v202401.1.0/`. The version may be "latest". Anything else than a
+  version or "latest" is not found.
+- `/<version>/<module path>.json` returns a transformed schema file, e.g. `/v202401.1.0/bo/Angebot.json`.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Hashable, TypeVar
+from urllib.parse import parse_qs, urlsplit
+
+from bost.cache import is_cache_dir_valid
+from bost.config import load_config
+from bost.interning import intern_schemas
+from bost.logger import logger
+from bost.output import content_hash
+from bost.processing import add_and_select_schemas, fresh_copy, process_schemas
+from bost.pull import (
+    DEFAULT_JOBS,
+    VERSION_REGEX,
+    DiscoveryMode,
+    SchemaMetadata,
+    SourceMode,
+    download_schemas,
+    resolve_latest_version,
+    source_schema_iterator,
+)
+from bost.serialization import dump_schema
+from bost.watch import config_files, file_signatures
+
+T = TypeVar("T")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+DEFAULT_MAX_VERSIONS = 3
+
+
+@dataclass(frozen=True)
+class RenderedFile:
+    """
+    A transformed schema file
+    """
+
+    content: bytes
+    etag: str
+
+
+def _etag(content: bytes) -> str:
+    return f'"{content_hash(content)[:32]}"'
+
+
+# pylint: disable=too-many-instance-attributes
+class SchemaStore:
+    """
+    Keeps the pulled schemas per version and the transformed files per version and config in memory.
+    The configs are identified by a name. Changes of a config file and the files referenced by it are detected by
+    their modification times and sizes. Only the files rendered with the latest state of a config are kept.
+    The pulled schemas and the rendered files are kept for at most `max_versions` versions. If another version is
+    requested, the least recently requested version is evicted.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        configs: dict[str, Path] | None = None,
+        cache_dir: Path | None = None,
+        token: str | None = None,
+        jobs: int = DEFAULT_JOBS,
+        source: SourceMode = "github",
+        discovery: DiscoveryMode = "tree",
+        update_refs: bool = True,
+        set_default_version: bool = True,
+        source_dir: Path | None = None,
+        max_versions: int = DEFAULT_MAX_VERSIONS,
+    ):
+        self.configs = configs or {}
+        self.cache_dir = cache_dir
+        self.token = token
+        self.jobs = jobs
+        self.source: SourceMode = source
+        self.discovery: DiscoveryMode = discovery
+        self.update_refs = update_refs
+        self.set_default_version = set_default_version
+        self.source_dir = source_dir
+        self.max_versions = max_versions
+        self._lock = threading.Lock()
+        self._futures: dict[Hashable, Future] = {}
+        self._versions: OrderedDict[str, None] = OrderedDict()
+        """ The versions with pulled schemas or rendered files, the least recently requested one first """
+
+    def _coalesce(self, key: Hashable, compute: Callable[[], T]) -> T:
+        """
+        Return the result for the key. If it isn't computed yet, the first caller computes it while concurrent callers
+        wait for its result. Failures are not cached.
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            is_owner = future is None
+            if future is None:
+                future = Future()
+                self._futures[key] = future
+        if is_owner:
+            try:
+                future.set_result(compute())
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                with self._lock:
+                    # The entry may already be evicted or replaced
+                    if self._futures.get(key) is future:
+                        del self._futures[key]
+                future.set_exception(error)
+        return future.result()
+
+    def _use_version(self, version: str) -> None:
+        """
+        Mark the version as the most recently requested one and evict the least recently requested versions beyond
+        `max_versions`. Requests which wait for an evicted entry still get its result.
+        """
+        with self._lock:
+            self._versions[version] = None
+            self._versions.move_to_end(version)
+            while len(self._versions) > self.max_versions:
+                evicted, _ = self._versions.popitem(last=False)
+                for key in [
+                    key for key in self._futures if isinstance(key, tuple) and key[0] != "latest" and key[1] == evicted
+                ]:
+                    del self._futures[key]
+                logger.info("Evicted version %s from memory", evicted)
+
+    def resolve_version(self, version: str) -> str:
+        """
+        Resolve "latest" to the latest release. The latest release is resolved once per server lifetime.
+        """
+        if version != "latest":
+            return version
+        return self._coalesce(
+            ("latest",), lambda: resolve_latest_version(self.token, self.source_dir, self._valid_cache_dir(version))
+        )
+
+    def _valid_cache_dir(self, version: str) -> Path | None:
+        if self.source_dir is None and is_cache_dir_valid(self.cache_dir, version):
+            return self.cache_dir
+        return None
+
+    def pull(self, version: str) -> dict[str, SchemaMetadata]:
+        """
+        Get the parsed, untransformed schemas of the version. They are pulled only once.
+        """
+        self._use_version(version)
+        return self._coalesce(("pull", version), lambda: self._pull(version))
+
+    def _pull(self, version: str) -> dict[str, SchemaMetadata]:
+        cache_dir = self._valid_cache_dir(version)
+        schemas = dict(
+            source_schema_iterator(version, Path(), cache_dir, self.token, self.source, self.discovery, self.source_dir)
+        )
+        download_schemas(schemas.values(), jobs=self.jobs)
+        # The schemas of all configs share the sub-schemas which aren't modified
+        intern_schemas(schemas.values())
+        logger.info("Pulled %d schemas of version %s", len(schemas), version)
+        return schemas
+
+    def render(self, version: str, config_name: str | None) -> dict[str, RenderedFile]:
+        """
+        Get the transformed files of the version by their path, e.g. "bo/Angebot.json".
+        Raises a KeyError if the config is unknown.
+        """
+        config_file = self.configs[config_name] if config_name is not None else None
+        signature = tuple(file_signatures(config_files(config_file)).items()) if config_file is not None else None
+        key = ("render", version, config_name, signature)
+        self._use_version(version)
+        with self._lock:
+            # The files rendered with an outdated state of the config are never requested again
+            outdated = [
+                other for other in self._futures if isinstance(other, tuple) and other[:3] == key[:3] and other != key
+            ]
+            for other in outdated:
+                del self._futures[other]
+        return self._coalesce(key, lambda: self._render(version, config_file))
+
+    def _render(self, version: str, config_file: Path | None) -> dict[str, RenderedFile]:
+        config = load_config(config_file) if config_file is not None else None
+        pristine = self.pull(version)
+        schemas = add_and_select_schemas(pristine, config, config_file, Path(), version, (), (), self.jobs)
+        # The pulled schemas are shared between the configs and must stay unmodified
+        schemas = {
+            name: fresh_copy(schema) if pristine.get(name) is schema else schema for name, schema in schemas.items()
+        }
+        process_schemas(schemas, config, version, self.update_refs, self.set_default_version)
+        files = {}
+        for schema in schemas.values():
+            content = dump_schema(schema.schema_parsed).encode("utf-8")
+            files["/".join(schema.module_path) + ".json"] = RenderedFile(content=content, etag=_etag(content))
+        logger.info("Rendered %d files of version %s with config %s", len(files), version, config_file)
+        return files
+
+
+class SchemaRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles the requests to the server. See the module documentation for the routes.
+    """
+
+    server: "SchemaServer"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Serve the index or a schema file.
+        """
+        url = urlsplit(self.path)
+        config_name = parse_qs(url.query).get("config", [None])[0]
+        parts = [part for part in url.path.split("/") if part != ""]
+        store = self.server.store
+        if len(parts) == 0:
+            self._send_json({"configs": sorted(store.configs)})
+            return
+        if parts[0] != "latest" and VERSION_REGEX.match(parts[0]) is None:
+            self.send_error(HTTPStatus.NOT_FOUND, f"Unknown version {parts[0]}")
+            return
+        if config_name is not None and config_name not in store.configs:
+            self.send_error(HTTPStatus.NOT_FOUND, f"Unknown config {config_name}")
+            return
+        try:
+            files = store.render(store.resolve_version(parts[0]), config_name)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            logger.error("Could not render version %s: %s", parts[0], error, exc_info=error)
+            self.send_error(HTTPStatus.BAD_GATEWAY, f"Could not provide version {parts[0]}: {error}")
+            return
+        if len(parts) == 1:
+            self._send_json({"files": {path: file.etag for path, file in files.items()}})
+            return
+        file = files.get("/".join(parts[1:]))
+        if file is None:
+            self.send_error(HTTPStatus.NOT_FOUND, f"Unknown schema {'/'.join(parts[1:])}")
+            return
+        self._send(file.content, file.etag)
+
+    def _send_json(self, data: dict) -> None:
+        content = json.dumps(data, indent=2).encode("utf-8")
+        self._send(content, _etag(content))
+
+    def _send(self, content: bytes, etag: str) -> None:
+        if etag in (tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logger.info("%s - %s", self.address_string(), format % args)
+
+
+class SchemaServer(ThreadingHTTPServer):
+    """
+    HTTP server which handles each request in its own thread and shares one `SchemaStore`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], store: SchemaStore):
+        super().__init__(address, SchemaRequestHandler)
+        self.store = store
+
+
+def serve(store: SchemaStore, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+    """
+    Serve the schemas of the store until the process is interrupted.
+    """
+    with SchemaServer((host, port), store) as server:
+        logger.info("Serving schemas on http://%s:%d/", *server.server_address[:2])
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("Stopped server")
@@ -0,0 +1,110 @@
+"""
+Contains a framework to traverse the schema types of `bost.schema`.
+The traversal uses an explicit stack instead of recursion, so arbitrarily deep nested schemas don't hit the recursion
+limit. The nodes are dispatched by their type to the matching methods of one or more visitors in a single walk.
+The dispatch and child lookup are resolved once per node type and cached.
+"""
+
+import re
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator
+
+from pydantic import BaseModel
+
+from bost.schema import AllOf, AnyOf, Array, Object, SchemaRootType, SchemaRootTypeBase, SchemaType
+
+Node = SchemaType | SchemaRootType
+
+
+class SchemaVisitor:  # pylint: disable=too-few-public-methods
+    """
+    Base class for visitors of the schema types.
+    Subclasses define methods named `visit_<type>` with the snake case name of the schema type,
+    e.g. `visit_reference` for `Reference` or `visit_any_of` for `AnyOf`. A node is dispatched to the method of its
+    most specific type, e.g. a `SchemaRootObject` is passed to `visit_schema_root_object` if defined and to
+    `visit_object` otherwise. Nodes without a matching method are skipped.
+    The children of a node are visited after the node itself. Changes to the children of a node made by the visitor
+    are therefore respected by the traversal.
+    """
+
+
+def _method_name(node_type: type) -> str:
+    return "visit_" + re.sub(r"(?<!^)(?=[A-Z])", "_", node_type.__name__).lower()
+
+
+_VISIT_METHOD_NAMES: dict[tuple[type, type], str | None] = {}
+
+
+def _visit_method_name(visitor_type: type, node_type: type) -> str | None:
+    key = (visitor_type, node_type)
+    if key not in _VISIT_METHOD_NAMES:
+        _VISIT_METHOD_NAMES[key] = next(
+            (
+                _method_name(base_type)
+                for base_type in node_type.__mro__
+                # Skip `BaseModel` and `object`. Otherwise, `visit_object` would match every node.
+                if base_type not in (BaseModel, object) and hasattr(visitor_type, _method_name(base_type))
+            ),
+            None,
+        )
+    return _VISIT_METHOD_NAMES[key]
+
+
+@lru_cache
+def _child_getters(node_type: type, include_defs: bool) -> tuple[Callable[[Node], Iterable[Node]], ...]:
+    getters: list[Callable[[Node], Iterable[Node]]] = []
+    if issubclass(node_type, Object):
+        getters.append(lambda node: node.properties.values())  # type: ignore[union-attr]
+    elif issubclass(node_type, AnyOf):
+        getters.append(lambda node: node.any_of)  # type: ignore[union-attr]
+    elif issubclass(node_type, AllOf):
+        getters.append(lambda node: node.all_of)  # type: ignore[union-attr]
+    elif issubclass(node_type, Array):
+        getters.append(lambda node: (node.items,))  # type: ignore[union-attr]
+    if include_defs and issubclass(node_type, SchemaRootTypeBase):
+        getters.append(lambda node: node.defs.values())  # type: ignore[union-attr]
+    return tuple(getters)
+
+
+def iter_children(node: Node, include_defs: bool = False) -> Iterator[Node]:
+    """
+    Iterate over the direct children of a node, e.g. the properties of an `Object` or the items of an `Array`.
+    The definitions of a root type are only included if `include_defs` is True.
+    """
+    for getter in _child_getters(type(node), include_defs):
+        yield from getter(node)
+
+
+def iter_nodes(root: Node, include_defs: bool = False) -> Iterator[Node]:
+    """
+    Iterate over all nodes of the schema in depth-first pre-order, starting with the root itself.
+    The children of a node are determined after it was yielded, so the consumer may modify them.
+    """
+    stack: list[Node] = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        getters = _child_getters(type(node), include_defs)
+        if len(getters) == 1:
+            stack.extend(reversed(list(getters[0](node))))
+        elif len(getters) > 1:
+            stack.extend(reversed([child for getter in getters for child in getter(node)]))
+
+
+def walk(root: Node, *visitors: SchemaVisitor, include_defs: bool = False) -> None:
+    """
+    Traverse the schema once and dispatch every node to the matching methods of all visitors.
+    For each node, the visitors are called in the given order.
+    """
+    handlers_by_type: dict[type, list[Callable[[Node], object]]] = {}
+    for node in iter_nodes(root, include_defs):
+        handlers = handlers_by_type.get(type(node))
+        if handlers is None:
+            handlers = []
+            for visitor in visitors:
+                method_name = _visit_method_name(type(visitor), type(node))
+                if method_name is not None:
+                    handlers.append(getattr(visitor, method_name))
+            handlers_by_type[type(node)] = handlers
+        for handler in handlers:
+            handler(node)
@@ -0,0 +1,86 @@
+"""
+Contains the functionality to watch the config file and the files it references for changes.
+The files are polled for changes of their modification time and size. This works on every platform without additional
+dependencies.
+"""
+
+import threading
+from pathlib import Path
+from typing import Callable
+
+from pydantic import ValidationError
+
+from bost.config import Config
+from bost.logger import logger
+from bost.schema import Reference
+
+DEFAULT_POLL_INTERVAL = 0.2
+""" Seconds between two checks of the watched files """
+
+FileSignature = tuple[int, int] | None
+""" Modification time and size of a file or None if the file doesn't exist """
+
+
+def config_files(config_file: Path) -> list[Path]:
+    """
+    Get the config file and all files referenced by it, i.e. the files of additional fields and additional models.
+    If the config file is invalid (e.g. while it's being edited), only the config file itself is returned.
+    """
+    files = [config_file]
+    try:
+        config = Config.model_validate_json(config_file.read_text())
+    except (OSError, ValidationError):
+        return files
+    references = [field for field in config.additional_fields if isinstance(field, Reference)]
+    references.extend(
+        model.schema_parsed for model in config.additional_models if isinstance(model.schema_parsed, Reference)
+    )
+    for reference in references:
+        reference_path = Path(reference.ref)
+        if not reference_path.is_absolute():
+            reference_path = config_file.parent / reference_path
+        files.append(reference_path)
+    return files
+
+
+def file_signatures(files: list[Path]) -> dict[Path, FileSignature]:
+    """
+    Get the signatures of the files to detect changes.
+    """
+    signatures: dict[Path, FileSignature] = {}
+    for file in files:
+        try:
+            stat = file.stat()
+        except OSError:
+            signatures[file] = None
+        else:
+            signatures[file] = (stat.st_mtime_ns, stat.st_size)
+    return signatures
+
+
+def watch_files(
+    get_files: Callable[[], list[Path]],
+    on_change: Callable[[], None],
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    stop_event: threading.Event | None = None,
+) -> None:
+    """
+    Call `on_change` once initially and every time one of the watched files changes.
+    The list of watched files is determined again after every change since e.g. the config file may reference new
+    files. Errors raised by `on_change` are logged and don't stop the watcher.
+    Runs until the `stop_event` is set or the process is interrupted.
+    """
+    if stop_event is None:
+        stop_event = threading.Event()
+    signatures = file_signatures(get_files())
+    while not stop_event.is_set():
+        try:
+            on_change()
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            logger.error("Could not regenerate the schemas: %s", error, exc_info=error)
+        logger.info("Watching %d files for changes", len(signatures))
+        while not stop_event.wait(poll_interval):
+            new_signatures = file_signatures(get_files())
+            if new_signatures != signatures:
+                signatures = new_signatures
+                break
@@ -0,0 +1,54 @@
+import asyncio
+import pickle
+import re
+from pathlib import Path
+from types import ModuleType
+from unittest.mock import Mock, patch
+
+import requests_mock
+
+from bost import pull_async
+from bost.schema import Object, Reference
+
+TEST_DATA_DIR = Path(__file__).parent / "test_data"
+CONFIG_FILE = Path(__file__).parent / "config_test.json"
+
+
+class TestAio:
+    @patch("bost.pull.Github")
+    def test_pull(self, mock_github, tmp_path: Path):
+        def new_get_contents(path, ref):  # pylint: disable=unused-argument
+            return pickle.load(open(TEST_DATA_DIR / f"contents_{path.replace('/', '_')}.pkl", mode="rb"))
+
+        mock_repo = Mock()
+        mock_github.return_value.get_repo.return_value = mock_repo
+        # pylint: disable=consider-using-with
+        mock_repo.get_release.return_value = pickle.load(open(TEST_DATA_DIR / "release.pkl", mode="rb"))
+        mock_repo.get_git_tree.return_value = pickle.load(open(TEST_DATA_DIR / "tree.pkl", mode="rb"))
+        mock_repo.get_contents = new_get_contents
+
+        output = tmp_path / "output"
+        with requests_mock.Mocker() as mocker:
+            mocker.get(
+                re.compile(r"https://raw\.githubusercontent\.com/bo4e/BO4E-Schemas/[\w\d.-]+/src/bo4e_schemas/.*"),
+                text=lambda request, _: (
+                    TEST_DATA_DIR / "bo4e_schemas" / request.url.split("/bo4e_schemas/")[-1]
+                ).read_text(),
+            )
+            schemas = asyncio.run(
+                pull_async(output, "v0.6.1-rc13", config_file=CONFIG_FILE, cache_dir=tmp_path / "cache", concurrency=4)
+            )
+
+        assert "Angebot" in schemas
+        assert "AdditionalModel" in schemas
+        angebot_schema = Object.model_validate_json((output / "bo" / "Angebot.json").read_text())
+        assert "foo" in angebot_schema.properties
+        typ_field = angebot_schema.properties["_typ"]
+        assert isinstance(typ_field, Reference)
+        assert typ_field.ref == "../enum/Typ.json#"
+
+    def test_pull_module_not_shadowed(self):
+        import bost.pull  # pylint: disable=import-outside-toplevel
+
+        assert isinstance(bost.pull, ModuleType)
+        assert callable(bost.pull.schema_iterator)
@@ -0,0 +1,132 @@
+import json
+import pickle
+import re
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import requests_mock
+from click.testing import CliRunner
+
+from bost.__main__ import main, main_batch, main_command_line
+from bost.pull import _github_tree_query, get_source_repo
+
+TEST_DATA_DIR = Path(__file__).parent / "test_data"
+CONFIG_FILE = Path(__file__).parent / "config_test.json"
+VERSION = "v0.6.1-rc13"
+
+
+def _write_config(path: Path, enum_items: list[str]) -> Path:
+    config = json.loads(CONFIG_FILE.read_text())
+    config["additionalFields"][1]["$ref"] = str(CONFIG_FILE.parent / config["additionalFields"][1]["$ref"])
+    config["additionalModels"][0]["schema"]["$ref"] = str(
+        CONFIG_FILE.parent / config["additionalModels"][0]["schema"]["$ref"]
+    )
+    config["additionalEnumItems"][0]["items"] = enum_items
+    path.write_text(json.dumps(config))
+    return path
+
+
+def _read_output(output: Path) -> dict[str, str]:
+    return {path.relative_to(output).as_posix(): path.read_text() for path in output.glob("*/*.json")}
+
+
+class TestBatch:
+    @patch("bost.pull.Github")
+    def test_batch_equals_separate_runs(self, mock_github, tmp_path: Path):
+        mock_repo = Mock()
+        mock_github.return_value.get_repo.return_value = mock_repo
+        # pylint: disable=consider-using-with
+        mock_repo.get_release.return_value = pickle.load(open(TEST_DATA_DIR / "release.pkl", mode="rb"))
+        mock_repo.get_git_tree.return_value = pickle.load(open(TEST_DATA_DIR / "tree.pkl", mode="rb"))
+        get_source_repo.cache_clear()
+        _github_tree_query.cache_clear()
+        config_files = [
+            _write_config(tmp_path / "config_a.json", ["foo", "bar"]),
+            _write_config(tmp_path / "config_b.json", ["baz"]),
+        ]
+        config_b = json.loads(config_files[1].read_text())
+        config_b["nonNullableFields"] = []
+        config_files[1].write_text(json.dumps(config_b))
+
+        with requests_mock.Mocker() as mocker:
+            mocker.get(
+                re.compile(
+                    r"https://raw\.githubusercontent\.com/bo4e/BO4E-Schemas/[\w.-]+/src/bo4e_schemas/(\w+)/(\w+)\.json"
+                ),
+                text=lambda request, _: (
+                    TEST_DATA_DIR / "bo4e_schemas" / request.url.split("/bo4e_schemas/")[-1]
+                ).read_text(),
+            )
+            for index, config_file in enumerate(config_files):
+                main(
+                    output=tmp_path / f"separate_{index}",
+                    target_version=VERSION,
+                    update_refs=True,
+                    set_default_version=True,
+                    clear_output=False,
+                    config_file=config_file,
+                )
+            number_of_downloads = mocker.call_count // len(config_files)
+
+            mocker.reset_mock()
+            main_batch(
+                [(config_file, tmp_path / f"batch_{index}") for index, config_file in enumerate(config_files)],
+                target_version=VERSION,
+                update_refs=True,
+                set_default_version=True,
+                clear_output=False,
+            )
+            # Every file is downloaded only once for all targets
+            assert mocker.call_count == number_of_downloads
+
+        separate = [_read_output(tmp_path / f"separate_{index}") for index in range(len(config_files))]
+        assert separate[0] != separate[1]
+        for index in range(len(config_files)):
+            assert _read_output(tmp_path / f"batch_{index}") == separate[index]
+
+    @patch("bost.pull.Github")
+    def test_batch_warns_about_unmatched_patterns(self, mock_github, tmp_path: Path, caplog):
+        mock_repo = Mock()
+        mock_github.return_value.get_repo.return_value = mock_repo
+        # pylint: disable=consider-using-with
+        mock_repo.get_release.return_value = pickle.load(open(TEST_DATA_DIR / "release.pkl", mode="rb"))
+        mock_repo.get_git_tree.return_value = pickle.load(open(TEST_DATA_DIR / "tree.pkl", mode="rb"))
+        get_source_repo.cache_clear()
+        _github_tree_query.cache_clear()
+        config_files = [
+            _write_config(tmp_path / "config_a.json", ["foo"]),
+            _write_config(tmp_path / "config_b.json", ["bar"]),
+        ]
+        config_b = json.loads(config_files[1].read_text())
+        config_b["nonNullableFields"].append("bo\\.Typo\\.doesNotExist")
+        config_files[1].write_text(json.dumps(config_b))
+
+        with requests_mock.Mocker() as mocker:
+            mocker.get(
+                re.compile(
+                    r"https://raw\.githubusercontent\.com/bo4e/BO4E-Schemas/[\w.-]+/src/bo4e_schemas/(\w+)/(\w+)\.json"
+                ),
+                text=lambda request, _: (
+                    TEST_DATA_DIR / "bo4e_schemas" / request.url.split("/bo4e_schemas/")[-1]
+                ).read_text(),
+            )
+            main_batch(
+                [(config_file, tmp_path / f"batch_{index}") for index, config_file in enumerate(config_files)],
+                target_version=VERSION,
+                update_refs=True,
+                set_default_version=True,
+                clear_output=False,
+            )
+
+        # Each config is only applied to the schemas it touches, but its patterns are checked against all schemas
+        warnings = [record.getMessage() for record in caplog.records if record.levelname == "WARNING"]
+        assert warnings.count("Pattern 'bo\\.Typo\\.doesNotExist' did not match any fields") == 1
+        assert not any("did not match" in warning and "Typo" not in warning for warning in warnings)
+
+    def test_unpaired_outputs(self, tmp_path: Path):
+        config_file = _write_config(tmp_path / "config.json", ["foo"])
+        result = CliRunner().invoke(
+            main_command_line, ["-o", str(tmp_path / "a"), "-o", str(tmp_path / "b"), "-c", str(config_file)]
+        )
+        assert result.exit_code != 0
+        assert "Every --output needs exactly one --config-file" in result.output
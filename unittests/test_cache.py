@@ -0,0 +1,200 @@
+import json
+import os
+import stat
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from bost.__main__ import main_command_line
+from bost.cache import (
+    CACHE_FILE_NAME,
+    RESPONSES_FILE_NAME,
+    CacheData,
+    CachedResponse,
+    add_cached_response,
+    add_cached_version,
+    evict_cache,
+    get_cache_size,
+    get_cached_blob,
+    get_cached_file_tree,
+    get_cached_response,
+    git_blob_sha,
+    is_blob_valid,
+    is_cache_dir_valid,
+    load_cache,
+    load_cached_model,
+    remove_cached_versions,
+    save_cache,
+    save_cached_model,
+    write_file_atomic,
+)
+from bost.pull import SchemaInFileTree, SchemaTree, load_schema
+from bost.schema import AnyOf, Reference, SchemaRootObject
+
+TEST_DATA_DIR = Path(__file__).parent / "test_data"
+
+
+def _add_version(cache_dir: Path, version: str, contents: dict[str, bytes]) -> None:
+    """
+    Adds a version with the given files (class name -> content) to the cache.
+    """
+    file_tree = SchemaTree({})
+    for class_name, content in contents.items():
+        sha = git_blob_sha(content)
+        blob_path = get_cached_blob(sha, cache_dir)
+        assert blob_path is not None
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        blob_path.write_bytes(content)
+        file_tree[f"bo/{class_name}"] = SchemaInFileTree(
+            name=f"{class_name}.json",
+            path=f"src/bo4e_schemas/bo/{class_name}.json",
+            module_path=("bo", class_name),
+            download_url="",
+            sha=sha,
+        )
+    add_cached_version(cache_dir, version, file_tree)
+
+
+class TestCache:
+    def test_git_blob_sha(self):
+        # Same as `echo "hello" | git hash-object --stdin`
+        assert git_blob_sha(b"hello\n") == "ce013625030ba8dba906f756967f9e9ca394464a"
+
+    def test_multiple_versions(self, tmp_path: Path):
+        _add_version(tmp_path, "v1.0.0", {"Foo": b'{"title": "Foo"}', "Bar": b'{"title": "Bar"}'})
+        _add_version(tmp_path, "v2.0.0", {"Foo": b'{"title": "Foo"}', "Bar": b'{"title": "Bar2"}'})
+
+        assert is_cache_dir_valid(tmp_path, "v3.0.0")
+        tree_v1 = get_cached_file_tree(tmp_path, "v1.0.0")
+        tree_v2 = get_cached_file_tree(tmp_path, "v2.0.0")
+        assert tree_v1 is not None and tree_v2 is not None
+        assert tree_v1["bo/Foo"].sha == tree_v2["bo/Foo"].sha
+        assert get_cached_file_tree(tmp_path, "v3.0.0") is None
+
+        blob_path = get_cached_blob(tree_v1["bo/Foo"].sha, tmp_path)
+        assert blob_path is not None and is_blob_valid(blob_path, tree_v1["bo/Foo"].sha)
+        blob_path.write_bytes(b'{"title": "Corrupted"}')
+        assert not is_blob_valid(blob_path, tree_v1["bo/Foo"].sha)
+
+    def test_lru_eviction(self, tmp_path: Path):
+        _add_version(tmp_path, "v1.0.0", {"Foo": b'{"title": "Foo"}', "Bar": b'{"title": "Bar"}'})
+        _add_version(tmp_path, "v2.0.0", {"Foo": b'{"title": "Foo"}', "Bar": b'{"title": "Bar2"}'})
+        _add_version(tmp_path, "v3.0.0", {"Foo": b'{"title": "Foo3"}'})
+        cache_data = load_cache(tmp_path / CACHE_FILE_NAME)
+        now = datetime.now(tz=timezone.utc)
+        cache_data.versions["v1.0.0"].last_used = now - timedelta(days=1)
+        cache_data.versions["v2.0.0"].last_used = now - timedelta(days=3)
+        cache_data.versions["v3.0.0"].last_used = now - timedelta(days=2)
+        save_cache(tmp_path / CACHE_FILE_NAME, cache_data)
+        sha_foo = git_blob_sha(b'{"title": "Foo"}')
+        sha_bar2 = git_blob_sha(b'{"title": "Bar2"}')
+
+        assert evict_cache(tmp_path, max_versions=2) == ["v2.0.0"]
+        # Files which are only used by the evicted version are deleted
+        assert not (tmp_path / ".blobs" / sha_bar2[:2] / sha_bar2).exists()
+        assert (tmp_path / ".blobs" / sha_foo[:2] / sha_foo).exists()
+
+        # v3.0.0 is the least recently used version but must be kept
+        assert evict_cache(tmp_path, max_size=len(b'{"title": "Foo3"}'), keep="v3.0.0") == ["v1.0.0"]
+        assert set(load_cache(tmp_path / CACHE_FILE_NAME).versions) == {"v3.0.0"}
+
+    def test_cached_responses_of_evicted_versions(self, tmp_path: Path):
+        api_url = "https://api.github.com/repos/bo4e/BO4E-Schemas"
+        for version, commit in (("v1.0.0", "abc"), ("v2.0.0", "def")):
+            add_cached_response(
+                tmp_path, f"{api_url}/releases/tags/{version}", CachedResponse(body={"target_commitish": commit})
+            )
+            add_cached_response(tmp_path, f"{api_url}/git/trees/{commit}?recursive=1", CachedResponse(body={}))
+            _add_version(tmp_path, version, {"Foo": b'{"title": "Foo"}'})
+        add_cached_response(tmp_path, f"{api_url}/releases/latest", CachedResponse(body={"title": "v2.0.0"}))
+        size = get_cache_size(tmp_path)
+        assert size == len(b'{"title": "Foo"}') + (tmp_path / RESPONSES_FILE_NAME).stat().st_size
+
+        # The responses count against the size limit and are removed together with their version
+        assert evict_cache(tmp_path, max_size=size - 1, keep="v2.0.0") == ["v1.0.0"]
+        assert get_cached_response(tmp_path, f"{api_url}/releases/tags/v1.0.0") is None
+        assert get_cached_response(tmp_path, f"{api_url}/git/trees/abc?recursive=1") is None
+        assert get_cached_response(tmp_path, f"{api_url}/git/trees/def?recursive=1") is not None
+        assert get_cache_size(tmp_path) < size
+
+        assert remove_cached_versions(tmp_path, ["v2.0.0"]) == ["v2.0.0"]
+        assert get_cached_response(tmp_path, f"{api_url}/releases/tags/v2.0.0") is None
+        assert get_cached_response(tmp_path, f"{api_url}/releases/latest") is not None
+
+        # A corrupt file is treated as empty
+        (tmp_path / RESPONSES_FILE_NAME).write_text("{")
+        assert get_cached_response(tmp_path, f"{api_url}/releases/latest") is None
+
+    def test_concurrent_processes(self, tmp_path: Path):
+        versions = [f"v{index}.0.0" for index in range(8)]
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            list(
+                executor.map(
+                    _add_version,
+                    [tmp_path] * len(versions),
+                    versions,
+                    [{f"Foo{index}": f'{{"title": "Foo{index}"}}'.encode()} for index in range(len(versions))],
+                )
+            )
+        # No process lost the version of another one
+        assert set(load_cache(tmp_path / CACHE_FILE_NAME).versions) == set(versions)
+        assert is_cache_dir_valid(tmp_path, "latest")
+
+    def test_write_file_atomic_mode(self, tmp_path: Path):
+        umask = os.umask(0)
+        os.umask(umask)
+        path = tmp_path / "file.json"
+        write_file_atomic(path, b"{}")
+        # Like a file created with `open` instead of the mode 0600 of temporary files
+        assert stat.S_IMODE(path.stat().st_mode) == 0o666 & ~umask
+        # The mode of a replaced file is kept
+        path.chmod(0o640)
+        write_file_atomic(path, b"[]")
+        assert stat.S_IMODE(path.stat().st_mode) == 0o640
+        assert path.read_bytes() == b"[]"
+
+    def test_cached_model(self, tmp_path: Path):
+        schema_parsed = load_schema(TEST_DATA_DIR / "bo4e_schemas" / "bo" / "Angebot.json")
+        model_path = tmp_path / "model.json"
+        save_cached_model(model_path, schema_parsed)
+        json.loads(model_path.read_text())
+
+        schema_cached = load_cached_model(model_path)
+        assert schema_cached == schema_parsed
+        assert schema_cached.model_fields_set == schema_parsed.model_fields_set
+        assert isinstance(schema_cached, SchemaRootObject)
+        typ_field = schema_cached.properties["_typ"]
+        assert isinstance(typ_field, AnyOf) and isinstance(typ_field.any_of[0], Reference)
+
+    def test_unusable_cached_model(self, tmp_path: Path):
+        model_path = tmp_path / "model.json"
+        for content in (
+            b"\x80\x04\x95",
+            b'{"$bost_model": "Popen", "fields": {}, "fields_set": []}',
+            b'{"$bost_model": "Null", "fields": {"type": "null"}}',
+            b"[]",
+        ):
+            model_path.write_bytes(content)
+            assert load_cached_model(model_path) is None
+
+    def test_migrate_single_version_cache(self):
+        cache_data = CacheData.model_validate_json(json.dumps({"version": "v1.0.0", "file_tree": {}}))
+        assert set(cache_data.versions) == {"v1.0.0"}
+
+    def test_cache_command_line(self, tmp_path: Path):
+        _add_version(tmp_path, "v1.0.0", {"Foo": b'{"title": "Foo"}'})
+        _add_version(tmp_path, "v2.0.0", {"Foo": b'{"title": "Foo2"}'})
+        cli_runner = CliRunner()
+
+        result = cli_runner.invoke(main_command_line, ["cache", "list", "--cache-dir", str(tmp_path)])
+        assert result.exit_code == 0
+        assert "v1.0.0" in result.output and "v2.0.0" in result.output
+
+        result = cli_runner.invoke(
+            main_command_line, ["cache", "prune", "--cache-dir", str(tmp_path), "--version", "v1.0.0"]
+        )
+        assert result.exit_code == 0
+        assert "Removed v1.0.0" in result.output
+        assert set(load_cache(tmp_path / CACHE_FILE_NAME).versions) == {"v2.0.0"}
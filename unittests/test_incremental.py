@@ -0,0 +1,85 @@
+import json
+import pickle
+import re
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import requests_mock
+
+from bost.__main__ import main
+from bost.output import CHANGES_FILE_NAME, MANIFEST_FILE_NAME
+from bost.pull import _github_tree_query, get_source_repo
+
+TEST_DATA_DIR = Path(__file__).parent / "test_data"
+CONFIG_FILE = Path(__file__).parent / "config_test.json"
+
+
+def _write_config(path: Path, enum_items: list[str]) -> Path:
+    config = json.loads(CONFIG_FILE.read_text())
+    config["additionalFields"][1]["$ref"] = str(CONFIG_FILE.parent / config["additionalFields"][1]["$ref"])
+    config["additionalModels"][0]["schema"]["$ref"] = str(
+        CONFIG_FILE.parent / config["additionalModels"][0]["schema"]["$ref"]
+    )
+    config["additionalEnumItems"][0]["items"] = enum_items
+    path.write_text(json.dumps(config))
+    return path
+
+
+def _read_output(output: Path) -> dict[str, str]:
+    return {path.relative_to(output).as_posix(): path.read_text() for path in output.glob("*/*.json")}
+
+
+class TestIncremental:
+    @patch("bost.pull.Github")
+    def test_incremental_run(self, mock_github, tmp_path: Path):
+        mock_repo = Mock()
+        mock_github.return_value.get_repo.return_value = mock_repo
+        # pylint: disable=consider-using-with
+        mock_repo.get_release.return_value = pickle.load(open(TEST_DATA_DIR / "release.pkl", mode="rb"))
+        mock_repo.get_git_tree.return_value = pickle.load(open(TEST_DATA_DIR / "tree.pkl", mode="rb"))
+        get_source_repo.cache_clear()
+        _github_tree_query.cache_clear()
+        config_file = _write_config(tmp_path / "config.json", ["foo", "bar"])
+
+        def run(output: Path, incremental: bool = True):
+            main(
+                output=output,
+                target_version="v0.6.1-rc13",
+                update_refs=True,
+                set_default_version=True,
+                clear_output=False,
+                config_file=config_file,
+                incremental=incremental,
+            )
+            return json.loads((output / CHANGES_FILE_NAME).read_text())
+
+        with requests_mock.Mocker() as mocker:
+            mocker.get(
+                re.compile(
+                    r"https://raw\.githubusercontent\.com/bo4e/BO4E-Schemas/[\w.-]+/src/bo4e_schemas/(\w+)/(\w+)\.json"
+                ),
+                text=lambda request, _: (
+                    TEST_DATA_DIR / "bo4e_schemas" / request.url.split("/bo4e_schemas/")[-1]
+                ).read_text(),
+            )
+            changes = run(tmp_path / "incremental")
+            number_of_files = len(changes["added"])
+            assert number_of_files > 0
+            assert len(json.loads((tmp_path / "incremental" / MANIFEST_FILE_NAME).read_text())["schemas"]) > 0
+
+            # Nothing changed: Nothing is downloaded or written
+            mocker.reset_mock()
+            changes = run(tmp_path / "incremental")
+            assert mocker.call_count == 0
+            assert changes["unchanged"] == number_of_files
+            assert changes["added"] == changes["changed"] == changes["removed"] == []
+
+            # Only the schema touched by the changed config entry is processed again
+            _write_config(config_file, ["foo", "baz"])
+            changes = run(tmp_path / "incremental")
+            assert mocker.call_count == 1
+            assert changes["changed"] == ["enum/Typ.json"]
+            assert changes["unchanged"] == number_of_files - 1
+
+            run(tmp_path / "full", incremental=False)
+        assert _read_output(tmp_path / "incremental") == _read_output(tmp_path / "full")
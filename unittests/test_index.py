@@ -0,0 +1,102 @@
+from pathlib import Path
+
+from bost.config import AdditionalEnumItem, Config
+from bost.index import FieldIndex
+from bost.operations import add_additional_property, field_to_non_nullable
+from bost.processing import process_schemas, transform_all_non_nullable_fields
+from bost.pull import SchemaMetadata, load_schema
+from bost.schema import AnyOf, Null, SchemaRootObject, String
+
+TEST_DATA = Path(__file__).parent / "test_data/bo4e_schemas"
+
+
+def _schema_metadata(module_path: tuple[str, ...]) -> SchemaMetadata:
+    schema = SchemaMetadata(
+        class_name=module_path[-1],
+        download_url="",
+        module_path=module_path,
+        file_path=Path("/".join(module_path) + ".json"),
+        cached_path=None,
+        token=None,
+    )
+    schema.schema_parsed = load_schema(TEST_DATA.joinpath(*module_path[:-1], f"{module_path[-1]}.json"))
+    return schema
+
+
+class TestIndex:
+    def test_field_index(self):
+        angebot = _schema_metadata(("bo", "Angebot"))
+        typ = _schema_metadata(("enum", "Typ"))
+        field_index = FieldIndex([angebot, typ])
+
+        assert len(field_index) == len(angebot.schema_parsed.properties)
+        entry = field_index.get("bo.Angebot.angebotsnummer")
+        assert entry is not None and entry.schema is angebot and entry.field_name == "angebotsnummer"
+        assert entry.nullable and entry.has_default and entry.field_type is AnyOf
+        assert [entry.path for entry in field_index.by_name("_typ")] == ["bo.Angebot._typ"]
+        assert "enum.Typ" not in {entry.schema.module_name for entry in field_index}
+
+        field_to_non_nullable(angebot.schema_parsed, "angebotsnummer")
+        entry = field_index.update_field(angebot, "angebotsnummer")
+        assert entry is not None and not entry.nullable and entry.field_type is String
+        assert "bo.Angebot.angebotsnummer" not in {entry.path for entry in field_index.nullable_fields()}
+        assert field_index.by_type(String)[-1].path == "bo.Angebot.angebotsnummer"
+        # Updated fields keep their position
+        assert [entry.field_name for entry in field_index.fields_of(angebot)] == list(angebot.schema_parsed.properties)
+
+        add_additional_property(angebot.schema_parsed, String(type="string"), "zusatzfeld")
+        field_index.update_field(angebot, "zusatzfeld")
+        assert "bo.Angebot.zusatzfeld" in field_index
+
+        field_index.remove_schema(angebot)
+        assert len(field_index) == 0
+        assert len(field_index.nullable_fields()) == 0
+
+    def test_updated_fields_keep_their_order(self):
+        angebot = _schema_metadata(("bo", "Angebot"))
+        field_index = FieldIndex([angebot])
+        nullable_fields = [entry.path for entry in field_index.nullable_fields()]
+        assert "bo.Angebot._id" in nullable_fields
+
+        # An additional field which replaces an existing nullable field keeps its position
+        field_def = AnyOf(any_of=[String(type="string"), Null(type="null")], default=None)
+        add_additional_property(angebot.schema_parsed, field_def, "_id")
+        field_index.update_field(angebot, "_id")
+        assert [entry.path for entry in field_index.nullable_fields()] == nullable_fields
+
+        # Therefore, the required fields are added in the order of the properties
+        transform_all_non_nullable_fields(["bo\\.Angebot\\..*"], {"Angebot": angebot}, field_index)
+        assert isinstance(angebot.schema_parsed, SchemaRootObject)
+        required = angebot.schema_parsed.required
+        assert required == [field_name for field_name in angebot.schema_parsed.properties if field_name in required]
+
+    def test_non_nullable_pattern_without_null(self, caplog):
+        angebot = _schema_metadata(("bo", "Angebot"))
+        field_def = AnyOf(any_of=[String(type="string"), AnyOf(any_of=[])], default="foo")
+        add_additional_property(angebot.schema_parsed, field_def, "zusatzfeld")
+
+        transform_all_non_nullable_fields(["bo\\.Angebot\\.zusatzfeld"], {"Angebot": angebot})
+        assert "has no Null type" in caplog.text
+        assert angebot.schema_parsed.properties["zusatzfeld"] is field_def
+
+    def test_unmatched_pattern_of_partial_run(self, caplog):
+        angebot = _schema_metadata(("bo", "Angebot"))
+        adresse = _schema_metadata(("com", "Adresse"))
+        namespace = {"Angebot": angebot, "Adresse": adresse}
+        config = Config(nonNullableFields=["com\\.Adresse\\..*"])
+
+        # The pattern may match the schemas which aren't processed, e.g. the unchanged schemas of an incremental run
+        process_schemas({"Angebot": angebot}, config, "v0.0.0", False, False, namespace)
+        assert "did not match any fields" not in caplog.text
+        process_schemas({"Angebot": angebot}, config, "v0.0.0", False, False)
+        assert "Pattern 'com\\.Adresse\\..*' did not match any fields" in caplog.text
+
+        # Patterns which don't match any schema of the namespace are still warned about
+        caplog.clear()
+        config = Config(
+            nonNullableFields=["bo\\.Typo\\..*"],
+            additionalEnumItems=[AdditionalEnumItem(pattern="enum\\.Typo", items=["foo"])],
+        )
+        process_schemas({"Angebot": angebot}, config, "v0.0.0", False, False, namespace)
+        assert "Pattern 'bo\\.Typo\\..*' did not match any fields" in caplog.text
+        assert "Pattern 'enum\\.Typo' did not match any fields" in caplog.text
@@ -0,0 +1,92 @@
+import json
+from pathlib import Path
+
+from bost.config import load_config
+from bost.interning import SchemaInterner, is_interned, is_interned_tree, mutable_copy
+from bost.processing import fresh_copy, process_schemas
+from bost.pull import SchemaMetadata
+from bost.schema import AnyOf, Object, String
+from bost.serialization import dump_schema, parse_schema
+
+CONFIG_FILE = Path(__file__).parent / "config_test.json"
+SCHEMAS_DIR = Path(__file__).parent / "test_data" / "bo4e_schemas"
+VERSION = "v0.6.1-rc13"
+
+
+def _write_config(path: Path, enum_items: list[str]) -> Path:
+    config = json.loads(CONFIG_FILE.read_text())
+    config["additionalFields"][1]["$ref"] = str(CONFIG_FILE.parent / config["additionalFields"][1]["$ref"])
+    config["additionalModels"][0]["schema"]["$ref"] = str(
+        CONFIG_FILE.parent / config["additionalModels"][0]["schema"]["$ref"]
+    )
+    config["additionalEnumItems"][0]["items"] = enum_items
+    path.write_text(json.dumps(config))
+    return path
+
+
+def _load_schemas(interner: SchemaInterner | None = None) -> dict[str, SchemaMetadata]:
+    schemas = {}
+    for path in sorted(SCHEMAS_DIR.glob("*/*.json")):
+        relative_path = path.relative_to(SCHEMAS_DIR).with_suffix("")
+        schema = SchemaMetadata(
+            class_name=relative_path.name,
+            download_url="",
+            module_path=relative_path.parts,
+            file_path=path,
+            cached_path=None,
+            token=None,
+        )
+        schema.schema_parsed = parse_schema(path.read_bytes(), interner)
+        schemas[schema.class_name] = schema
+    return schemas
+
+
+def _dump_all(schemas: dict[str, SchemaMetadata]) -> dict[str, str]:
+    return {name: dump_schema(schema.schema_parsed) for name, schema in schemas.items()}
+
+
+class TestInterning:
+    def test_intern(self):
+        interner = SchemaInterner()
+        schemas = _load_schemas(interner)
+        assert _dump_all(schemas) == _dump_all(_load_schemas())
+        assert interner.stats.unique < interner.stats.nodes / 2
+
+        angebot = schemas["Angebot"].schema_parsed
+        assert isinstance(angebot, Object)
+        assert not is_interned(angebot)
+        assert is_interned_tree(angebot)
+        # Structurally identical sub-schemas of different schemas are the same instance
+        assert angebot.properties["_id"] is schemas["Vertrag"].schema_parsed.properties["_id"]  # type: ignore[union-attr]
+
+    def test_distinguishes_set_fields(self):
+        interner = SchemaInterner()
+        with_default = interner.intern(String.model_validate({"type": "string", "default": None}))
+        without_default = interner.intern(String.model_validate({"type": "string"}))
+        assert with_default is not without_default
+        assert interner.intern(String.model_validate({"type": "string"})) is without_default
+
+    def test_mutable_copy(self):
+        node = SchemaInterner().intern(
+            AnyOf.model_validate({"anyOf": [{"type": "string"}, {"type": "null"}], "default": None})
+        )
+        assert isinstance(node, AnyOf)
+        node_copy = mutable_copy(node)
+        node_copy.any_of.pop()
+        assert not is_interned(node_copy)
+        assert len(node.any_of) == 2
+        assert node_copy.any_of[0] is node.any_of[0]
+
+    def test_copy_on_mutate(self, tmp_path: Path):
+        config_file = _write_config(tmp_path / "config.json", ["foo", "bar"])
+        config = load_config(config_file)
+        interned = _load_schemas(SchemaInterner())
+        pristine_dumps = _dump_all(interned)
+
+        processed = {name: fresh_copy(schema) for name, schema in interned.items()}
+        process_schemas(processed, config, VERSION, update_refs=True, set_default_version=True)
+        expected = _load_schemas()
+        process_schemas(expected, load_config(config_file), VERSION, update_refs=True, set_default_version=True)
+
+        assert _dump_all(processed) == _dump_all(expected)
+        assert _dump_all(interned) == pristine_dumps
@@ -22,6 +22,15 @@ CONFIG_FILE = Path(__file__).parent / "config_test.json"
 TEST_DATA_DIR = Path(__file__).parent / "test_data"
 
 
+def _write_mirror(source_dir: Path, versions: list[str]) -> Path:
+    for version in versions:
+        for module in ("bo", "com", "enum"):
+            shutil.copytree(
+                TEST_DATA_DIR / "bo4e_schemas" / module, source_dir / version / "src" / "bo4e_schemas" / module
+            )
+    return source_dir
+
+
 class TestMain:
     def test_main_help(self):
         """
@@ -35,6 +44,12 @@ class TestMain:
         assert result.exit_code == 0
         assert "Usage: main" in result.output
 
+        result = cli_runner.invoke(main_command_line, ["pull", "--help"])
+        print("\n")
+        print(result.output.replace("Usage: main-command-line", "Usage: bost"))
+        assert result.exit_code == 0
+        assert "--output" in result.output
+
     def test_main_without_mocks(self):
         pytest.skip("Unmocked test is skipped in CI")
         main(
@@ -126,3 +141,32 @@ class TestMain:
         assert typ_schema.title == "Typ"
         assert "foo" in typ_schema.enum
         assert "bar" in typ_schema.enum
+
+    @patch("bost.pull.Github")
+    def test_source_dir(self, mock_github, tmp_path: Path):
+        source_dir = _write_mirror(tmp_path / "mirror", ["v0.6.1-rc13"])
+        output = tmp_path / "output"
+        with requests_mock.Mocker() as mocker:
+            result = CliRunner().invoke(
+                main_command_line,
+                ["-o", str(output), "-t", "latest", "-r", "--source-dir", source_dir.as_uri()],
+            )
+            assert mocker.call_count == 0
+        assert result.exit_code == 0, result.output
+        mock_github.assert_not_called()
+
+        assert len(list(output.glob("*/*.json"))) == len(list((TEST_DATA_DIR / "bo4e_schemas").glob("*/*.json")))
+        angebot = (output / "bo" / "Angebot.json").read_text()
+        assert '"../enum/Typ.json#"' in angebot
+        assert '"$ref": "https://' not in angebot
+
+    def test_transform_functions_are_reexported(self):
+        # pylint: disable=import-outside-toplevel
+        from bost import __main__, processing
+
+        for name in (
+            "transform_all_additional_enum_items",
+            "transform_all_additional_fields",
+            "transform_all_non_nullable_fields",
+        ):
+            assert getattr(__main__, name) is getattr(processing, name)
@@ -0,0 +1,60 @@
+import re
+
+import pytest
+
+from bost.matching import PatternIndex, split_literal_prefix
+
+PATTERNS = [
+    r"bo\.Angebot",
+    r"bo\.Angebot\..*",
+    r"bo\.Angebot",
+    r"bo\..*\.preis",
+    r".*",
+    r"bo\.Angebot|com\.Preis",
+    r"bo\.Angebotx?",
+    r"bo\.Ange\w+",
+    r"com\.Preis\.(wert|einheit)",
+    r"enum\.[A-Z]\w*",
+    r"bo\.A+ngebot",
+]
+SUBJECTS = [
+    "bo.Angebot",
+    "bo.Angebotx",
+    "bo.Angebot.angebotsnummer",
+    "bo.Vertrag.preis",
+    "com.Preis",
+    "com.Preis.wert",
+    "com.Preis.status",
+    "enum.BoTyp",
+    "enum.boTyp",
+    "bo.AAngebot",
+    "",
+]
+
+
+class TestMatching:
+    @pytest.mark.parametrize(
+        ["pattern", "expected"],
+        [
+            pytest.param(r"bo\.Angebot", ("bo.Angebot", True), id="literal"),
+            pytest.param(r"bo\.Angebot\..*", ("bo.Angebot.", False), id="prefix"),
+            pytest.param(r"bo\.Angebotx?", ("bo.Angebot", False), id="optional character"),
+            pytest.param(r"bo\.Ange\w+", ("bo.Ange", False), id="character class"),
+            pytest.param(r"bo\.Angebot|com\.Preis", ("", False), id="alternation"),
+            pytest.param(r"(?i)bo\.Angebot", ("", False), id="flags"),
+            pytest.param(r"a\\b", ("a\\b", True), id="escaped backslash"),
+        ],
+    )
+    def test_split_literal_prefix(self, pattern: str, expected: tuple[str, bool]):
+        assert split_literal_prefix(pattern) == expected
+
+    def test_pattern_index_matches_like_fullmatch(self):
+        pattern_index = PatternIndex(PATTERNS)
+        for subject in SUBJECTS:
+            expected = [index for index, pattern in enumerate(PATTERNS) if re.fullmatch(pattern, subject)]
+            assert pattern_index.match(subject) == expected, subject
+
+    def test_group_matches(self):
+        pattern_index = PatternIndex([r"bo\.Angebot", r"bo\..*", r"enum\.Typ"])
+        matches = pattern_index.group_matches((subject, index) for index, subject in enumerate(SUBJECTS))
+        assert matches == [[0], [0, 1, 2, 3, 9], []]
@@ -4,7 +4,14 @@ from unittest.mock import Mock
 from more_itertools import one
 
 from bost.config import AdditionalField, load_config
-from bost.operations import add_additional_property, field_to_non_nullable, update_reference, update_references
+from bost.operations import (
+    ReferenceResolver,
+    ReferenceStats,
+    add_additional_property,
+    field_to_non_nullable,
+    update_reference,
+    update_references,
+)
 from bost.pull import SchemaMetadata
 from bost.schema import Object, Reference, SchemaRootObject, String
 
@@ -51,6 +58,39 @@ class TestOperations:
 
         assert bar_schema.properties["foo"].ref == "../com/Foo.json#"
 
+    def test_reference_resolver(self):
+        schemas = {}
+        for module_path in [("bo", "Angebot"), ("bo", "Vertrag"), ("com", "Preis")]:
+            metadata = Mock(SchemaMetadata)
+            metadata.module_path = module_path
+            metadata.schema_parsed = SchemaRootObject(
+                properties={
+                    "preis": Reference(ref="#/$defs/Preis"),
+                    "vertrag": Reference(
+                        ref="https://raw.githubusercontent.com/BO4E/BO4E-Schemas/v202401.1.0/"
+                        "src/bo4e_schemas/bo/Vertrag.json"
+                    ),
+                    "unknown": Reference(ref="https://example.com/Unknown.json"),
+                },
+                type="object",
+            )
+            schemas[module_path[-1]] = metadata
+        resolver = ReferenceResolver(schemas, "v202401.1.0")
+
+        for metadata in schemas.values():
+            update_references(metadata, schemas, "v202401.1.0", resolver)
+
+        assert [
+            (metadata.schema_parsed.properties["preis"].ref, metadata.schema_parsed.properties["vertrag"].ref)
+            for metadata in schemas.values()
+        ] == [
+            ("../com/Preis.json#", "Vertrag.json#"),
+            ("../com/Preis.json#", "#"),
+            ("#", "../bo/Vertrag.json#"),
+        ]
+        assert schemas["Angebot"].schema_parsed.properties["unknown"].ref == "https://example.com/Unknown.json"
+        assert resolver.stats == ReferenceStats(resolved=2, cached=4, unchanged=3)
+
     def test_field_to_non_nullable_with_default(self):
         angebot = SchemaRootObject.model_validate_json(
             (Path(__file__).parent / "test_data/bo4e_schemas/bo/Angebot.json").read_text()
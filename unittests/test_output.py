@@ -0,0 +1,67 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from bost.output import CHANGES_FILE_NAME, MANIFEST_FILE_NAME, save_schemas
+from bost.pull import SchemaMetadata
+from bost.schema import SchemaRootObject, String
+
+
+def _schema_metadata(class_name: str, output: Path, title: str = "") -> SchemaMetadata:
+    schema = SchemaMetadata(
+        class_name=class_name,
+        download_url="",
+        module_path=("bo", class_name),
+        file_path=output / "bo" / f"{class_name}.json",
+        cached_path=None,
+        token=None,
+    )
+    schema.schema_parsed = SchemaRootObject(
+        title=title or class_name, properties={"foo": String(type="string")}, type="object"
+    )
+    return schema
+
+
+class TestOutput:
+    def test_save_schemas_only_writes_changes(self, tmp_path: Path):
+        angebot, vertrag, zaehler = (_schema_metadata(name, tmp_path) for name in ("Angebot", "Vertrag", "Zaehler"))
+        changes = save_schemas([angebot, vertrag, zaehler], tmp_path, clear_output=False)
+        assert changes.added == ["bo/Angebot.json", "bo/Vertrag.json", "bo/Zaehler.json"]
+        assert set(json.loads((tmp_path / MANIFEST_FILE_NAME).read_text())["files"]) == set(changes.added)
+        modification_time = angebot.file_path.stat().st_mtime_ns
+
+        vertrag = _schema_metadata("Vertrag", tmp_path, title="Changed")
+        changes = save_schemas([angebot, vertrag], tmp_path, clear_output=False)
+        assert len(changes.added) == 0
+        assert changes.changed == ["bo/Vertrag.json"]
+        assert changes.removed == ["bo/Zaehler.json"]
+        assert changes.unchanged == 1
+        assert json.loads((tmp_path / CHANGES_FILE_NAME).read_text())["changed"] == ["bo/Vertrag.json"]
+        assert angebot.file_path.stat().st_mtime_ns == modification_time
+        assert not zaehler.file_path.exists()
+        assert SchemaRootObject.model_validate_json(vertrag.file_path.read_text()).title == "Changed"
+
+        # Deleted files are written again even if the manifest didn't change
+        angebot.file_path.unlink()
+        changes = save_schemas([angebot, vertrag], tmp_path, clear_output=False)
+        assert changes.changed == ["bo/Angebot.json"]
+        assert angebot.file_path.exists()
+
+    def test_save_schemas_is_atomic(self, tmp_path: Path, monkeypatch):
+        schemas = [_schema_metadata(f"Angebot{index}", tmp_path) for index in range(20)]
+        save_schemas(schemas, tmp_path, clear_output=False, jobs=4)
+        assert sorted(path.name for path in (tmp_path / "bo").iterdir()) == sorted(
+            schema.file_path.name for schema in schemas
+        )
+
+        def broken_replace(*_):
+            raise OSError("disk full")
+
+        changed_schema = _schema_metadata("Angebot0", tmp_path, title="Changed")
+        monkeypatch.setattr("bost.cache.os.replace", broken_replace)
+        with pytest.raises(OSError):
+            save_schemas([changed_schema, *schemas[1:]], tmp_path, clear_output=False, jobs=4)
+        # The old file is untouched and no temporary files are left behind
+        assert SchemaRootObject.model_validate_json(changed_schema.file_path.read_text()).title == "Angebot0"
+        assert len(list((tmp_path / "bo").iterdir())) == 20
@@ -0,0 +1,87 @@
+import json
+import pickle
+import pstats
+import re
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import requests
+import requests_mock
+
+from bost.__main__ import main
+from bost.profiling import PHASES, Profiler, phase
+from bost.pull import _github_tree_query, get_source_repo
+
+TEST_DATA_DIR = Path(__file__).parent / "test_data"
+CONFIG_FILE = Path(__file__).parent / "config_test.json"
+
+
+class TestProfiling:
+    @patch("bost.pull.Github")
+    def test_profile_report(self, mock_github, tmp_path: Path):
+        mock_repo = Mock()
+        mock_github.return_value.get_repo.return_value = mock_repo
+        # pylint: disable=consider-using-with
+        mock_repo.get_release.return_value = pickle.load(open(TEST_DATA_DIR / "release.pkl", mode="rb"))
+        mock_repo.get_git_tree.return_value = pickle.load(open(TEST_DATA_DIR / "tree.pkl", mode="rb"))
+        get_source_repo.cache_clear()
+        _github_tree_query.cache_clear()
+        original_send = requests.Session.send
+
+        def run(report_file: Path):
+            main(
+                output=tmp_path / "output",
+                target_version="v0.6.1-rc13",
+                update_refs=True,
+                set_default_version=True,
+                clear_output=True,
+                config_file=CONFIG_FILE,
+                cache_dir=tmp_path / "cache",
+                profile=report_file,
+                profile_phase="update_references",
+            )
+            return json.loads(report_file.read_text())
+
+        with requests_mock.Mocker() as mocker:
+            mocker.get(
+                re.compile(
+                    r"https://raw\.githubusercontent\.com/bo4e/BO4E-Schemas/[\w.-]+/src/bo4e_schemas/(\w+)/(\w+)\.json"
+                ),
+                text=lambda request, _: (
+                    TEST_DATA_DIR / "bo4e_schemas" / request.url.split("/bo4e_schemas/")[-1]
+                ).read_text(),
+            )
+            report = run(tmp_path / "cold.json")
+            number_of_downloads = mocker.call_count
+            warm_report = run(tmp_path / "warm.json")
+
+        phase_names = [phase_report["name"] for phase_report in report["phases"]]
+        assert phase_names == [name for name in PHASES if name not in ("resolve_version", "plan")]
+        assert report["http_requests"] == number_of_downloads
+        assert report["bytes_transferred"] > 0
+        assert report["peak_memory"] > 0
+        assert report["cache_misses"]["blobs"] == number_of_downloads
+        download = next(phase_report for phase_report in report["phases"] if phase_report["name"] == "download")
+        assert download["http_requests"] == number_of_downloads
+
+        # The file tree is cached by the first run. The test files don't match the blob SHAs of the tree, so they
+        # aren't cached and are downloaded again.
+        assert report["cache_misses"]["file_trees"] == 1
+        assert warm_report["cache_hits"]["file_trees"] == 1
+        assert warm_report["http_requests"] == number_of_downloads
+        stats = pstats.Stats(warm_report["cprofile_file"])
+        assert any(function_name == "update_references" for _, _, function_name in stats.stats)  # type: ignore[attr-defined]
+        assert requests.Session.send is original_send
+
+    def test_nested_phases(self):
+        with Profiler() as profiler:
+            with phase("outer"):
+                with phase("inner"):
+                    data = bytearray(1_000_000)
+                del data
+        phases = {phase_report.name: phase_report for phase_report in profiler.report.phases}
+        inner, outer = phases["inner"], phases["outer"]
+        assert list(phases) == ["inner", "outer"]
+        assert inner.peak_memory >= 1_000_000
+        assert outer.peak_memory >= inner.peak_memory
+        assert profiler.report.peak_memory >= outer.peak_memory
@@ -0,0 +1,378 @@
+import io
+import json
+import pickle
+import re
+import shutil
+import subprocess
+import time
+import zipfile
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pytest
+import requests_mock
+from github.GithubException import RateLimitExceededException
+
+from bost.cache import get_cached_blob, get_cached_model, get_cached_response, git_blob_sha
+from bost.pull import (
+    API_URL,
+    ARCHIVE_URL,
+    DEFAULT_JOBS,
+    SchemaMetadata,
+    _github_tree_query,
+    archive_schema_iterator,
+    checkout_version,
+    download_schemas,
+    get_session,
+    get_source_repo,
+    mirror_schema_iterator,
+    resolve_latest_version,
+)
+from bost.ratelimit import get_scheduler
+from bost.schema import SchemaRootObject
+
+TEST_DATA_DIR = Path(__file__).parent / "test_data"
+RAW_URL = "https://raw.githubusercontent.com/bo4e/BO4E-Schemas/v0.6.1-rc13/src/bo4e_schemas"
+
+
+def _schema_metadata(module_path: tuple[str, ...], tmp_path: Path) -> SchemaMetadata:
+    relative_path = Path(*module_path).with_suffix(".json")
+    return SchemaMetadata(
+        class_name=module_path[-1],
+        download_url=f"{RAW_URL}/{relative_path.as_posix()}",
+        module_path=module_path,
+        file_path=tmp_path / "output" / relative_path,
+        cached_path=tmp_path / "cache" / relative_path,
+        token=None,
+    )
+
+
+def _write_mirror(source_dir: Path, versions: list[str]) -> Path:
+    for version in versions:
+        for module in ("bo", "com", "enum"):
+            shutil.copytree(
+                TEST_DATA_DIR / "bo4e_schemas" / module, source_dir / version / "src" / "bo4e_schemas" / module
+            )
+    return source_dir
+
+
+class TestPull:
+    def test_download_schemas(self, tmp_path: Path):
+        module_paths = [("bo", "Angebot"), ("bo", "Geschaeftspartner"), ("com", "Adresse"), ("enum", "Typ")]
+        schemas = [_schema_metadata(module_path, tmp_path) for module_path in module_paths]
+        with requests_mock.Mocker() as mocker:
+            mocker.get(
+                re.compile(rf"{re.escape(RAW_URL)}/(\w+)/(\w+)\.json"),
+                text=lambda request, _: (
+                    TEST_DATA_DIR / "bo4e_schemas" / request.url.split("/bo4e_schemas/")[-1]
+                ).read_text(),
+            )
+            download_schemas(schemas, jobs=3)
+            assert mocker.call_count == len(module_paths)
+            # Already loaded schemas are not downloaded again
+            download_schemas(schemas, jobs=3)
+            assert mocker.call_count == len(module_paths)
+
+        for schema in schemas:
+            assert schema.is_loaded
+            assert schema.cached_path is not None and schema.cached_path.exists()
+        assert isinstance(schemas[0].schema_parsed, SchemaRootObject)
+        assert schemas[0].schema_parsed.title == "Angebot"
+
+    def test_get_session_is_shared(self):
+        session = get_session()
+        assert get_session(DEFAULT_JOBS) is session
+        assert get_session(DEFAULT_JOBS * 2) is session
+        assert session.get_adapter("https://").poolmanager.connection_pool_kw["maxsize"] >= DEFAULT_JOBS * 2
+
+    @patch("bost.pull.Github")
+    def test_github_tree_query_discovery_modes(self, mock_github):
+        def new_get_contents(path, ref):  # pylint: disable=unused-argument
+            return pickle.load(open(TEST_DATA_DIR / f"contents_{path.replace('/', '_')}.pkl", mode="rb"))
+
+        mock_repo = Mock()
+        mock_github.return_value.get_repo.return_value = mock_repo
+        # pylint: disable=consider-using-with
+        mock_repo.get_release.return_value = pickle.load(open(TEST_DATA_DIR / "release.pkl", mode="rb"))
+        mock_repo.get_git_tree.return_value = pickle.load(open(TEST_DATA_DIR / "tree.pkl", mode="rb"))
+        mock_repo.get_contents = Mock(side_effect=new_get_contents)
+        get_source_repo.cache_clear()
+        _github_tree_query.cache_clear()
+
+        tree_schemas = {file.path: file for file in _github_tree_query("v0.6.1-rc13", None, "tree").all_files()}
+        assert mock_repo.get_release.call_count == 1
+        assert mock_repo.get_git_tree.call_count == 1
+        assert mock_repo.get_contents.call_count == 0
+
+        contents_schemas = {file.path: file for file in _github_tree_query("v0.6.1-rc13", None, "contents").all_files()}
+        assert mock_repo.get_contents.call_count > 0
+        _github_tree_query.cache_clear()
+
+        assert len(tree_schemas) > 0
+        # The recorded contents refer to the files by the commit of the tag instead of the tag itself
+        assert {path: (file.name, file.sha) for path, file in tree_schemas.items()} == {
+            path: (file.name, file.sha) for path, file in contents_schemas.items()
+        }
+
+    @patch("bost.pull.Github")
+    def test_github_tree_query_uses_tag(self, mock_github):
+        mock_repo = Mock()
+        mock_github.return_value.get_repo.return_value = mock_repo
+        # pylint: disable=consider-using-with
+        release = pickle.load(open(TEST_DATA_DIR / "release.pkl", mode="rb"))
+        # The release was created from a branch which has moved on since
+        mock_repo.get_release.return_value = Mock(
+            raw_data={**release.raw_data, "target_commitish": "main"}, raw_headers={}, etag=None, last_modified=None
+        )
+        mock_repo.get_git_tree.return_value = pickle.load(open(TEST_DATA_DIR / "tree.pkl", mode="rb"))
+        get_source_repo.cache_clear()
+        _github_tree_query.cache_clear()
+
+        schemas = list(_github_tree_query("v0.6.1-rc13", None, "tree").all_files())
+        _github_tree_query.cache_clear()
+
+        mock_repo.get_git_tree.assert_called_once_with("v0.6.1-rc13", recursive=True)
+        assert len(schemas) > 0
+        assert all(schema.download_url.startswith(RAW_URL) for schema in schemas)
+
+    @patch("bost.pull.Github")
+    def test_rate_limited_pygithub_queries_are_retried(self, mock_github):
+        def load_contents(path: str) -> list:
+            return pickle.load(open(TEST_DATA_DIR / f"contents_{path.replace('/', '_')}.pkl", mode="rb"))
+
+        mock_repo = Mock()
+        mock_github.return_value.get_repo.return_value = mock_repo
+        # pylint: disable=consider-using-with
+        release = pickle.load(open(TEST_DATA_DIR / "release.pkl", mode="rb"))
+        mock_repo.get_release.side_effect = RateLimitExceededException(
+            403,
+            {"message": "API rate limit exceeded"},
+            {"x-ratelimit-remaining": "0", "x-ratelimit-reset": str(int(time.time()) + 3600)},
+        )
+        mock_repo.get_git_tree.return_value = pickle.load(open(TEST_DATA_DIR / "tree.pkl", mode="rb"))
+        mock_repo.get_contents.side_effect = RateLimitExceededException(
+            403, {"message": "You have exceeded a secondary rate limit"}, {"retry-after": "0"}
+        )
+        get_source_repo.cache_clear()
+        get_scheduler.cache_clear()
+        _github_tree_query.cache_clear()
+
+        with requests_mock.Mocker() as mocker:
+            mocker.get(f"{API_URL}/releases/tags/v0.6.1-rc13", json=release.raw_data)
+            mocker.get(
+                re.compile(rf"{re.escape(API_URL)}/contents/.*"),
+                json=lambda request, _: [
+                    {
+                        "name": content.name,
+                        "path": content.path,
+                        "download_url": content.download_url,
+                        "sha": content.sha,
+                    }
+                    for content in load_contents(request.path.split("/contents/")[-1])
+                ],
+            )
+            schemas = {file.path: file for file in _github_tree_query("v0.6.1-rc13", "a,b", "contents").all_files()}
+        _github_tree_query.cache_clear()
+        get_scheduler.cache_clear()
+
+        # The exhausted token is blocked until the reset, so the requests are retried with the other token
+        assert mock_repo.get_release.call_count == 1
+        assert mocker.request_history[0].url == f"{API_URL}/releases/tags/v0.6.1-rc13"
+        assert {request.headers["Authorization"] for request in mocker.request_history} == {"Bearer b"}
+        mock_repo.get_git_tree.assert_called_once_with("v0.6.1-rc13", recursive=True)
+        # Every rate limited directory listing is retried once
+        assert mock_repo.get_contents.call_count > 0
+        assert mocker.call_count == 1 + mock_repo.get_contents.call_count
+        assert "src/bo4e_schemas/bo/Angebot.json" in schemas
+
+    def test_archive_schema_iterator(self, tmp_path: Path):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, mode="w") as zip_file:
+            for file in (TEST_DATA_DIR / "bo4e_schemas").glob("*/*.json"):
+                relative_path = file.relative_to(TEST_DATA_DIR / "bo4e_schemas").as_posix()
+                zip_file.writestr(f"BO4E-Schemas-0.6.1-rc13/src/bo4e_schemas/{relative_path}", file.read_bytes())
+            zip_file.writestr("BO4E-Schemas-0.6.1-rc13/README.md", "")
+        cache_dir = tmp_path / "cache"
+
+        with requests_mock.Mocker() as mocker:
+            mocker.get(ARCHIVE_URL.format(version="v0.6.1-rc13"), content=archive.getvalue())
+            with patch("bost.pull.git_blob_sha", wraps=git_blob_sha) as mock_git_blob_sha:
+                schemas = dict(archive_schema_iterator("v0.6.1-rc13", tmp_path / "output", cache_dir, None))
+            assert mocker.call_count == 1
+            # Every file is hashed once for the tree, the verification and the cache together
+            assert mock_git_blob_sha.call_count == len(schemas)
+            # A second run is served from the cache
+            schemas_cached = dict(archive_schema_iterator("v0.6.1-rc13", tmp_path / "output", cache_dir, None))
+            assert mocker.call_count == 1
+
+        assert len(schemas) == len(list((TEST_DATA_DIR / "bo4e_schemas").glob("*/*.json")))
+        assert schemas.keys() == schemas_cached.keys()
+        assert schemas["Angebot"].module_path == ("bo", "Angebot")
+        assert schemas["Angebot"].is_loaded
+        assert schemas["Angebot"].schema_parsed.title == "Angebot"
+        assert schemas_cached["Angebot"].schema_parsed == schemas["Angebot"].schema_parsed
+
+    def test_corrupted_cache_file_is_downloaded_again(self, tmp_path: Path):
+        content = (TEST_DATA_DIR / "bo4e_schemas" / "enum" / "Typ.json").read_bytes()
+        schema = _schema_metadata(("enum", "Typ"), tmp_path)
+        schema.sha = git_blob_sha(content)
+        schema.cached_path = get_cached_blob(schema.sha, tmp_path / "cache")
+        assert schema.cached_path is not None
+        schema.cached_path.parent.mkdir(parents=True)
+        schema.cached_path.write_text("corrupted")
+
+        with requests_mock.Mocker() as mocker:
+            mocker.get(schema.download_url, content=content)
+            assert schema.schema_parsed.title == "Typ"
+            assert mocker.call_count == 1
+        assert schema.cached_path.read_bytes() == content
+
+    def test_mismatching_content_is_not_cached(self, tmp_path: Path):
+        content = (TEST_DATA_DIR / "bo4e_schemas" / "enum" / "Typ.json").read_bytes()
+        sha = git_blob_sha(b"other content")
+        schema = _schema_metadata(("enum", "Typ"), tmp_path)
+        schema.sha = sha
+        schema.cached_path = get_cached_blob(sha, tmp_path / "cache")
+        schema.cached_model_path = get_cached_model(sha, tmp_path / "cache")
+
+        with requests_mock.Mocker() as mocker:
+            mocker.get(schema.download_url, content=content)
+            assert schema.schema_parsed.title == "Typ"
+        assert schema.cached_path is not None and not schema.cached_path.exists()
+        assert not schema.has_cached_model
+
+    def test_cached_model(self, tmp_path: Path):
+        content = (TEST_DATA_DIR / "bo4e_schemas" / "bo" / "Angebot.json").read_bytes()
+        sha = git_blob_sha(content)
+
+        def create_schema_metadata() -> SchemaMetadata:
+            schema = _schema_metadata(("bo", "Angebot"), tmp_path)
+            schema.sha = sha
+            schema.cached_path = get_cached_blob(sha, tmp_path / "cache")
+            schema.cached_model_path = get_cached_model(sha, tmp_path / "cache")
+            return schema
+
+        schema = create_schema_metadata()
+        with requests_mock.Mocker() as mocker:
+            mocker.get(schema.download_url, content=content)
+            schema_parsed = schema.schema_parsed
+        assert schema.has_cached_model
+
+        # The cached model is used even if the raw file is gone, i.e. the raw file is not parsed again
+        assert schema.cached_path is not None
+        schema.cached_path.unlink()
+        schema_cached = create_schema_metadata()
+        with requests_mock.Mocker():
+            download_schemas([schema_cached])
+            assert schema_cached.schema_parsed == schema_parsed
+        assert schema_cached.schema_parsed.model_dump_json(exclude_unset=True) == schema_parsed.model_dump_json(
+            exclude_unset=True
+        )
+
+    @patch("bost.pull.Github")
+    def test_mirror_schema_iterator(self, mock_github, tmp_path: Path):
+        source_dir = _write_mirror(tmp_path / "mirror", ["v0.6.1-rc13", "v0.6.1-rc2"])
+        resolve_latest_version.cache_clear()
+        assert resolve_latest_version(None, source_dir) == "v0.6.1-rc13"
+        resolve_latest_version.cache_clear()
+
+        with requests_mock.Mocker() as mocker:
+            schemas = dict(mirror_schema_iterator("v0.6.1-rc13", source_dir, tmp_path / "output"))
+            download_schemas(schemas.values())
+            assert mocker.call_count == 0
+        mock_github.assert_not_called()
+
+        assert len(schemas) == len(list((TEST_DATA_DIR / "bo4e_schemas").glob("*/*.json")))
+        assert schemas["Angebot"].module_path == ("bo", "Angebot")
+        assert schemas["Angebot"].file_path == tmp_path / "output" / "bo" / "Angebot.json"
+        assert schemas["Angebot"].download_url.startswith("file://")
+        assert schemas["Angebot"].schema_parsed.title == "Angebot"
+
+    def test_checkout_schema_iterator(self, tmp_path: Path):
+        source_dir = tmp_path / "BO4E-Schemas"
+        schemas_dir = source_dir / "src" / "bo4e_schemas"
+        for module in ("bo", "com", "enum"):
+            shutil.copytree(TEST_DATA_DIR / "bo4e_schemas" / module, schemas_dir / module)
+        (schemas_dir / "ZusatzAttribut.json").write_text(
+            json.dumps(
+                {
+                    "title": "ZusatzAttribut",
+                    "type": "object",
+                    "properties": {"name": {"title": "Name", "type": "string"}},
+                }
+            )
+        )
+        (schemas_dir / ".vscode").mkdir()
+        (schemas_dir / ".vscode" / "settings.json").write_text("{}")
+        resolve_latest_version.cache_clear()
+        with pytest.raises(ValueError, match="version of the checkout .* is unknown"):
+            resolve_latest_version(None, source_dir)
+        resolve_latest_version.cache_clear()
+
+        (source_dir / "pyproject.toml").write_text('[project]\nname = "bo4e-schemas"\nversion = "0.6.1rc13"\n')
+        assert checkout_version(source_dir) == "v0.6.1-rc13"
+        assert resolve_latest_version(None, source_dir) == "v0.6.1-rc13"
+        resolve_latest_version.cache_clear()
+        with pytest.raises(ValueError, match="is a checkout of version v0.6.1-rc13, not of version v999.0.0"):
+            list(mirror_schema_iterator("v999.0.0", source_dir, tmp_path / "output"))
+
+        # Top level schemas are read as well, but not the JSON files of the tooling
+        schemas = dict(mirror_schema_iterator("v0.6.1-rc13", source_dir, tmp_path / "output"))
+        assert len(schemas) == len(list((TEST_DATA_DIR / "bo4e_schemas").glob("*/*.json"))) + 1
+        assert schemas["ZusatzAttribut"].module_path == ("ZusatzAttribut",)
+        assert schemas["ZusatzAttribut"].file_path == tmp_path / "output" / "ZusatzAttribut.json"
+        assert schemas["ZusatzAttribut"].schema_parsed.title == "ZusatzAttribut"
+
+        # The git tag of the checked out commit takes precedence over the package metadata
+        if shutil.which("git") is None:
+            pytest.skip("git is not available")
+        git = ["git", "-C", str(source_dir), "-c", "user.name=test", "-c", "user.email=test@example.com"]
+        subprocess.run([*git, "init", "-q"], check=True)
+        subprocess.run([*git, "commit", "-q", "--allow-empty", "-m", "release"], check=True)
+        subprocess.run([*git, "tag", "v0.6.1"], check=True)
+        assert checkout_version(source_dir) == "v0.6.1"
+
+    @patch("bost.pull.Github")
+    def test_conditional_requests(self, mock_github, tmp_path: Path):
+        mock_repo = Mock()
+        mock_github.return_value.get_repo.return_value = mock_repo
+        # pylint: disable=consider-using-with
+        release = pickle.load(open(TEST_DATA_DIR / "release.pkl", mode="rb"))
+        tree = pickle.load(open(TEST_DATA_DIR / "tree.pkl", mode="rb"))
+        mock_repo.get_release.return_value = release
+        mock_repo.get_git_tree.return_value = tree
+        get_source_repo.cache_clear()
+        _github_tree_query.cache_clear()
+        cache_dir = tmp_path / "cache"
+        cache_dir.mkdir()
+        release_url = f"{API_URL}/releases/tags/v0.6.1-rc13"
+        tree_url = f"{API_URL}/git/trees/{release.tag_name}?recursive=1"
+
+        schema_tree = _github_tree_query("v0.6.1-rc13", None, "tree", cache_dir)
+        cached_release = get_cached_response(cache_dir, release_url)
+        assert cached_release is not None and cached_release.etag == release.etag
+        _github_tree_query.cache_clear()
+
+        with requests_mock.Mocker() as mocker:
+            mocker.get(release_url, status_code=304)
+            mocker.get(tree_url, status_code=304)
+            # The cached responses are revalidated instead of being queried again
+            assert _github_tree_query("v0.6.1-rc13", None, "tree", cache_dir) == schema_tree
+            assert [request.headers["If-None-Match"] for request in mocker.request_history] == [
+                release.etag,
+                tree.etag,
+            ]
+            assert mock_repo.get_release.call_count == 1
+            assert mock_repo.get_git_tree.call_count == 1
+            _github_tree_query.cache_clear()
+
+            changed_tree = json.loads(json.dumps(tree.raw_data))
+            changed_tree["tree"] = [element for element in changed_tree["tree"] if "Angebot" not in element["path"]]
+            mocker.get(tree_url, json=changed_tree, headers={"ETag": '"changed"'})
+            changed_schema_tree = _github_tree_query("v0.6.1-rc13", None, "tree", cache_dir)
+            _github_tree_query.cache_clear()
+
+        assert "bo/Angebot" in schema_tree
+        assert "bo/Angebot" not in changed_schema_tree
+        cached_tree = get_cached_response(cache_dir, tree_url)
+        assert cached_tree is not None and cached_tree.etag == '"changed"'
@@ -0,0 +1,84 @@
+import pytest
+import requests
+import requests_mock
+
+from bost.ratelimit import RequestScheduler, split_tokens
+
+URL = "https://api.github.com/repos/bo4e/BO4E-Schemas/releases/latest"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def authorizations(mock: requests_mock.Mocker) -> list[str | None]:
+    return [request.headers.get("Authorization") for request in mock.request_history]
+
+
+class TestRatelimit:
+    def test_split_tokens(self):
+        assert split_tokens(None) == [None]
+        assert split_tokens("") == [None]
+        assert split_tokens("a") == ["a"]
+        assert split_tokens(" a, b ,") == ["a", "b"]
+
+    def test_retry_after(self):
+        clock = FakeClock()
+        scheduler = RequestScheduler(["a"], clock=clock, sleep=clock.sleep)
+        with requests_mock.Mocker() as mock:
+            mock.get(URL, [{"status_code": 429, "headers": {"Retry-After": "3"}}, {"status_code": 200, "text": "ok"}])
+            response = scheduler.request(requests.Session(), "GET", URL)
+        assert response.status_code == 200
+        assert clock.sleeps == [3]
+        assert authorizations(mock) == ["Bearer a", "Bearer a"]
+
+    def test_rotation_on_secondary_limit(self):
+        clock = FakeClock()
+        scheduler = RequestScheduler(["a", "b"], clock=clock, sleep=clock.sleep)
+        with requests_mock.Mocker() as mock:
+            mock.get(
+                URL,
+                [
+                    {"status_code": 403, "text": "You have exceeded a secondary rate limit."},
+                    {"status_code": 200},
+                    {"status_code": 200},
+                ],
+            )
+            session = requests.Session()
+            assert scheduler.request(session, "GET", URL).status_code == 200
+            assert scheduler.request(session, "GET", URL).status_code == 200
+        # Token "a" is blocked by the backoff, so the retry and the next request use "b" without waiting
+        assert authorizations(mock) == ["Bearer a", "Bearer b", "Bearer b"]
+        assert not clock.sleeps
+
+    def test_pacing(self):
+        clock = FakeClock()
+        scheduler = RequestScheduler(["a"], burst=1, clock=clock, sleep=clock.sleep)
+        headers = {"X-RateLimit-Remaining": "10", "X-RateLimit-Reset": str(int(clock.now) + 100)}
+        with requests_mock.Mocker() as mock:
+            mock.get(URL, status_code=200, headers=headers)
+            session = requests.Session()
+            for _ in range(3):
+                scheduler.request(session, "GET", URL)
+        # The first two requests are sent at once (the budget is unknown before the first response, then the bucket is
+        # full), 10 remaining requests in 100 seconds allow one request every 10 seconds afterward
+        assert clock.sleeps == [pytest.approx(10)]
+
+    def test_exhausted_primary_limit(self):
+        clock = FakeClock()
+        scheduler = RequestScheduler(["a"], max_wait=60, clock=clock, sleep=clock.sleep)
+        headers = {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(int(clock.now) + 600)}
+        with requests_mock.Mocker() as mock:
+            mock.get(URL, status_code=403, headers=headers, text="API rate limit exceeded")
+            with pytest.raises(ValueError, match="rate limit of api.github.com is exhausted"):
+                scheduler.request(requests.Session(), "GET", URL)
+        assert mock.call_count == 1
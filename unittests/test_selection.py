@@ -0,0 +1,90 @@
+import re
+from pathlib import Path
+
+import pytest
+import requests_mock
+
+from bost.pull import SchemaMetadata, load_schema
+from bost.schema import Reference, SchemaRootObject
+from bost.selection import collect_references, resolve_relative_reference, select_schemas
+
+TEST_DATA_DIR = Path(__file__).parent / "test_data"
+RAW_URL = "https://raw.githubusercontent.com/bo4e/BO4E-Schemas/v0.6.1-rc13/src/bo4e_schemas"
+VERSION = "v0.6.1-rc13"
+
+
+def _schema_metadata(module_path: tuple[str, ...], tmp_path: Path) -> SchemaMetadata:
+    relative_path = Path(*module_path).with_suffix(".json")
+    return SchemaMetadata(
+        class_name=module_path[-1],
+        download_url=f"{RAW_URL}/{relative_path.as_posix()}",
+        module_path=module_path,
+        file_path=tmp_path / "output" / relative_path,
+        cached_path=tmp_path / "cache" / relative_path,
+        token=None,
+    )
+
+
+class TestSelection:
+    def test_select_schemas_with_reference_closure(self, tmp_path: Path):
+        schemas = {
+            path.stem: _schema_metadata((path.parent.name, path.stem), tmp_path)
+            for path in sorted((TEST_DATA_DIR / "bo4e_schemas").glob("*/*.json"))
+        }
+        with requests_mock.Mocker() as mocker:
+            mocker.get(
+                re.compile(rf"{re.escape(RAW_URL)}/(\w+)/(\w+)\.json"),
+                text=lambda request, _: (
+                    TEST_DATA_DIR / "bo4e_schemas" / request.url.split("/bo4e_schemas/")[-1]
+                ).read_text(),
+            )
+            selected = select_schemas(schemas, VERSION, include=[r"bo\.Angebot"], exclude=[r"enum\..*"], jobs=4)
+            downloaded = {request.url.split("/bo4e_schemas/")[-1] for request in mocker.request_history}
+
+        assert "Angebot" in selected
+        assert "Vertrag" not in selected
+        # The referenced enums are selected even though they are excluded
+        assert "Typ" in selected
+        assert downloaded == {"/".join(schema.module_path) + ".json" for schema in selected.values()}
+        assert len(selected) < len(schemas)
+        assert list(selected) == [name for name in schemas if name in selected]
+        # The selection is reference-complete
+        for schema in selected.values():
+            for ref in collect_references(schema.schema_parsed):
+                assert ref.split("/")[-1].removesuffix(".json#").removesuffix(".json") in selected, ref
+
+    def test_relative_references(self, tmp_path: Path):
+        assert resolve_relative_reference("../enum/Typ.json#", ("bo",)) == ("enum", "Typ")
+        assert resolve_relative_reference("Angebot.json", ("bo",)) == ("bo", "Angebot")
+        assert resolve_relative_reference("../../Typ.json", ("bo",)) is None
+        assert resolve_relative_reference("#/$defs/Typ", ("bo",)) is None
+
+        schemas = {
+            path.stem: _schema_metadata((path.parent.name, path.stem), tmp_path)
+            for path in sorted((TEST_DATA_DIR / "bo4e_schemas").glob("*/*.json"))
+        }
+        additional_model = _schema_metadata(("bo", "AdditionalModel"), tmp_path)
+        additional_model.schema_parsed = load_schema(TEST_DATA_DIR / "bo4e_schemas" / "additional_model.json")
+        schemas["AdditionalModel"] = additional_model
+        with requests_mock.Mocker() as mocker:
+            mocker.get(
+                re.compile(rf"{re.escape(RAW_URL)}/(\w+)/(\w+)\.json"),
+                text=lambda request, _: (
+                    TEST_DATA_DIR / "bo4e_schemas" / request.url.split("/bo4e_schemas/")[-1]
+                ).read_text(),
+            )
+            selected = select_schemas(schemas, VERSION, include=[r"bo\.AdditionalModel"], jobs=2)
+        assert {"AdditionalModel", "Angebot", "Typ", "Adresse"} <= set(selected)
+
+    def test_version_mismatch(self, tmp_path: Path):
+        schema = _schema_metadata(("bo", "Foo"), tmp_path)
+        schema.schema_parsed = SchemaRootObject(
+            type="object",
+            properties={
+                "typ": Reference(
+                    ref="https://raw.githubusercontent.com/bo4e/BO4E-Schemas/v0.0.1/src/bo4e_schemas/enum/Typ.json"
+                )
+            },
+        )
+        with pytest.raises(ValueError, match="Version mismatch"):
+            select_schemas({"Foo": schema}, VERSION, jobs=1)
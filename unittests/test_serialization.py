@@ -0,0 +1,27 @@
+from pathlib import Path
+
+import pytest
+
+from bost import serialization
+from bost.serialization import dump_schema, parse_schema
+
+TEST_DATA_DIR = Path(__file__).parent / "test_data"
+
+
+class TestSerialization:
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_parse_and_dump(self, use_orjson: bool, monkeypatch: pytest.MonkeyPatch):
+        if not use_orjson:
+            monkeypatch.setattr(serialization, "orjson", None)
+        assert serialization.json_backend() == ("orjson" if use_orjson else "pydantic")
+
+        for schema_file in (TEST_DATA_DIR / "bo4e_schemas").glob("*/*.json"):
+            schema_parsed = parse_schema(schema_file.read_bytes())
+            assert schema_parsed == serialization.SCHEMA_ROOT_ADAPTER.validate_json(schema_file.read_bytes())
+            assert dump_schema(schema_parsed) == schema_parsed.model_dump_json(
+                indent=2, exclude_unset=True, by_alias=True
+            )
+
+    def test_parse_invalid_json(self):
+        with pytest.raises(ValueError):
+            parse_schema(b'{"type": "object", "properties": ')
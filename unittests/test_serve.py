@@ -0,0 +1,156 @@
+import json
+import pickle
+import re
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pytest
+import requests_mock
+
+from bost.pull import _github_tree_query, get_source_repo
+from bost.serve import SchemaServer, SchemaStore
+
+TEST_DATA_DIR = Path(__file__).parent / "test_data"
+CONFIG_FILE = Path(__file__).parent / "config_test.json"
+VERSION = "v0.6.1-rc13"
+
+
+def _write_config(path: Path, enum_items: list[str]) -> Path:
+    config = json.loads(CONFIG_FILE.read_text())
+    config["additionalFields"][1]["$ref"] = str(CONFIG_FILE.parent / config["additionalFields"][1]["$ref"])
+    config["additionalModels"][0]["schema"]["$ref"] = str(
+        CONFIG_FILE.parent / config["additionalModels"][0]["schema"]["$ref"]
+    )
+    config["additionalEnumItems"][0]["items"] = enum_items
+    path.write_text(json.dumps(config))
+    return path
+
+
+def _get(url: str, etag: str | None = None) -> tuple[int, bytes, str]:
+    request = urllib.request.Request(url, headers={"If-None-Match": etag} if etag is not None else {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.read(), response.headers["ETag"]
+    except urllib.error.HTTPError as error:
+        return error.code, error.read(), error.headers["ETag"]
+
+
+class TestServe:
+    @patch("bost.pull.Github")
+    def test_serve(self, mock_github, tmp_path: Path):  # pylint: disable=too-many-locals
+        mock_repo = Mock()
+        mock_github.return_value.get_repo.return_value = mock_repo
+        # pylint: disable=consider-using-with
+        mock_repo.get_release.return_value = pickle.load(open(TEST_DATA_DIR / "release.pkl", mode="rb"))
+        mock_repo.get_git_tree.return_value = pickle.load(open(TEST_DATA_DIR / "tree.pkl", mode="rb"))
+        get_source_repo.cache_clear()
+        _github_tree_query.cache_clear()
+        config_file = _write_config(tmp_path / "my_config.json", ["foo", "bar"])
+        store = SchemaStore({"my_config": config_file})
+        server = SchemaServer(("127.0.0.1", 0), store)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        try:
+            with requests_mock.Mocker() as mocker:
+                mocker.get(
+                    re.compile(
+                        r"https://raw\.githubusercontent\.com/bo4e/BO4E-Schemas/[\w.-]+/src/bo4e_schemas/"
+                        r"(\w+)/(\w+)\.json"
+                    ),
+                    text=lambda request, _: (
+                        TEST_DATA_DIR / "bo4e_schemas" / request.url.split("/bo4e_schemas/")[-1]
+                    ).read_text(),
+                )
+                # Concurrent requests are coalesced: The tree is queried and every file is downloaded only once
+                url = f"{base_url}/{VERSION}/bo/Angebot.json?config=my_config"
+                with ThreadPoolExecutor(max_workers=4) as executor:
+                    responses = list(executor.map(_get, [url] * 4))
+                assert mock_repo.get_git_tree.call_count == 1
+                number_of_downloads = mocker.call_count
+                assert number_of_downloads == len(store.pull(VERSION))
+                status, content, etag = responses[0]
+                assert status == 200
+                assert all(response == responses[0] for response in responses)
+                assert "foo" in json.loads(content)["properties"]
+
+                # The client already has the file
+                assert _get(url, etag)[0] == 304
+                # A different config reuses the pulled schemas
+                status, content, _ = _get(f"{base_url}/{VERSION}/bo/Angebot.json")
+                assert status == 200
+                assert "foo" not in json.loads(content)["properties"]
+                assert mocker.call_count == number_of_downloads
+
+                index = json.loads(_get(f"{base_url}/{VERSION}/?config=my_config")[1])
+                assert index["files"]["bo/Angebot.json"] == etag
+                assert json.loads(_get(base_url)[1]) == {"configs": ["my_config"]}
+                assert _get(f"{base_url}/{VERSION}/bo/Unknown.json")[0] == 404
+                assert _get(f"{base_url}/{VERSION}/bo/Angebot.json?config=unknown")[0] == 404
+                # Anything else than a version isn't pulled
+                assert _get(f"{base_url}/favicon.ico")[0] == 404
+                assert mock_repo.get_release.call_count == 1
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_failures_are_not_cached(self):
+        store = SchemaStore()
+        calls = []
+
+        def compute():
+            calls.append(None)
+            if len(calls) == 1:
+                raise ValueError("Temporary failure")
+            return "result"
+
+        # pylint: disable=protected-access
+        with pytest.raises(ValueError):
+            store._coalesce("key", compute)
+        assert store._coalesce("key", compute) == "result"
+        assert store._coalesce("key", compute) == "result"
+        assert len(calls) == 2
+
+    def test_render_tracks_referenced_files(self, tmp_path: Path):
+        field_file = tmp_path / "field.json"
+        field_file.write_text("{}")
+        config_file = tmp_path / "config.json"
+        config_file.write_text(json.dumps({"additionalFields": [{"$ref": "field.json"}]}))
+        store = SchemaStore({"my_config": config_file})
+        render = Mock(return_value={})
+
+        with patch.object(store, "_render", render):
+            store.render(VERSION, "my_config")
+            store.render(VERSION, "my_config")
+            assert render.call_count == 1
+            # A change of a file referenced by the config invalidates the rendered files
+            field_file.write_text('{"foo": "bar"}')
+            store.render(VERSION, "my_config")
+            assert render.call_count == 2
+        # Only the files of the latest state of the config are kept
+        # pylint: disable=protected-access
+        keys = [key for key in store._futures if isinstance(key, tuple) and key[:3] == ("render", VERSION, "my_config")]
+        assert len(keys) == 1
+
+    def test_least_recently_requested_versions_are_evicted(self):
+        store = SchemaStore(max_versions=2)
+        pull = Mock(return_value={})
+
+        with patch.object(store, "_pull", pull):
+            store.pull("v0.0.1")
+            store.pull("v0.0.2")
+            store.pull("v0.0.1")
+            # v0.0.2 is the least recently requested version
+            store.pull("v0.0.3")
+            assert pull.call_count == 3
+            store.pull("v0.0.1")
+            assert pull.call_count == 3
+            store.pull("v0.0.2")
+            assert pull.call_count == 4
+        # pylint: disable=protected-access
+        assert {key[1] for key in store._futures if isinstance(key, tuple)} == {"v0.0.1", "v0.0.2"}
@@ -0,0 +1,61 @@
+import sys
+
+from bost.schema import AnyOf, Array, Null, Object, Reference, SchemaRootObject, String
+from bost.visitor import SchemaVisitor, iter_nodes, walk
+
+
+class ReferenceCollector(SchemaVisitor):
+    def __init__(self):
+        self.refs: list[str] = []
+
+    def visit_reference(self, node: Reference):
+        self.refs.append(node.ref)
+
+
+class TypeCollector(SchemaVisitor):
+    def __init__(self):
+        self.types: list[str] = []
+
+    def visit_object(self, node: Object):
+        self.types.append(f"object {node.title}")
+
+    def visit_schema_root_object(self, node: SchemaRootObject):
+        self.types.append(f"root {node.title}")
+
+    def visit_any_of(self, node: AnyOf):
+        self.types.append(f"any_of {len(node.any_of)}")
+
+
+class TestVisitor:
+    def test_walk_with_multiple_visitors(self):
+        schema = SchemaRootObject(
+            title="Angebot",
+            properties={
+                "vertrag": AnyOf(any_of=[Reference(ref="Vertrag.json#"), Null(type="null")]),
+                "preise": Array(items=Reference(ref="../com/Preis.json#"), type="array"),
+                "zusatz": Object(title="Zusatz", properties={"typ": Reference(ref="#")}, type="object"),
+            },
+            defs={"Vertrag": Object(title="Vertrag", properties={"id": String(type="string")}, type="object")},
+            type="object",
+        )
+        references, types = ReferenceCollector(), TypeCollector()
+
+        walk(schema, references, types)
+
+        assert references.refs == ["Vertrag.json#", "../com/Preis.json#", "#"]
+        assert types.types == ["root Angebot", "any_of 2", "object Zusatz"]
+
+        types = TypeCollector()
+        walk(schema, types, include_defs=True)
+        assert types.types == ["root Angebot", "any_of 2", "object Zusatz", "object Vertrag"]
+
+    def test_iter_nodes_deep_nesting(self):
+        depth = sys.getrecursionlimit() * 2
+        schema = String(type="string")
+        for _ in range(depth):
+            schema = Array(items=schema, type="array")
+
+        nodes = list(iter_nodes(schema))
+
+        assert len(nodes) == depth + 1
+        assert isinstance(nodes[-1], String)
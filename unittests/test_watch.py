@@ -0,0 +1,122 @@
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+
+from bost.__main__ import watch_config
+from bost.cache import git_blob_sha
+from bost.output import MANIFEST_FILE_NAME
+from bost.pull import SchemaMetadata
+from bost.schema import StrEnum
+from bost.watch import config_files
+
+TEST_DATA_DIR = Path(__file__).parent / "test_data"
+CONFIG_FILE = Path(__file__).parent / "config_test.json"
+RAW_URL = "https://raw.githubusercontent.com/bo4e/BO4E-Schemas/v0.6.1-rc13/src/bo4e_schemas"
+
+
+def _schema_metadata(module_path: tuple[str, ...], tmp_path: Path) -> SchemaMetadata:
+    relative_path = Path(*module_path).with_suffix(".json")
+    return SchemaMetadata(
+        class_name=module_path[-1],
+        download_url=f"{RAW_URL}/{relative_path.as_posix()}",
+        module_path=module_path,
+        file_path=tmp_path / "output" / relative_path,
+        cached_path=tmp_path / "cache" / relative_path,
+        token=None,
+    )
+
+
+def _write_config(path: Path, enum_items: list[str]) -> Path:
+    config = json.loads(CONFIG_FILE.read_text())
+    config["additionalFields"][1]["$ref"] = str(CONFIG_FILE.parent / config["additionalFields"][1]["$ref"])
+    config["additionalModels"][0]["schema"]["$ref"] = str(
+        CONFIG_FILE.parent / config["additionalModels"][0]["schema"]["$ref"]
+    )
+    config["additionalEnumItems"][0]["items"] = enum_items
+    path.write_text(json.dumps(config))
+    return path
+
+
+def _wait_for(condition, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.02)
+
+
+class TestWatch:
+    def test_config_files(self):
+        assert config_files(CONFIG_FILE) == [
+            CONFIG_FILE,
+            CONFIG_FILE.parent / "test_data/bo4e_schemas/additional_field.json",
+            CONFIG_FILE.parent / "test_data/bo4e_schemas/additional_model.json",
+        ]
+
+    def test_watch_config(self, tmp_path: Path):
+        schemas = {}
+        for path in (TEST_DATA_DIR / "bo4e_schemas").glob("*/*.json"):
+            schema = _schema_metadata((path.parent.name, path.stem), tmp_path)
+            schema.schema_text = path.read_text()
+            schema.sha = git_blob_sha(path.read_bytes())
+            schemas[path.stem] = schema
+        config_file = _write_config(tmp_path / "config.json", ["foo", "bar"])
+        output = tmp_path / "output"
+        stop_event = threading.Event()
+        watcher = threading.Thread(
+            target=watch_config,
+            args=(schemas, output, config_file, "v0.6.1-rc13", True, True, False),
+            kwargs={"poll_interval": 0.01, "stop_event": stop_event},
+        )
+        watcher.start()
+        try:
+            _wait_for((output / MANIFEST_FILE_NAME).exists)
+            angebot = output / "bo" / "Angebot.json"
+            modification_time = angebot.stat().st_mtime_ns
+
+            time.sleep(0.05)
+            _write_config(config_file, ["foo", "baz"])
+            _wait_for(lambda: "baz" in StrEnum.model_validate_json((output / "enum" / "Typ.json").read_text()).enum)
+        finally:
+            stop_event.set()
+            watcher.join()
+
+        # Schemas which are not affected by the changed config entry are not written again
+        assert angebot.stat().st_mtime_ns == modification_time
+        # The schemas in memory are not modified by the processing
+        typ = schemas["Typ"].schema_parsed
+        assert isinstance(typ, StrEnum) and "baz" not in typ.enum
+        assert json.loads((output / MANIFEST_FILE_NAME).read_text())["schemas"]
+
+    def test_watch_config_warns_about_unmatched_patterns(self, tmp_path: Path, caplog):
+        caplog.set_level(logging.INFO)
+        schemas = {}
+        for path in (TEST_DATA_DIR / "bo4e_schemas").glob("*/*.json"):
+            schema = _schema_metadata((path.parent.name, path.stem), tmp_path)
+            schema.schema_text = path.read_text()
+            schema.sha = git_blob_sha(path.read_bytes())
+            schemas[path.stem] = schema
+        config_file = _write_config(tmp_path / "config.json", ["foo", "bar"])
+        output = tmp_path / "output"
+        stop_event = threading.Event()
+        watcher = threading.Thread(
+            target=watch_config,
+            args=(schemas, output, config_file, "v0.6.1-rc13", True, True, False),
+            kwargs={"poll_interval": 0.01, "stop_event": stop_event},
+        )
+        watcher.start()
+        try:
+            _wait_for((output / MANIFEST_FILE_NAME).exists)
+            assert "did not match any fields" not in caplog.text
+
+            # The typo doesn't touch any schema, so nothing is processed again
+            time.sleep(0.05)
+            config = json.loads(config_file.read_text())
+            config["nonNullableFields"].append("bo\\.Typo\\.doesNotExist")
+            config_file.write_text(json.dumps(config))
+            _wait_for(lambda: "Pattern 'bo\\.Typo\\.doesNotExist' did not match any fields" in caplog.text)
+        finally:
+            stop_event.set()
+            watcher.join()
+        assert "Regenerated 0 schemas" in caplog.text